@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()  # take environment variables from .env.
@@ -35,6 +36,62 @@ LLM_BASE_URL = os.getenv("LLM_BASE_URL", "")
 LLM_API_KEY  = os.getenv("LLM_API_KEY", "")
 LLM_MODEL    = os.getenv("LLM_MODEL", "deepseek-chat")
 ASSISTANT_ENABLED = os.getenv("ASSISTANT_ENABLED", "0") == "1"
+# Serve ai_assist / intake_thank_you / owner_intake_analyse as async views (ASGI mode, see DEPLOYMENT.md)
+ASYNC_LLM_VIEWS = os.getenv("ASYNC_LLM_VIEWS", "0") == "1"
+
+# LLM resilience: retries, circuit breaker and hedging to a fallback endpoint
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))  # retries on 429/5xx/connection errors
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))  # seconds, doubled per retry (full jitter)
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+LLM_CIRCUIT_CACHE = os.getenv("LLM_CIRCUIT_CACHE", "shared")  # cache alias holding breaker state
+LLM_CIRCUIT_WINDOW = int(os.getenv("LLM_CIRCUIT_WINDOW", "60"))  # seconds per error-rate window
+LLM_CIRCUIT_MIN_REQUESTS = int(os.getenv("LLM_CIRCUIT_MIN_REQUESTS", "5"))
+LLM_CIRCUIT_FAILURE_RATE = float(os.getenv("LLM_CIRCUIT_FAILURE_RATE", "0.5"))
+LLM_CIRCUIT_COOLDOWN = int(os.getenv("LLM_CIRCUIT_COOLDOWN", "30"))  # seconds the circuit stays open
+LLM_FALLBACK_BASE_URL = os.getenv("LLM_FALLBACK_BASE_URL", "")
+LLM_FALLBACK_API_KEY = os.getenv("LLM_FALLBACK_API_KEY", "")  # defaults to LLM_API_KEY
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "")  # defaults to LLM_MODEL
+LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", "6"))  # seconds before hedging to the fallback; 0 = only on failure
+# Threads per process running hedged requests: two (primary + hedge) per gunicorn thread
+LLM_HEDGE_POOL_SIZE = int(os.getenv("LLM_HEDGE_POOL_SIZE", str(2 * int(os.getenv("GUNICORN_THREADS", "8")))))
+LLM_RESULT_CACHE_TTL = int(os.getenv("LLM_RESULT_CACHE_TTL", str(60 * 60 * 24 * 7)))  # seconds; memoised triage/analysis results
+LLM_RESULT_CACHE = os.getenv("LLM_RESULT_CACHE", "shared")  # cache alias for memoised results and hit/miss counters
+
+# Admission control (pages/llm_admission.py): concurrent LLM calls per endpoint class, per host, across all
+# workers. Keep the totals (slots + queue) well below WEB_CONCURRENCY x GUNICORN_THREADS so pages stay served.
+LLM_CONCURRENCY = {
+    "assist": int(os.getenv("LLM_CONCURRENCY_ASSIST", "4")),  # 0 = unlimited
+    "triage": int(os.getenv("LLM_CONCURRENCY_TRIAGE", "2")),
+    "analysis": int(os.getenv("LLM_CONCURRENCY_ANALYSIS", "1")),
+}
+LLM_QUEUE_SIZE = {
+    "assist": int(os.getenv("LLM_QUEUE_SIZE_ASSIST", "4")),  # requests waiting for a slot; more are refused
+    "triage": int(os.getenv("LLM_QUEUE_SIZE_TRIAGE", "2")),
+    "analysis": int(os.getenv("LLM_QUEUE_SIZE_ANALYSIS", "1")),
+}
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "5"))  # seconds a request waits for a slot
+LLM_BUSY_RETRY_AFTER = int(os.getenv("LLM_BUSY_RETRY_AFTER", "10"))  # Retry-After (seconds) on refused requests
+LLM_ADMISSION_DIR = os.getenv("LLM_ADMISSION_DIR", str(Path(tempfile.gettempdir()) / "barrister-llm-slots"))
+INTAKE_ANALYSIS_CONCURRENCY = int(os.getenv("INTAKE_ANALYSIS_CONCURRENCY", "4"))  # analyse_intakes thread pool size
+# Intake triage: "inline" (on the thank-you page) or "batch" (a loop in the web service, pages/triage.py)
+TRIAGE_MODE = os.getenv("TRIAGE_MODE", "inline")
+TRIAGE_BATCH_SIZE = int(os.getenv("TRIAGE_BATCH_SIZE", "10"))  # enquiries per LLM request
+TRIAGE_BATCH_WINDOW = float(os.getenv("TRIAGE_BATCH_WINDOW", "2"))  # seconds the oldest enquiry waits for a fuller batch
+TRIAGE_BATCH_WAIT = float(os.getenv("TRIAGE_BATCH_WAIT", "8"))  # seconds the thank-you page keeps reloading for the result
+TRIAGE_POLL_INTERVAL = float(os.getenv("TRIAGE_POLL_INTERVAL", "0.5"))  # seconds between polls of the web service's loop
+TRIAGE_MAX_ATTEMPTS = int(os.getenv("TRIAGE_MAX_ATTEMPTS", "3"))  # failed individual calls before an enquiry is given up on
+TRIAGE_BATCH_TIMEOUT = int(os.getenv("TRIAGE_BATCH_TIMEOUT", "30"))  # seconds per batched request
+TRIAGE_PENDING_MAX_AGE = int(os.getenv("TRIAGE_PENDING_MAX_AGE", "86400"))  # older untriaged enquiries are left alone
+
+# Assistant prompt budget (approximate tokens, see pages/assist_context.py)
+ASSIST_HISTORY_TOKENS = int(os.getenv("ASSIST_HISTORY_TOKENS", "1200"))  # recent turns sent verbatim
+ASSIST_MESSAGE_TOKENS = int(os.getenv("ASSIST_MESSAGE_TOKENS", "400"))  # longer messages are cut
+ASSIST_SUMMARY_TOKENS = int(os.getenv("ASSIST_SUMMARY_TOKENS", "250"))  # running summary of older turns
+ASSIST_SUMMARY_CACHE_TTL = int(os.getenv("ASSIST_SUMMARY_CACHE_TTL", "3600"))  # seconds
+ASSIST_CONTEXT_PAGES = int(os.getenv("ASSIST_CONTEXT_PAGES", "5"))  # most relevant pages listed per question
+ASSIST_CONVERSATION_CACHE = os.getenv("ASSIST_CONVERSATION_CACHE", "shared")  # cache alias holding conversations
+ASSIST_CONVERSATION_TTL = int(os.getenv("ASSIST_CONVERSATION_TTL", "3600"))  # seconds after the last turn
+ASSIST_CONVERSATION_MAX_TURNS = int(os.getenv("ASSIST_CONVERSATION_MAX_TURNS", "40"))  # messages kept per conversation
 
 # Barrister/Site Configuration
 # IMPORTANT: Customize these for your deployment
@@ -59,9 +116,66 @@ CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         "LOCATION": "barrister-site-cache"
-    }
+    },
+    # State that must be shared by all gunicorn workers on the host (e.g. LLM circuit breaker)
+    "shared": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv("SHARED_CACHE_DIR", str(Path(tempfile.gettempdir()) / "barrister-shared-cache")),
+        # Django's default of 300 culls a random third of the files when exceeded, taking breaker and
+        # conversation state with it; memoised results, pages and feeds all share this directory
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "10000"))},
+    },
 }
 
+# Cached CMS content (HomepageSettings, SitePage): shared cache + short per-process copy
+CONTENT_CACHE = os.getenv("CONTENT_CACHE", "shared")
+CONTENT_CACHE_TIMEOUT = int(os.getenv("CONTENT_CACHE_TIMEOUT", "86400"))  # seconds; invalidated on save
+CONTENT_CACHE_LOCAL_TTL = float(os.getenv("CONTENT_CACHE_LOCAL_TTL", "5"))  # seconds before other workers see an edit
+CONTENT_CACHE_LOCAL_MAX_ENTRIES = int(os.getenv("CONTENT_CACHE_LOCAL_MAX_ENTRIES", "512"))  # per-process LRU size
+# Lock files for entries updated in place (the site index); host-wide, like the "shared" cache
+CONTENT_CACHE_LOCK_DIR = os.getenv("CONTENT_CACHE_LOCK_DIR", str(Path(tempfile.gettempdir()) / "barrister-content-locks"))
+SYNDICATION_MAX_AGE = int(os.getenv("SYNDICATION_MAX_AGE", "900"))  # browser/proxy max-age for sitemap.xml and feeds
+AVAILABILITY_CACHE_TIMEOUT = int(os.getenv("AVAILABILITY_CACHE_TIMEOUT", "300"))  # seconds; invalidated on slot/booking changes
+
+# Email: views queue messages in the outbox; `manage.py send_outbox` delivers them (pages/outbox.py)
+EMAIL_BACKEND = os.getenv(
+    "EMAIL_BACKEND",
+    "django.core.mail.backends.console.EmailBackend" if DEBUG else "django.core.mail.backends.smtp.EmailBackend",
+)
+EMAIL_HOST = os.getenv("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.getenv("EMAIL_PORT", "587"))
+EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
+EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "")
+EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "True") == "True"
+EMAIL_TIMEOUT = int(os.getenv("EMAIL_TIMEOUT", "20"))
+DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", BARRISTER_EMAIL)
+OUTBOX_OWNER_EMAIL = os.getenv("OUTBOX_OWNER_EMAIL", BARRISTER_EMAIL)  # booking notifications; empty disables
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))  # emails per SMTP connection
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+OUTBOX_RETRY_BASE = int(os.getenv("OUTBOX_RETRY_BASE", "60"))  # seconds; doubles per failed attempt
+OUTBOX_RETRY_MAX = int(os.getenv("OUTBOX_RETRY_MAX", "3600"))
+OUTBOX_LEASE = int(os.getenv("OUTBOX_LEASE", "300"))  # seconds a claimed email is hidden from other workers
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "5"))  # seconds between polls of the web service's loop
+
+# Queue loops inside the gunicorn workers (pages/background.py). Only turn off when a separate
+# worker shares the database; with SQLite it has a disk of its own and never sees the queues.
+BACKGROUND_TASKS_IN_WEB = os.getenv("BACKGROUND_TASKS_IN_WEB", "1") == "1"
+BACKGROUND_LOCK_DIR = os.getenv("BACKGROUND_LOCK_DIR", str(Path(tempfile.gettempdir()) / "barrister-background"))
+
+# Data retention (pages/retention.py; daily background loop or `manage.py purge_retention`); 0 days keeps rows forever
+RETENTION_INTAKE_DAYS = int(os.getenv("RETENTION_INTAKE_DAYS", "730"))
+RETENTION_BOOKING_DAYS = int(os.getenv("RETENTION_BOOKING_DAYS", "2190"))  # counted from the consultation date
+RETENTION_OUTBOX_DAYS = int(os.getenv("RETENTION_OUTBOX_DAYS", "90"))
+RETENTION_MODE = os.getenv("RETENTION_MODE", "archive")  # archive (JSONL.gz, then delete) or delete
+RETENTION_ARCHIVE_DIR = Path(os.getenv("RETENTION_ARCHIVE_DIR", BASE_DIR / "archive"))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "500"))
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", "86400"))  # seconds between background purges; 0 = off
+
+# Cache-Control for anonymous content pages (see pages/cache_policy.py)
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "60"))  # browsers
+HTTP_CACHE_S_MAXAGE = int(os.getenv("HTTP_CACHE_S_MAXAGE", "600"))  # CDN / reverse proxy
+HTTP_CACHE_STALE_WHILE_REVALIDATE = int(os.getenv("HTTP_CACHE_STALE_WHILE_REVALIDATE", "86400"))
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -71,6 +185,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.sitemaps",
     "pages",
     "ckeditor",
 ]
@@ -80,12 +195,14 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # WhiteNoise for static files in production
+    'pages.cache_policy.CachePolicyMiddleware',  # Cache-Control per URL name (pages/cache_policy.py)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'pages.snapshot.StaticSnapshotMiddleware',  # Pre-rendered public pages (STATIC_SNAPSHOT_ENABLED); last, so it gets the security headers
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -117,7 +234,7 @@ WSGI_APPLICATION = 'core.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.getenv("SQLITE_PATH", BASE_DIR / 'db.sqlite3'),
     }
 }
 
@@ -159,6 +276,16 @@ STATIC_URL = "static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
 STATICFILES_DIRS = [BASE_DIR / "static"]
 
+# Pre-rendered public pages (python manage.py build_snapshot), served without database access
+STATIC_SNAPSHOT_ENABLED = os.getenv("STATIC_SNAPSHOT_ENABLED", "0") == "1"
+STATIC_SNAPSHOT_DIR = Path(os.getenv("STATIC_SNAPSHOT_DIR", STATIC_ROOT / "snapshot"))
+
+# Serve the minified bundles from `python manage.py build_assets` instead of separate files/CDN links.
+# Off by default: the bundles only exist where build.sh ran, so deployments set ASSET_BUNDLES=1.
+ASSET_BUNDLES = os.getenv("ASSET_BUNDLES", "0") == "1"
+# Inline critical CSS and load the assistant widget on first click/idle instead of on every page
+LAZY_ASSETS = os.getenv("LAZY_ASSETS", "1") == "1"
+
 # WhiteNoise configuration for efficient static file serving
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
@@ -176,11 +303,22 @@ LOGOUT_REDIRECT_URL = '/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Application logs (e.g. ai_assist prompt token counts) go to stderr, which the host collects
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "pages": {"handlers": ["console"], "level": os.getenv("PAGES_LOG_LEVEL", "INFO"), "propagate": False},
+    },
+}
+
 # Production security settings
 # These should be enabled when deploying to production (DEBUG=False)
 if not DEBUG:
     # HTTPS/SSL settings
     SECURE_SSL_REDIRECT = os.getenv("SECURE_SSL_REDIRECT", "True") == "True"
+    SECURE_REDIRECT_EXEMPT = [r"^healthz$"]  # platform health checks use plain HTTP
     SESSION_COOKIE_SECURE = True
     CSRF_COOKIE_SECURE = True
     SECURE_HSTS_SECONDS = int(os.getenv("SECURE_HSTS_SECONDS", "31536000"))  # 1 year
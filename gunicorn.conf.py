@@ -0,0 +1,51 @@
+"""
+Gunicorn configuration (loaded automatically from the project root).
+
+Every value can be overridden with an environment variable, so the same file
+works on a 512 MB free instance and on a multi-core host.
+
+- gthread workers: LLM-bound views (assistant, intake triage, analysis) spend
+  most of their time waiting on the network, so each worker process runs a
+  pool of threads instead of blocking a whole process per request.
+- preload_app: the app is imported once in the master and forked, which
+  speeds up worker boot and shares read-only memory between workers.
+- max_requests + jitter: workers are recycled periodically to cap memory
+  growth, staggered so they don't all restart at once.
+- timeout: sized to the longest LLM call (30 s analysis) plus retries, so a
+  slow provider doesn't get workers killed mid-request.
+- post_worker_init: starts the queue loops (outbox emails, batched triage)
+  inside the workers, so they run against the same SQLite file as the web
+  requests. One worker at a time holds each loop (see pages/background.py).
+
+The worker count defaults to 2, which fits a 512 MB instance. It does not
+follow the CPU count, because inside a container that reports the host's
+CPUs. On a bigger instance, raise it with WEB_CONCURRENCY. Workers can also
+be added/removed at runtime with ``kill -TTIN`` / ``kill -TTOU`` on the
+master process.
+"""
+import os
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+# Longest LLM call is 30 s (owner analysis); leave room for one retry and rendering
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "75"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+accesslog = os.getenv("GUNICORN_ACCESSLOG", "-") or None  # empty disables access logging
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOGLEVEL", "info")
+
+
+def post_worker_init(worker):
+    from pages import background
+    background.start()
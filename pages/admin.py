@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Lead, SitePage, PracticeArea, BlogPost, CaseStudy, Booking, HomepageSettings
+from .models import Lead, SitePage, PracticeArea, BlogPost, CaseStudy, Booking, HomepageSettings, OutboxEmail
 
 @admin.register(HomepageSettings)
 class HomepageSettingsAdmin(admin.ModelAdmin):
@@ -67,4 +67,11 @@ class CaseStudyAdmin(admin.ModelAdmin):
         ("Publication", {
             "fields": ("published", "published_at")
         }),
-    )
\ No newline at end of file
+    )
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ("kind", "to", "subject", "status", "attempts", "next_attempt_at", "sent_at")
+    list_filter = ("status", "kind")
+    search_fields = ("to", "subject")
+    readonly_fields = ("created_at", "sent_at", "last_error")
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class PagesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pages'
+
+    def ready(self):
+        # Connect the setting_changed receiver that resets the cached site config
+        from . import site_config  # noqa: F401
+        # Connect cache invalidation receivers
+        from . import signals  # noqa: F401
@@ -0,0 +1,344 @@
+"""
+Asset pipeline run by ``python manage.py build_assets`` before collectstatic.
+
+- Downloads Bootstrap and Bootstrap Icons into static/vendor/ (once, then
+  reused) so production pages no longer depend on the jsDelivr CDN. Each
+  download is checked against the Subresource Integrity hash pinned in
+  VENDOR_FILES, and the build fails on a mismatch.
+- Purges vendored CSS down to the selectors whose classes appear in the
+  templates, forms and scripts, plus a safelist for classes only added at
+  runtime (Bootstrap JS, message tags).
+- Concatenates and minifies everything into one CSS and one JS bundle under
+  static/dist/. WhiteNoise's CompressedManifestStaticFilesStorage then
+  fingerprints them and writes .gz and .br (with Brotli installed) variants.
+
+Templates switch to the bundles when ASSET_BUNDLES is on (set it wherever
+build.sh runs; off by default, so a checkout without bundles still renders
+with the original files and CDN links).
+With LAZY_ASSETS also on, each public page inlines its critical CSS (see
+``build_critical``) and loads the full stylesheet without blocking render.
+"""
+import base64
+import gzip
+import hashlib
+import posixpath
+import re
+from pathlib import Path
+
+import requests
+import rcssmin
+import rjsmin
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional, WhiteNoise skips .br without it
+    brotli = None
+
+
+# Relative path -> (URL, integrity). Integrity is a Subresource Integrity hash
+# ("sha384-<base64>") of the file as published; None means not pinned yet, and
+# build_assets prints the hash of the download so it can be checked and added.
+BOOTSTRAP = "https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist"
+BOOTSTRAP_ICONS = "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font"
+VENDOR_FILES = {
+    "vendor/bootstrap.min.css": (
+        f"{BOOTSTRAP}/css/bootstrap.min.css",
+        "sha384-QWTKZyjpPEjISv5WaRU9OFeRpok6YctnYmDr5pNlyT2bRjXh0JMhjY6hW+ALEwIH",
+    ),
+    "vendor/bootstrap.bundle.min.js": (
+        f"{BOOTSTRAP}/js/bootstrap.bundle.min.js",
+        "sha384-YvpcrYf0tY3lHB60NNkmXc5s9fDVZLESaAA55NDzOxhy9GkcIdslK1eN7N6jIeHz",
+    ),
+    "vendor/bootstrap-icons.css": (f"{BOOTSTRAP_ICONS}/bootstrap-icons.css", None),
+    "vendor/fonts/bootstrap-icons.woff2": (f"{BOOTSTRAP_ICONS}/fonts/bootstrap-icons.woff2", None),
+    "vendor/fonts/bootstrap-icons.woff": (f"{BOOTSTRAP_ICONS}/fonts/bootstrap-icons.woff", None),
+}
+
+# Bundle -> sources (relative to static/). Vendored CSS is purged, local files are kept whole.
+# The assistant widget has its own bundles so it can be loaded on demand (LAZY_ASSETS).
+BUNDLES = {
+    "dist/site.css": [
+        "vendor/bootstrap.min.css", "vendor/bootstrap-icons.css", "css/site.css", "css/assistant-launcher.css",
+    ],
+    "dist/site.js": ["vendor/bootstrap.bundle.min.js"],
+    "dist/assistant.css": ["css/assistant.css"],
+    "dist/assistant.js": ["js/assistant.js"],
+    "dist/booking.js": ["js/booking_calendar.js"],
+}
+PURGED = {"vendor/bootstrap.min.css", "vendor/bootstrap-icons.css"}
+
+# What pages loaded before bundling, for the page-weight report
+UNBUNDLED = {
+    "css": [
+        "vendor/bootstrap.min.css", "vendor/bootstrap-icons.css", "css/site.css",
+        "css/assistant-launcher.css", "css/assistant.css",
+    ],
+    "js": ["vendor/bootstrap.bundle.min.js", "js/assistant.js"],
+}
+
+# Critical CSS: rules for base.html's header plus the first CRITICAL_LINES lines
+# of each public template's content block are inlined into <head>.
+CRITICAL_SOURCES = BUNDLES["dist/site.css"]
+CRITICAL_LINES = 40
+
+# Classes added by Bootstrap's JS or built from template variables
+SAFELIST = {
+    "show", "showing", "hiding", "collapsing", "collapsed", "fade", "active", "disabled",
+    "modal-backdrop", "modal-open", "modal-static", "offcanvas-backdrop", "dropdown-menu-end",
+    "tooltip", "popover", "bs-tooltip-auto", "bs-popover-auto", "was-validated", "is-invalid", "is-valid",
+    "alert-success", "alert-info", "alert-warning", "alert-danger", "alert-error", "alert-debug",
+}
+
+CLASS_SELECTOR = re.compile(r"\.(-?[_a-zA-Z][_a-zA-Z0-9-]*)")
+NOT_PSEUDO = re.compile(r":not\([^)]*\)")
+TOKEN = re.compile(r"[_a-zA-Z][_a-zA-Z0-9-]*")
+CSS_URL = re.compile(r"url\(\s*(['\"]?)([^'\")]+)\1\s*\)")
+SOURCE_MAP = re.compile(rb"/\*# sourceMappingURL=[^*]*\*/|//# sourceMappingURL=\S*")
+FONT_FACE = re.compile(r"@font-face\{[^}]*\}")
+CSS_IMPORT = re.compile(r"@import\s+url\([^)]*\)\s*;|@import\s+['\"][^'\"]*['\"]\s*;")
+
+
+def static_dir():
+    return Path(settings.STATICFILES_DIRS[0])
+
+
+class VendorIntegrityError(Exception):
+    """A downloaded vendor file doesn't match its pinned integrity hash."""
+
+
+def integrity(content, algorithm=None):
+    """Subresource Integrity hash of content, e.g. "sha384-<base64>"."""
+    algorithm = algorithm or "sha384"
+    return f"{algorithm}-{base64.b64encode(hashlib.new(algorithm, content).digest()).decode()}"
+
+
+def verify(rel, content, pinned):
+    """Raise VendorIntegrityError unless content matches the pinned hash (if any)."""
+    if pinned is None:
+        return
+    actual = integrity(content, pinned.split("-", 1)[0])
+    if actual != pinned:
+        raise VendorIntegrityError(f"{rel} does not match its pinned hash: expected {pinned}, got {actual}")
+
+
+def vendor(refresh=False):
+    """
+    Download the vendored files that are missing (or all with refresh=True).
+
+    Raises VendorIntegrityError, before writing anything for that file, if a
+    download doesn't match its pinned hash.
+
+    Returns:
+        dict: Relative path -> integrity hash, for each file downloaded
+    """
+    fetched = {}
+    for rel, (url, pinned) in VENDOR_FILES.items():
+        target = static_dir() / rel
+        if target.exists() and not refresh:
+            continue
+        resp = requests.get(url, timeout=30)
+        resp.raise_for_status()
+        content = resp.content
+        verify(rel, content, pinned)
+        fetched[rel] = integrity(content)
+        if target.suffix in (".css", ".js"):
+            # The .map files aren't vendored; ManifestStaticFilesStorage fails on dangling references
+            content = SOURCE_MAP.sub(b"", content)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(content)
+    return fetched
+
+
+def used_tokens():
+    """Every identifier-like token in templates, Python forms/views and local JS."""
+    sources = list(Path(settings.BASE_DIR, "Templates").rglob("*.html"))
+    sources += list(Path(settings.BASE_DIR, "pages").glob("*.py"))
+    sources += list((static_dir() / "js").glob("*.js"))
+    tokens = set(SAFELIST)
+    for path in sources:
+        tokens.update(TOKEN.findall(path.read_text(encoding="utf-8")))
+    return tokens
+
+
+def _split_blocks(css):
+    """Split a CSS string into top-level (prelude, body) pairs; body is None for statements."""
+    blocks, i, n = [], 0, len(css)
+    while i < n:
+        brace = css.find("{", i)
+        semi = css.find(";", i)
+        if brace == -1 or (semi != -1 and semi < brace and css[i:semi].lstrip().startswith("@")):
+            end = n if semi == -1 else semi + 1
+            if css[i:end].strip():
+                blocks.append((css[i:end].strip(), None))
+            i = end
+            continue
+        depth, j = 1, brace + 1
+        while j < n and depth:
+            if css[j] == "{":
+                depth += 1
+            elif css[j] == "}":
+                depth -= 1
+            j += 1
+        blocks.append((css[i:brace].strip(), css[brace + 1:j - 1]))
+        i = j
+    return blocks
+
+
+def _selector_used(selector, tokens):
+    # Classes inside :not() don't have to be present for the rule to apply
+    selector = NOT_PSEUDO.sub("", selector)
+    return all(name in tokens for name in CLASS_SELECTOR.findall(selector))
+
+
+def purge_css(css, tokens):
+    """Drop rules whose selectors all reference a class not in ``tokens``."""
+    out = []
+    for prelude, body in _split_blocks(css):
+        if body is None:
+            if prelude.startswith("@charset"):
+                continue  # Only valid as the very first statement of a file
+            out.append(prelude if prelude.endswith(";") else prelude + ";")
+        elif prelude.startswith(("@media", "@supports", "@layer", "@container")):
+            inner = purge_css(body, tokens)
+            if inner:
+                out.append(f"{prelude}{{{inner}}}")
+        elif prelude.startswith("@"):
+            # @font-face, @keyframes, @page... are kept whole
+            out.append(f"{prelude}{{{body}}}")
+        else:
+            kept = [s for s in prelude.split(",") if _selector_used(s, tokens)]
+            if kept:
+                out.append(f"{','.join(kept)}{{{body}}}")
+    return "".join(out)
+
+
+def rebase_urls(css, source, bundle):
+    """Rewrite relative url()s in ``source`` so they resolve from ``bundle``'s directory."""
+    src_dir, out_dir = posixpath.dirname(source), posixpath.dirname(bundle)
+
+    def fix(match):
+        quote, url = match.groups()
+        if url.startswith(("data:", "http:", "https:", "//", "/", "#")):
+            return match.group(0)
+        target = posixpath.normpath(posixpath.join(src_dir, url))
+        return f"url({quote}{posixpath.relpath(target, out_dir)}{quote})"
+    return CSS_URL.sub(fix, css)
+
+
+def build_css(bundle, sources, tokens):
+    imports, parts = [], []
+    for rel in sources:
+        css = (static_dir() / rel).read_text(encoding="utf-8")
+        if rel in PURGED:
+            css = purge_css(rcssmin.cssmin(css), tokens)
+        css = rebase_urls(css, rel, bundle)
+        # @import is only valid at the top of a stylesheet
+        imports += CSS_IMPORT.findall(css)
+        parts.append(CSS_IMPORT.sub("", css))
+    return rcssmin.cssmin("".join(imports) + "\n".join(parts))
+
+
+def build_js(sources):
+    # Each source is wrapped on its own line with a separator so ASI can't join statements
+    return ";\n".join(rjsmin.jsmin((static_dir() / rel).read_text(encoding="utf-8")) for rel in sources)
+
+
+def build():
+    """
+    Write every bundle under static/dist/.
+
+    Returns:
+        dict: bundle path -> size in bytes
+    """
+    tokens = used_tokens()
+    sizes = {}
+    for bundle, sources in BUNDLES.items():
+        content = build_css(bundle, sources, tokens) if bundle.endswith(".css") else build_js(sources)
+        target = static_dir() / bundle
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(content, encoding="utf-8")
+        sizes[bundle] = len(content.encode("utf-8"))
+    return sizes
+
+
+def critical_templates():
+    """Public page templates that get inlined critical CSS (owner pages don't)."""
+    templates_dir = Path(settings.BASE_DIR, "Templates")
+    return sorted(
+        path.relative_to(templates_dir).as_posix()
+        for path in (templates_dir / "SitePages").glob("*.html")
+        if not path.name.startswith("owner_")
+    )
+
+
+def critical_path(template_name):
+    """Static path of the critical CSS for a template, e.g. dist/critical/SitePages/home.css."""
+    return f"dist/critical/{posixpath.splitext(template_name)[0]}.css"
+
+
+def above_fold_tokens(template_name):
+    """Tokens in base.html before the content block plus the start of the template's content."""
+    templates_dir = Path(settings.BASE_DIR, "Templates")
+    header = (templates_dir / "base.html").read_text(encoding="utf-8").split("{% block content %}")[0]
+    content = (templates_dir / template_name).read_text(encoding="utf-8").split("{% block content %}")[-1]
+    top = "\n".join(content.splitlines()[:CRITICAL_LINES])
+    return set(TOKEN.findall(header + top))
+
+
+def build_critical():
+    """
+    Write the critical CSS for every public template.
+
+    Returns:
+        dict: critical CSS path -> size in bytes
+    """
+    css = "".join(rcssmin.cssmin((static_dir() / rel).read_text(encoding="utf-8")) for rel in CRITICAL_SOURCES)
+    # Fonts come with the full stylesheet: an @import would block rendering, and
+    # relative font URLs would resolve against the page once inlined
+    css = FONT_FACE.sub("", CSS_IMPORT.sub("", css))
+    sizes = {}
+    for template_name in critical_templates():
+        content = rcssmin.cssmin(purge_css(css, above_fold_tokens(template_name)))
+        rel = critical_path(template_name)
+        target = static_dir() / rel
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(content, encoding="utf-8")
+        sizes[rel] = len(content.encode("utf-8"))
+    return sizes
+
+
+def transfer_sizes(data):
+    """(raw, gzip, brotli) sizes in bytes for one asset; brotli is None if unavailable."""
+    return (
+        len(data),
+        len(gzip.compress(data, compresslevel=9)),
+        len(brotli.compress(data)) if brotli else None,
+    )
+
+
+def page_weight():
+    """
+    CSS/JS weight of a page before (separate files) and after (bundles).
+
+    "after" counts what a page loads up front; the assistant bundles loaded
+    on demand are reported separately as "deferred".
+
+    Returns:
+        dict: {"before": {kind: (raw, gzip, br)}, "after": {kind: (raw, gzip, br)}}
+    """
+    def total(paths):
+        sizes = [transfer_sizes((static_dir() / rel).read_bytes()) for rel in paths]
+        return tuple(
+            None if any(s[i] is None for s in sizes) else sum(s[i] for s in sizes)
+            for i in range(3)
+        )
+
+    return {
+        "before": {kind: total(paths) for kind, paths in UNBUNDLED.items()},
+        "after": {
+            "css": total(["dist/site.css"]),
+            "js": total(["dist/site.js"]),
+            "deferred": total(["dist/assistant.css", "dist/assistant.js"]),
+        },
+    }
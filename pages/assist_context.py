@@ -0,0 +1,176 @@
+"""
+Token-budgeted conversation context for the website assistant (ai_assist).
+
+A conversation (stored server-side, see pages/conversations.py) grows with
+every turn. Forwarding it verbatim makes each turn slower and dearer than
+the last, so the prompt is built to a budget instead:
+
+- tokens are counted locally with count_tokens(), an approximation of a BPE
+  tokenizer (a token per five characters of a word, one per punctuation
+  mark) that needs no model files or extra dependency;
+- every message is cut to ASSIST_MESSAGE_TOKENS;
+- the newest turns are kept verbatim while they fit in ASSIST_HISTORY_TOKENS;
+- older turns are collapsed into a short running summary (at most
+  ASSIST_SUMMARY_TOKENS) that goes into the system message.
+
+The summary is extractive (the opening sentence of each turn), so building
+it costs no extra LLM call. It is cached in the shared cache under a hash of
+the turns it covers. Each hash is chained from the previous one, so when a
+turn scrolls out of the verbatim window only that turn is summarised and
+appended to the cached summary of everything before it.
+"""
+import hashlib
+import math
+import re
+
+from django.conf import settings
+from django.utils.html import strip_tags
+
+from . import content_cache
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+# Per-message framing the chat API adds (role, separators), and the reply primer
+MESSAGE_OVERHEAD = 4
+REPLY_OVERHEAD = 3
+
+# Earlier versions of the widget appended link instructions to every message; the system prompt has them
+CLIENT_INSTRUCTIONS = re.compile(r"\s*\[System: You may include internal links[^\]]*\]\s*$")
+
+SUMMARY_TURN_TOKENS = 40
+SUMMARY_HEADER = "EARLIER IN THIS CONVERSATION (summary of older messages):"
+SUMMARY_ELIDED = "- …"
+SUMMARY_KEY_PREFIX = "assist:summary:"
+MAX_HISTORY_MESSAGES = 100
+
+SPEAKERS = {"user": "Visitor", "assistant": "Assistant"}
+
+
+def _piece_tokens(piece):
+    # Words cost one token per five characters (at least one); punctuation one each
+    return max(1, math.ceil(len(piece) / 5)) if piece[0].isalnum() or piece[0] == "_" else 1
+
+
+def count_tokens(text):
+    """Approximate token count of text."""
+    return sum(_piece_tokens(piece) for piece in TOKEN_PATTERN.findall(text or ""))
+
+
+def message_tokens(messages):
+    """Approximate prompt tokens for a list of chat messages."""
+    return sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD for m in messages) + REPLY_OVERHEAD
+
+
+def truncate_tokens(text, limit):
+    """text cut to about ``limit`` tokens, with an ellipsis if anything was dropped."""
+    used = 0
+    for match in TOKEN_PATTERN.finditer(text):
+        used += _piece_tokens(match.group())
+        if used > limit:
+            return text[:match.start()].rstrip() + " …"
+    return text
+
+
+def clean_message(text):
+    """A message as it is sent and stored: without the old widget's trailer, cut to ASSIST_MESSAGE_TOKENS."""
+    return truncate_tokens(CLIENT_INSTRUCTIONS.sub("", text).strip() or text, settings.ASSIST_MESSAGE_TOKENS)
+
+
+def clean_history(history):
+    """Only user/assistant turns with text content, without the old widget's instruction trailer."""
+    turns = []
+    for item in history[-MAX_HISTORY_MESSAGES:] if isinstance(history, list) else []:
+        if not isinstance(item, dict) or item.get("role") not in SPEAKERS:
+            continue
+        content = item.get("content")
+        if not isinstance(content, str):
+            continue
+        content = CLIENT_INSTRUCTIONS.sub("", content).strip()
+        if content:
+            turns.append({"role": item["role"], "content": content})
+    return turns
+
+
+def _chain(turns):
+    """Chained hashes: the i-th covers turns[:i + 1]."""
+    digest = hashlib.sha256()
+    hashes = []
+    for turn in turns:
+        digest.update(f"{turn['role']}\x00{turn['content']}\x01".encode("utf-8"))
+        hashes.append(digest.copy().hexdigest()[:32])
+    return hashes
+
+
+def _summary_line(turn):
+    text = " ".join(strip_tags(turn["content"]).split())
+    first = SENTENCE_END.split(text, maxsplit=1)[0]
+    return f"- {SPEAKERS[turn['role']]}: {truncate_tokens(first, SUMMARY_TURN_TOKENS)}"
+
+
+def _fit_summary(lines):
+    """Drop the oldest lines until the summary fits ASSIST_SUMMARY_TOKENS."""
+    while len(lines) > 1 and count_tokens("\n".join(lines)) > settings.ASSIST_SUMMARY_TOKENS:
+        lines = [SUMMARY_ELIDED] + lines[2 if lines[0] == SUMMARY_ELIDED else 1:]
+    return lines
+
+
+def rolling_summary(turns):
+    """Summary of turns, extending the longest cached summary of a prefix of them."""
+    if not turns:
+        return ""
+    cache = content_cache.shared_cache()
+    hashes = _chain(turns)
+    cached = cache.get_many([SUMMARY_KEY_PREFIX + h for h in hashes])
+
+    lines, start = [], 0
+    for i in range(len(turns) - 1, -1, -1):
+        hit = cached.get(SUMMARY_KEY_PREFIX + hashes[i])
+        if hit is not None:
+            lines, start = hit.split("\n"), i + 1
+            break
+    if start == len(turns):
+        return "\n".join(lines)
+
+    lines = _fit_summary(lines + [_summary_line(turn) for turn in turns[start:]])
+    summary = "\n".join(lines)
+    cache.set(SUMMARY_KEY_PREFIX + hashes[-1], summary, settings.ASSIST_SUMMARY_CACHE_TTL)
+    return summary
+
+
+def build_messages(system_message, history, user_msg):
+    """
+    Chat messages for one assistant turn, within the configured token budgets.
+
+    Returns (messages, stats); stats has "prompt_tokens", "untrimmed_tokens"
+    (what forwarding everything verbatim would have cost), "kept" and
+    "summarised" (numbers of history messages).
+    """
+    raw = [t for t in history if isinstance(t, dict) and isinstance(t.get("content"), str)] if isinstance(history, list) else []
+    untrimmed = message_tokens([{"content": system_message}] + raw + [{"content": user_msg}])
+
+    turns = [{"role": t["role"], "content": clean_message(t["content"])} for t in clean_history(history)]
+    user_msg = clean_message(user_msg)
+
+    # Newest first, keep whole messages while they fit
+    budget, kept = settings.ASSIST_HISTORY_TOKENS, 0
+    for turn in reversed(turns):
+        cost = count_tokens(turn["content"]) + MESSAGE_OVERHEAD
+        if cost > budget:
+            break
+        budget -= cost
+        kept += 1
+    older, recent = turns[:len(turns) - kept], turns[len(turns) - kept:]
+
+    summary = rolling_summary(older)
+    if summary:
+        system_message += f"\n\n{SUMMARY_HEADER}\n{summary}"
+
+    messages = [{"role": "system", "content": system_message}] + recent + [{"role": "user", "content": user_msg}]
+    stats = {
+        "prompt_tokens": message_tokens(messages),
+        "untrimmed_tokens": untrimmed,
+        "kept": len(recent),
+        "summarised": len(older),
+    }
+    return messages, stats
@@ -0,0 +1,159 @@
+"""
+Async versions of the LLM-bound views, used in ASGI mode (ASYNC_LLM_VIEWS=1).
+
+While waiting on the LLM these views yield to the event loop instead of
+holding a worker thread, so a single uvicorn worker can serve many
+concurrent assistant sessions. LLM calls go through the httpx-based client
+in llm_utils; ORM access and template rendering go through the async ORM or
+sync_to_async.
+
+Behaviour matches the sync views in views.py, which remain the default for
+WSGI deployments.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404
+from django.shortcuts import render, redirect
+from django.views.decorators.csrf import csrf_exempt
+
+from . import llm_admission, triage
+from .intake_analysis import load_analysis_prompt, aanalyse_text
+from .llm_cache import acached_llm_result
+from .llm_utils import acall_llm_json, acall_llm_messages, LLMError
+from .models import IntakeSession
+from .prompts import get_prompt
+from .views import (
+    ASSIST_UNAVAILABLE_REPLY, _assist_begin, _assist_busy, _assist_finish, apply_triage_result, is_staff_user,
+)
+
+
+async def _aget_intake_or_404(intake_uuid):
+    try:
+        return await IntakeSession.objects.aget(uuid=intake_uuid)
+    except IntakeSession.DoesNotExist:
+        raise Http404("No IntakeSession matches the given query.")
+
+
+async def _staff_redirect(request):
+    """The redirect @login_required + @user_passes_test(is_staff_user, login_url='/') would give, or None."""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    if not is_staff_user(user):
+        return redirect_to_login(request.get_full_path(), login_url="/")
+    return None
+
+
+async def aclassify_intake_session(session):
+    """
+    Async version of views.classify_intake_session.
+
+    Returns True if classification was successful, False otherwise.
+    Does NOT raise exceptions - fails silently and leaves fields unchanged.
+    """
+    if session.is_suitable is not None:
+        return True
+
+    try:
+        prompt = get_prompt("intake_classify.txt")
+    except FileNotFoundError:
+        return False
+
+    user_prompt = session.raw_text
+
+    try:
+        async def call():
+            async with llm_admission.aadmit("triage"):
+                return await acall_llm_json(
+                    system_prompt=prompt.text,
+                    user_prompt=user_prompt,
+                    temperature=0.1,
+                    max_tokens=100,
+                    timeout=10
+                )
+
+        result = await acached_llm_result("triage", prompt, user_prompt, call)
+        apply_triage_result(session, result, prompt)
+        await session.asave()
+        return True
+
+    except Exception:
+        return False
+
+
+@csrf_exempt
+async def ai_assist(request):
+    response, state = await sync_to_async(_assist_begin)(request)
+    if response is not None:
+        return response
+
+    try:
+        async with llm_admission.aadmit("assist"):
+            reply = await acall_llm_messages(state["messages"], temperature=0.2, max_tokens=350, timeout=25)
+    except llm_admission.LLMBusyError as e:
+        return _assist_busy(state, e)
+    except Exception:
+        reply = ASSIST_UNAVAILABLE_REPLY
+
+    return await sync_to_async(_assist_finish)(state, reply)
+
+
+async def intake_thank_you(request, intake_uuid):
+    """Async version of views.intake_thank_you."""
+    intake_session = await _aget_intake_or_404(intake_uuid)
+
+    if settings.TRIAGE_MODE != "batch":
+        # Run lightweight classification (fails silently if AI unavailable)
+        await aclassify_intake_session(intake_session)
+
+    return await sync_to_async(render)(request, "SitePages/intake_thank_you.html", {
+        "intake_session": intake_session,
+        "triage_pending": triage.awaiting_result(intake_session),
+    })
+
+
+async def owner_intake_analyse(request, intake_uuid):
+    """
+    Async version of views.owner_intake_analyse.
+
+    Performs the same staff check, with the same redirects, as
+    @login_required/@user_passes_test (which only wrap sync views on this
+    Django version).
+    """
+    denied = await _staff_redirect(request)
+    if denied is not None:
+        return denied
+
+    intake_session = await _aget_intake_or_404(intake_uuid)
+
+    if request.method != "POST":
+        return redirect("owner_intake_list")
+
+    try:
+        prompt = load_analysis_prompt()
+    except FileNotFoundError:
+        messages.error(request, "AI intake prompt file not found. Please check configuration.")
+        return redirect("owner_intake_list")
+
+    try:
+        async with llm_admission.aadmit("analysis"):
+            result = await aanalyse_text(prompt, intake_session.raw_text)
+
+        # Only update structured_output; is_suitable/recommended_slot_type stay with triage
+        intake_session.structured_output = result
+        await intake_session.asave()
+
+        messages.success(request, "AI analysis completed successfully.")
+        return redirect("owner_intake_detail", intake_uuid=intake_uuid)
+
+    except llm_admission.LLMBusyError as e:
+        messages.error(request, f"AI analysis is busy; please try again in {e.retry_after} seconds.")
+        return redirect("owner_intake_list")
+    except LLMError as e:
+        messages.error(request, f"AI analysis failed: {str(e)}")
+        return redirect("owner_intake_list")
+    except Exception as e:
+        messages.error(request, f"Unexpected error during AI analysis: {str(e)}")
+        return redirect("owner_intake_list")
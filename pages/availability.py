@@ -0,0 +1,227 @@
+"""
+Bookable availability: the month view behind the calendar on /book/ and the
+"next available slot" search used by its API and the assistant.
+
+month_availability() answers "what can be booked in this month" with one
+query: slots in the month's date range that are available and not yet over,
+with the past filtered out in SQL rather than by calling is_in_past() on each
+slot. The rows are grouped into per-date counts and slot times in Python.
+
+Results live in the shared content cache (CONTENT_CACHE) under one key per
+month, so every worker shares one copy. Receivers in pages/signals.py drop a
+month's key whenever a slot in it, or a booking for such a slot, is saved or
+deleted. Entries also expire after AVAILABILITY_CACHE_TIMEOUT seconds, and
+slots that have ended since the entry was stored are dropped on read.
+
+next_available() finds the earliest free slots matching a slot type, a
+minimum duration, weekdays and a time-of-day window. Duration is computed in
+SQL (end_time - start_time) so the filter, ordering and LIMIT all run on the
+(is_available, date, start_time) index instead of loading every future slot.
+"""
+import calendar
+import re
+from datetime import date, time, timedelta
+
+from django.conf import settings
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q
+from django.urls import reverse
+from django.utils import timezone
+
+from . import content_cache
+from .models import AvailabilitySlot
+
+MIN_YEAR, MAX_YEAR = 2000, 2100
+
+MAX_RESULTS = 20
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]  # ISO weekday 1-7
+
+# Named time-of-day windows: slots starting at or after the first time and before the second
+TIME_OF_DAY = {
+    "morning": (time(0), time(12)),
+    "afternoon": (time(12), time(17)),
+    "evening": (time(17), time(23, 59, 59)),
+}
+
+
+def cache_key(year, month):
+    return f"availability:{year:04d}-{month:02d}"
+
+
+def _now():
+    now = timezone.localtime()
+    return now.date(), now.time().replace(microsecond=0)
+
+
+def bookable_slots(today=None, now_time=None):
+    """Available slots that have not ended yet, past filtered in SQL."""
+    if today is None:
+        today, now_time = _now()
+    return AvailabilitySlot.objects.filter(is_available=True).filter(
+        Q(date__gt=today) | Q(date=today, end_time__gt=now_time)
+    )
+
+
+def with_duration(queryset):
+    """Annotate slots with ``duration`` (end_time - start_time) computed by the database."""
+    return queryset.annotate(
+        duration=ExpressionWrapper(F("end_time") - F("start_time"), output_field=DurationField())
+    )
+
+
+def upcoming_dates():
+    """[(date, count)] for every date with a bookable slot, as one GROUP BY query."""
+    rows = (
+        bookable_slots()
+        .order_by()
+        .values("date")
+        .annotate(count=Count("id"))
+        .order_by("date")
+    )
+    return [(row["date"], row["count"]) for row in rows]
+
+
+def _load_month(year, month):
+    first = date(year, month, 1)
+    last = date(year, month, calendar.monthrange(year, month)[1])
+    rows = (
+        with_duration(bookable_slots())
+        .filter(date__range=(first, last))
+        .order_by("date", "start_time")
+        .values("pk", "date", "start_time", "end_time", "slot_type", "duration")
+    )
+    return [_slot_data(row) for row in rows]
+
+
+def _slot_data(row):
+    return {
+        "id": row["pk"],
+        "date": row["date"].isoformat(),
+        "start": row["start_time"].strftime("%H:%M"),
+        "end": row["end_time"].strftime("%H:%M"),
+        "slot_type": row["slot_type"],
+        "duration_minutes": int(row["duration"].total_seconds() // 60),
+    }
+
+
+def month_availability(year, month):
+    """
+    {"month": "YYYY-MM", "dates": {"YYYY-MM-DD": {"count", "slots"}}} for the
+    bookable slots in a month. Raises ValueError for an out-of-range month.
+    """
+    if not (MIN_YEAR <= year <= MAX_YEAR and 1 <= month <= 12):
+        raise ValueError(f"Invalid month: {year}-{month}")
+
+    key = cache_key(year, month)
+    shared = content_cache.shared_cache()
+    slots = shared.get(key)
+    if slots is None:
+        slots = _load_month(year, month)
+        shared.set(key, slots, settings.AVAILABILITY_CACHE_TIMEOUT)
+
+    # The cached list may be a few minutes old; drop slots that have ended since
+    today, now_time = _now()
+    today_iso, now_hm = today.isoformat(), now_time.strftime("%H:%M")
+    dates = {}
+    for slot in slots:
+        if slot["date"] < today_iso or (slot["date"] == today_iso and slot["end"] <= now_hm):
+            continue
+        day = dates.setdefault(slot["date"], {"count": 0, "slots": []})
+        day["count"] += 1
+        day["slots"].append(slot)
+    return {"month": f"{year:04d}-{month:02d}", "dates": dates}
+
+
+def invalidate(*dates):
+    """Drop the cached months containing the given dates."""
+    keys = {cache_key(d.year, d.month) for d in dates if d}
+    if keys:
+        content_cache.shared_cache().delete_many(list(keys))
+
+
+def next_available(slot_type=None, min_duration=None, weekdays=None, time_of_day=None,
+                   after=None, before=None, limit=5):
+    """
+    The earliest bookable slots matching every given filter, as dicts with a
+    booking ``url``.
+
+    - slot_type: one of AvailabilitySlot.SLOT_TYPE_CHOICES
+    - min_duration: minutes
+    - weekdays: ISO weekday numbers (1 = Monday)
+    - time_of_day: a TIME_OF_DAY name
+    - after / before: the slot must start at or after / end at or before these times
+    """
+    slots = with_duration(bookable_slots())
+    if slot_type:
+        slots = slots.filter(slot_type=slot_type)
+    if min_duration:
+        slots = slots.filter(duration__gte=timedelta(minutes=min_duration))
+    if weekdays:
+        slots = slots.filter(date__iso_week_day__in=sorted(weekdays))
+    if time_of_day:
+        window_start, window_end = TIME_OF_DAY[time_of_day]
+        slots = slots.filter(start_time__gte=window_start, start_time__lt=window_end)
+    if after:
+        slots = slots.filter(start_time__gte=after)
+    if before:
+        slots = slots.filter(end_time__lte=before)
+
+    limit = max(1, min(limit, MAX_RESULTS))
+    rows = slots.order_by("date", "start_time").values(
+        "pk", "date", "start_time", "end_time", "slot_type", "duration"
+    )[:limit]
+    return [{**_slot_data(row), "url": reverse("book_slot", args=[row["pk"]])} for row in rows]
+
+
+def parse_weekdays(value):
+    """"mon,thu" or "1,4" -> {1, 4}. Raises ValueError for anything else."""
+    days = set()
+    for part in filter(None, (p.strip().lower()[:3] for p in value.split(","))):
+        if part.isdigit() and 1 <= int(part) <= 7:
+            days.add(int(part))
+        elif part in WEEKDAYS:
+            days.add(WEEKDAYS.index(part) + 1)
+        else:
+            raise ValueError(f"Unknown weekday: {part}")
+    return days
+
+
+SLOT_TYPE_WORDS = {
+    "followup": re.compile(r"\bfollow[\s-]?up\b", re.I),
+    "initial": re.compile(r"\binitial\b|\bfirst (?:consultation|meeting)\b", re.I),
+}
+WEEKDAY_WORDS = re.compile(r"\b(mon|tues|wednes|thurs|fri|satur|sun)days?\b", re.I)
+DURATION_WORDS = re.compile(r"\b(\d{1,3})\s*(?:min|minute|minutes|mins)\b|\b(an?|one|two|\d)\s*(?:hour|hours|hr|hrs)\b", re.I)
+HALF_HOUR_WORDS = re.compile(r"\bhalf an? hour\b", re.I)
+HOUR_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2}
+
+
+def filters_from_text(text):
+    """
+    Best-effort next_available() filters from a visitor's message, e.g.
+    "a one hour follow-up on a Tuesday morning" ->
+    {"slot_type": "followup", "min_duration": 60, "weekdays": {2}, "time_of_day": "morning"}.
+    """
+    filters = {}
+    for slot_type, pattern in SLOT_TYPE_WORDS.items():
+        if pattern.search(text):
+            filters["slot_type"] = slot_type
+            break
+    days = {WEEKDAYS.index(m.group(1).lower()[:3]) + 1 for m in WEEKDAY_WORDS.finditer(text)}
+    if days:
+        filters["weekdays"] = days
+    for name in TIME_OF_DAY:
+        # "Good morning" is a greeting, not a preference
+        if re.search(rf"(?<!good )\b{name}s?\b", text, re.I):
+            filters["time_of_day"] = name
+            break
+    duration = DURATION_WORDS.search(text)
+    if HALF_HOUR_WORDS.search(text):
+        filters["min_duration"] = 30
+    elif duration:
+        minutes, hours = duration.groups()
+        if minutes:
+            filters["min_duration"] = int(minutes)
+        else:
+            filters["min_duration"] = 60 * (HOUR_WORDS.get(hours.lower()) or int(hours))
+    return filters
@@ -0,0 +1,105 @@
+"""
+Queue-draining loops run inside the web service (BACKGROUND_TASKS_IN_WEB).
+
+With the default SQLite database the data lives on the web service's own
+disk. A separate Render Background Worker or cron job has a disk of its own
+and never sees the rows the web service writes. gunicorn.conf.py therefore
+calls ``start()`` in every worker process once it has loaded the app. It
+starts the outbox sender, the daily retention purge and, with
+TRIAGE_MODE=batch, the triage batcher:
+
+- each loop runs on a daemon thread and takes an flock()ed file in
+  BACKGROUND_LOCK_DIR before doing any work. Exactly one process on the host
+  works a queue at a time, which matters because SQLite has no
+  SELECT ... FOR UPDATE SKIP LOCKED. The other processes keep polling for
+  the lock and take over when its holder exits or is recycled;
+- the lock holder runs the task, then waits for the loop's interval.
+  Exceptions are logged and the loop carries on.
+
+With a database every service can reach (e.g. Postgres), the management
+commands (``send_outbox --loop``, ``triage_intakes --loop`` and a daily
+``purge_retention``) can run as separate workers and cron jobs instead; set
+BACKGROUND_TASKS_IN_WEB=0 on the web service then.
+"""
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import outbox, retention, triage
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Loop name -> (task, name of the setting holding its interval in seconds)
+LOOPS = {
+    "outbox": (outbox.send_due, "OUTBOX_POLL_INTERVAL"),
+    "triage": (triage.run_pending, "TRIAGE_POLL_INTERVAL"),
+    "retention": (retention.purge_expired, "RETENTION_INTERVAL"),
+}
+
+
+def enabled(name):
+    """Whether loop name has work to do with the current settings."""
+    if name == "triage":
+        return settings.TRIAGE_MODE == "batch"
+    if name == "retention":
+        return settings.RETENTION_INTERVAL > 0
+    return True
+
+
+_started = False
+_start_lock = threading.Lock()
+
+
+def _try_lock(name):
+    """The open fd of the loop's lock file if this process got it, else None."""
+    if fcntl is None:
+        return -1
+    os.makedirs(settings.BACKGROUND_LOCK_DIR, exist_ok=True)
+    fd = os.open(os.path.join(settings.BACKGROUND_LOCK_DIR, f"{name}.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return fd
+    except BlockingIOError:
+        os.close(fd)
+        return None
+
+
+def run(name, stop=None):
+    """Run one loop until stop (a threading.Event) is set; forever by default."""
+    task, interval_setting = LOOPS[name]
+    stop = stop or threading.Event()
+    fd = None
+    try:
+        while not stop.is_set():
+            if fd is None:
+                fd = _try_lock(name)
+            if fd is not None:
+                close_old_connections()
+                try:
+                    task()
+                except Exception:
+                    logger.exception("Background %s loop failed; retrying", name)
+            stop.wait(getattr(settings, interval_setting))
+    finally:
+        if fd is not None and fd >= 0:
+            os.close(fd)
+        close_old_connections()
+
+
+def start():
+    """Start every loop on a daemon thread, once per process (no-op unless BACKGROUND_TASKS_IN_WEB)."""
+    global _started
+    with _start_lock:
+        if _started or not settings.BACKGROUND_TASKS_IN_WEB:
+            return
+        _started = True
+    for name in filter(enabled, LOOPS):
+        threading.Thread(target=run, args=(name,), name=f"background-{name}", daemon=True).start()
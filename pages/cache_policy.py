@@ -0,0 +1,145 @@
+"""
+Per-view HTTP cache policy, so a reverse proxy or CDN can serve anonymous
+traffic without reaching the app servers.
+
+CachePolicyMiddleware looks up the resolved URL name in CACHE_POLICIES:
+
+- PUBLIC (content pages, sitemap, feeds): anonymous GET/HEAD responses get
+  ``Cache-Control: public, max-age, s-maxage, stale-while-revalidate``.
+  Set-Cookie headers are dropped and ``Cookie`` is removed from Vary, so a
+  shared cache stores one copy per URL. Requests that carry a session or
+  messages cookie are served ``private, no-cache`` instead. Those are the
+  owner or a visitor with a pending flash message. Configure the CDN to
+  bypass its cache when the session cookie is present.
+- PRIVATE (the owner area, matched by the ``owner_`` prefix): always
+  ``private, no-store``.
+
+Views not listed are left alone. Durations come from the HTTP_CACHE_*
+settings. The middleware is sync and async capable, so under ASGI it does
+not force the whole stack onto a thread.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.urls import resolve, Resolver404
+from django.utils.cache import patch_cache_control
+
+PUBLIC = "public"
+PRIVATE = "private"
+
+CACHE_POLICIES = {
+    "home": PUBLIC,
+    "about": PUBLIC,
+    "practice_areas": PUBLIC,
+    "practice_area_detail": PUBLIC,
+    "blog_list": PUBLIC,
+    "blog_detail": PUBLIC,
+    "case_list": PUBLIC,
+    "case_detail": PUBLIC,
+    "privacy": PUBLIC,
+    "terms": PUBLIC,
+    "sitemap": PUBLIC,
+    "blog_feed": PUBLIC,
+    "blog_atom_feed": PUBLIC,
+    "case_feed": PUBLIC,
+    "case_atom_feed": PUBLIC,
+}
+PRIVATE_PREFIXES = ("owner_",)
+
+CACHEABLE_STATUS = {200, 301, 304, 404, 410}
+
+
+def policy_for(url_name):
+    """PUBLIC, PRIVATE or None for a URL name."""
+    if not url_name:
+        return None
+    if url_name.startswith(PRIVATE_PREFIXES):
+        return PRIVATE
+    return CACHE_POLICIES.get(url_name)
+
+
+def _url_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        # Responses short-circuited by earlier middleware (e.g. the static snapshot)
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+    return match.url_name
+
+
+def _is_anonymous(request):
+    return (settings.SESSION_COOKIE_NAME not in request.COOKIES
+            and "messages" not in request.COOKIES)
+
+
+def _shareable(request, response):
+    """True if nothing user-specific went into this response."""
+    session = getattr(request, "session", None)
+    return (request.method in ("GET", "HEAD")
+            and response.status_code in CACHEABLE_STATUS
+            and _is_anonymous(request)
+            and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+            and not (session is not None and session.modified))
+
+
+def make_public(response):
+    response.cookies.clear()
+    if response.has_header("Vary"):
+        vary = [v.strip() for v in response["Vary"].split(",") if v.strip().lower() != "cookie"]
+        if vary:
+            response["Vary"] = ", ".join(vary)
+        else:
+            del response["Vary"]
+    directives = {
+        "public": True,
+        "s_maxage": settings.HTTP_CACHE_S_MAXAGE,
+        "stale_while_revalidate": settings.HTTP_CACHE_STALE_WHILE_REVALIDATE,
+    }
+    # Views such as the feeds choose their own browser max-age
+    if "max-age" not in response.get("Cache-Control", ""):
+        directives["max_age"] = settings.HTTP_CACHE_MAX_AGE
+    patch_cache_control(response, **directives)
+
+
+def make_private(response, no_store=False):
+    if no_store:
+        patch_cache_control(response, private=True, no_store=True)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+
+
+class CachePolicyMiddleware:
+    """
+    Apply CACHE_POLICIES to responses.
+
+    Must sit above SessionMiddleware, CsrfViewMiddleware and MessageMiddleware
+    so it sees the cookies and Vary headers they add.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.apply_policy(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.apply_policy(request, await self.get_response(request))
+
+    def apply_policy(self, request, response):
+        policy = policy_for(_url_name(request))
+        if policy == PRIVATE:
+            make_private(response, no_store=True)
+        elif policy == PUBLIC:
+            if _shareable(request, response):
+                make_public(response)
+            else:
+                make_private(response)
+        return response
@@ -0,0 +1,113 @@
+"""
+Two-level cache for rarely-changing CMS objects (HomepageSettings, SitePage).
+
+Level 1 is a per-process LRU of at most CONTENT_CACHE_LOCAL_MAX_ENTRIES
+entries with a short TTL (CONTENT_CACHE_LOCAL_TTL), so most public requests
+don't even reach the cache backend. Expired entries are dropped when they are
+read; the size cap bounds keys that are never read again (e.g. rich_text
+entries for bodies that have since been edited). Level 2 is the
+cache alias named by CONTENT_CACHE (the host-wide "shared" cache by default),
+so one worker's database read serves every other worker.
+
+Saving or deleting a cached model invalidates both levels in the worker that
+made the change (see pages/signals.py); other workers pick the change up
+when their local entry expires. Entries updated in place (read, modify,
+``store()``) are changed under ``locked()``, a host-wide flock() on a file in
+CONTENT_CACHE_LOCK_DIR, so concurrent saves in different workers don't
+overwrite each other's changes.
+"""
+import contextlib
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines
+    fcntl = None
+
+
+_local = OrderedDict()  # key -> (expires, value), least recently used first
+_lock = threading.Lock()
+_update_lock = threading.Lock()  # stands in for locked() without fcntl
+
+
+def shared_cache():
+    """The level-2 cache backend (CONTENT_CACHE)."""
+    return caches[settings.CONTENT_CACHE]
+
+
+def get_cached(key, loader):
+    """
+    Return the cached value for key, calling loader() on a miss at both levels.
+
+    loader() must return a picklable value; None is not cached.
+    """
+    now = time.monotonic()
+    with _lock:
+        hit = _local.get(key)
+        if hit is not None:
+            if hit[0] > now:
+                _local.move_to_end(key)
+                return hit[1]
+            del _local[key]
+
+    value = shared_cache().get(key)
+    if value is None:
+        value = loader()
+        if value is None:
+            return None
+        shared_cache().set(key, value, settings.CONTENT_CACHE_TIMEOUT)
+
+    _remember(key, value, now)
+    return value
+
+
+def _remember(key, value, now):
+    with _lock:
+        _local[key] = (now + settings.CONTENT_CACHE_LOCAL_TTL, value)
+        _local.move_to_end(key)
+        while len(_local) > settings.CONTENT_CACHE_LOCAL_MAX_ENTRIES:
+            _local.popitem(last=False)
+
+
+def store(key, value):
+    """Replace key's value at both levels (for entries updated in place rather than reloaded)."""
+    shared_cache().set(key, value, settings.CONTENT_CACHE_TIMEOUT)
+    _remember(key, value, time.monotonic())
+
+
+@contextlib.contextmanager
+def locked(key):
+    """Hold key's host-wide update lock for a read-modify-store of its shared value."""
+    if fcntl is None:
+        with _update_lock:
+            yield
+        return
+    os.makedirs(settings.CONTENT_CACHE_LOCK_DIR, exist_ok=True)
+    name = hashlib.sha256(key.encode("utf-8")).hexdigest()[:20]
+    fd = os.open(os.path.join(settings.CONTENT_CACHE_LOCK_DIR, f"{name}.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def invalidate(*keys):
+    """Drop keys from both cache levels."""
+    with _lock:
+        for key in keys:
+            _local.pop(key, None)
+    shared_cache().delete_many(keys)
+
+
+def clear_local():
+    """Forget every process-local entry (tests, settings changes)."""
+    with _lock:
+        _local.clear()
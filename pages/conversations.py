@@ -0,0 +1,47 @@
+"""
+Server-side conversation store for the website assistant (ai_assist).
+
+The widget sends only the new message and the opaque conversation id from
+the previous reply. The turns live here, in the ASSIST_CONVERSATION_CACHE
+cache (the host-wide "shared" cache by default). The client can no longer
+rewrite what the assistant "said" earlier or add turns with other roles.
+
+A record is {"turns": [{"role", "content"}, ...]}. User messages are stored
+redacted and cut to ASSIST_MESSAGE_TOKENS, and at most
+ASSIST_CONVERSATION_MAX_TURNS messages are kept (oldest dropped first).
+Records expire ASSIST_CONVERSATION_TTL seconds after their last turn. Ids
+are random and only ever issued by the server; an unknown or expired id
+starts a new conversation rather than adopting the client's value.
+"""
+import re
+import secrets
+
+from django.conf import settings
+from django.core.cache import caches
+
+KEY_PREFIX = "assist:conversation:"
+ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{22}")
+
+
+def _cache():
+    return caches[settings.ASSIST_CONVERSATION_CACHE]
+
+
+def new_id():
+    return secrets.token_urlsafe(16)
+
+
+def load(conversation_id):
+    """(conversation_id, turns) for an existing conversation, or a new id with no turns."""
+    if isinstance(conversation_id, str) and ID_PATTERN.fullmatch(conversation_id):
+        record = _cache().get(KEY_PREFIX + conversation_id)
+        if record is not None:
+            return conversation_id, record["turns"]
+    return new_id(), []
+
+
+def append(conversation_id, turns, *new_turns):
+    """Store turns plus new_turns, capped to the newest ASSIST_CONVERSATION_MAX_TURNS."""
+    turns = (list(turns) + list(new_turns))[-settings.ASSIST_CONVERSATION_MAX_TURNS:]
+    _cache().set(KEY_PREFIX + conversation_id, {"turns": turns}, settings.ASSIST_CONVERSATION_TTL)
+    return turns
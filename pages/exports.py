@@ -0,0 +1,156 @@
+"""
+Streaming data exports for the owner area.
+
+Intake sessions, booking submissions and availability slots can be
+downloaded as CSV or JSON Lines. Rows are read with
+``QuerySet.iterator(chunk_size=...)`` (a server-side cursor on PostgreSQL,
+chunked fetches on SQLite) and written straight to a
+``StreamingHttpResponse``, so memory use stays flat however many rows exist.
+"""
+import csv
+import json
+from datetime import date, datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.http import StreamingHttpResponse
+
+from .models import IntakeSession, BookingSubmission, AvailabilitySlot
+
+EXPORT_CHUNK_SIZE = 500
+
+# Leading characters that make Excel/Sheets treat a cell as a formula (CSV injection)
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+
+# dataset name -> model, field used for the date-range filter, exported columns
+EXPORT_DATASETS = {
+    "intakes": {
+        "model": IntakeSession,
+        "date_field": "created_at",
+        "fields": [
+            "uuid", "created_at", "name", "email", "raw_text",
+            "is_suitable", "recommended_slot_type", "structured_output",
+        ],
+    },
+    "bookings": {
+        "model": BookingSubmission,
+        "date_field": "created_at",
+        "fields": [
+            "id", "created_at", "name", "email", "phone", "description", "is_paid",
+            "slot__date", "slot__start_time", "slot__end_time", "slot__slot_type",
+            "intake__uuid",
+        ],
+    },
+    "availability": {
+        "model": AvailabilitySlot,
+        "date_field": "date",
+        "fields": [
+            "id", "date", "start_time", "end_time", "slot_type", "is_available",
+            "notes", "created_at", "updated_at",
+        ],
+    },
+}
+
+
+class ExportError(ValueError):
+    """Raised when an export is requested with an unknown dataset, format or filter."""
+    pass
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for streaming csv.writer output."""
+    def write(self, value):
+        return value
+
+
+def _parse_date(value, param):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise ExportError(f"'{param}' must be a date in YYYY-MM-DD format")
+
+
+def export_queryset(dataset, start=None, end=None):
+    """
+    Build the values_list queryset for a dataset, filtered to an inclusive date range.
+
+    Args:
+        dataset (str): One of EXPORT_DATASETS
+        start (str): Optional first date (YYYY-MM-DD)
+        end (str): Optional last date (YYYY-MM-DD)
+
+    Returns:
+        tuple: (column names, queryset of row tuples)
+    """
+    spec = EXPORT_DATASETS.get(dataset)
+    if spec is None:
+        raise ExportError(f"Unknown export '{dataset}'")
+
+    start_date = _parse_date(start, "start")
+    end_date = _parse_date(end, "end")
+
+    date_field = spec["date_field"]
+    model = spec["model"]
+    if isinstance(model._meta.get_field(date_field), models.DateTimeField):
+        date_field = f"{date_field}__date"
+
+    filters = {}
+    if start_date:
+        filters[f"{date_field}__gte"] = start_date
+    if end_date:
+        filters[f"{date_field}__lte"] = end_date
+
+    qs = model.objects.filter(**filters).order_by("pk").values_list(*spec["fields"])
+    return spec["fields"], qs
+
+
+def _cell(value):
+    """Flatten a value for a CSV cell, neutralising anything a spreadsheet would evaluate."""
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, cls=DjangoJSONEncoder)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # Client-supplied text (names, descriptions) must not run as a formula in a spreadsheet
+        return "'" + value
+    return value
+
+
+def _csv_rows(columns, qs):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in qs.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield writer.writerow([_cell(v) for v in row])
+
+
+def _jsonl_rows(columns, qs):
+    for row in qs.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + "\n"
+
+
+def streaming_export(dataset, fmt, start=None, end=None):
+    """
+    Return a StreamingHttpResponse with the dataset in the requested format.
+
+    Raises:
+        ExportError: If the dataset, format or date filters are invalid
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError(f"Unknown export format '{fmt}'")
+
+    columns, qs = export_queryset(dataset, start=start, end=end)
+    rows = _csv_rows(columns, qs) if fmt == "csv" else _jsonl_rows(columns, qs)
+
+    response = StreamingHttpResponse(rows, content_type=EXPORT_FORMATS[fmt])
+    stamp = date.today().strftime("%Y%m%d")
+    response["Content-Disposition"] = f'attachment; filename="{dataset}_{stamp}.{fmt}"'
+    return response
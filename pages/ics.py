@@ -0,0 +1,91 @@
+"""
+iCalendar (RFC 5545) helpers shared by the owner's calendar feed and the
+per-booking invites attached to confirmation emails.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def ics_escape(text):
+    """
+    Escape special characters for iCalendar text fields per RFC 5545.
+    Backslash, semicolon, comma, newline must be escaped.
+    """
+    if not text:
+        return ""
+    text = str(text)
+    # Order matters: escape backslash first
+    text = text.replace('\\', '\\\\')
+    text = text.replace(';', '\\;')
+    text = text.replace(',', '\\,')
+    text = text.replace('\r\n', '\\n')
+    text = text.replace('\n', '\\n')
+    text = text.replace('\r', '\\n')
+    return text
+
+
+def ics_datetime(value):
+    """UTC timestamp in iCalendar form (YYYYMMDDTHHmmssZ)."""
+    return value.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def slot_datetimes(slot):
+    """Timezone-aware (start, end) datetimes for an AvailabilitySlot."""
+    return (
+        timezone.make_aware(datetime.combine(slot.date, slot.start_time)),
+        timezone.make_aware(datetime.combine(slot.date, slot.end_time)),
+    )
+
+
+def chambers_location():
+    return f"{settings.CHAMBERS_ADDRESS_LINE1}, {settings.CHAMBERS_ADDRESS_LINE2}"
+
+
+def vevent(uid, start, end, summary, description, location):
+    """Lines of one VEVENT; text fields are escaped here."""
+    return [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{ics_datetime(timezone.now())}",
+        f"DTSTART:{ics_datetime(start)}",
+        f"DTEND:{ics_datetime(end)}",
+        f"SUMMARY:{ics_escape(summary)}",
+        f"DESCRIPTION:{ics_escape(description)}",
+        f"LOCATION:{ics_escape(location)}",
+        "STATUS:CONFIRMED",
+        "TRANSP:OPAQUE",
+        "END:VEVENT",
+    ]
+
+
+def vcalendar(events, method="PUBLISH", name=None):
+    """A complete calendar from lists of VEVENT lines, joined with CRLF as RFC 5545 requires."""
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:-//{ics_escape(settings.SITE_NAME)}//Booking Calendar//EN",
+        "CALSCALE:GREGORIAN",
+        f"METHOD:{method}",
+    ]
+    if name:
+        lines += [f"X-WR-CALNAME:{ics_escape(name)}", "X-WR-TIMEZONE:UTC"]
+    for event in events:
+        lines.extend(event)
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(lines)
+
+
+def booking_invite(booking, domain):
+    """Single-event calendar for the client's confirmation email."""
+    start, end = slot_datetimes(booking.slot)
+    event = vevent(
+        uid=f"booking-{booking.pk}@{domain}",
+        start=start,
+        end=end,
+        summary=f"Consultation with {settings.BARRISTER_NAME}",
+        description=f"{booking.slot.get_slot_type_display()}. Booking reference: {booking.pk}.",
+        location=chambers_location(),
+    )
+    return vcalendar([event], method="PUBLISH")
@@ -0,0 +1,181 @@
+"""
+Full AI analysis of intake sessions.
+
+Shared by the owner "Analyse" button (one session inside the request) and the
+``analyse_intakes`` management command, which re-runs analysis for many
+sessions with a bounded thread pool, retries of transient failures with
+exponential backoff and bulk writes of the results.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import httpx
+import requests
+from django.conf import settings
+from django.db.models import Q
+
+from .llm_cache import cached_llm_result, acached_llm_result
+from .llm_resilience import RetryableStatusError
+from .llm_utils import call_llm_json, acall_llm_json, LLMError
+from .models import IntakeSession
+from .prompts import get_prompt
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_PROMPT = "intake_prompt.txt"
+
+# Causes of an LLMError worth another attempt; configuration errors and bad replies are not
+TRANSIENT_CAUSES = (requests.exceptions.Timeout, httpx.TimeoutException, RetryableStatusError)
+
+
+def load_analysis_prompt():
+    """
+    Return the full intake analysis Prompt (cached by the prompt registry).
+
+    Raises:
+        FileNotFoundError: If ai/prompts/intake_prompt.txt is missing
+    """
+    return get_prompt(ANALYSIS_PROMPT)
+
+
+def _require_object(result):
+    if not isinstance(result, dict):
+        raise LLMError(f"Analysis reply was a JSON {type(result).__name__}, not an object")
+    return result
+
+
+def analyse_text(prompt, raw_text):
+    """
+    Run the analysis prompt against a single enquiry.
+
+    Returns:
+        dict: Parsed analysis JSON (memoised per prompt version and enquiry text),
+            tagged with the prompt version that produced it
+
+    Raises:
+        LLMError: If the LLM call fails or the reply is not a JSON object
+    """
+    result = cached_llm_result("analysis", prompt, raw_text, lambda: _require_object(call_llm_json(
+        system_prompt=prompt.text,
+        user_prompt=raw_text,
+        temperature=0.2,
+        max_tokens=1500,
+        timeout=30
+    )))
+    result["prompt_version"] = prompt.version
+    return result
+
+
+async def aanalyse_text(prompt, raw_text):
+    """Async version of analyse_text (ASGI views)."""
+    async def call():
+        return _require_object(await acall_llm_json(
+            system_prompt=prompt.text,
+            user_prompt=raw_text,
+            temperature=0.2,
+            max_tokens=1500,
+            timeout=30
+        ))
+
+    result = await acached_llm_result("analysis", prompt, raw_text, call)
+    result["prompt_version"] = prompt.version
+    return result
+
+
+def unanalysed_sessions():
+    """Sessions that have never had a full analysis (triage results alone don't count)."""
+    return IntakeSession.objects.filter(
+        Q(structured_output__isnull=True) | ~Q(structured_output__has_key="case_type")
+    )
+
+
+def stale_sessions():
+    """Sessions whose full analysis was produced by an older version of the analysis prompt."""
+    version = load_analysis_prompt().version
+    return IntakeSession.objects.filter(structured_output__has_key="case_type").filter(
+        ~Q(structured_output__has_key="prompt_version") | ~Q(structured_output__prompt_version=version)
+    )
+
+
+def is_transient(error):
+    """Whether an LLMError came from a timeout or a retryable status (worth another attempt)."""
+    return isinstance(error.__cause__ or error.__context__, TRANSIENT_CAUSES)
+
+
+def _analyse_with_retry(prompt, raw_text, retries, backoff):
+    attempt = 0
+    while True:
+        try:
+            return analyse_text(prompt, raw_text)
+        except LLMError as e:
+            if attempt >= retries or not is_transient(e):
+                raise
+            time.sleep(backoff * (2 ** attempt))
+            attempt += 1
+
+
+def batch_analyse(sessions, concurrency=None, retries=2, backoff=1.0, batch_size=50, progress=None):
+    """
+    Analyse many intake sessions concurrently and write the results back in bulk.
+
+    LLM calls run in a thread pool; only the calling thread touches the database,
+    so worker threads never open their own connections.
+
+    Args:
+        sessions (iterable): IntakeSession instances (raw_text must be loaded)
+        concurrency (int): Maximum simultaneous LLM calls (default INTAKE_ANALYSIS_CONCURRENCY)
+        retries (int): Extra attempts per session after a transient LLMError (timeout, 429/5xx)
+        backoff (float): Base delay in seconds, doubled on each retry
+        batch_size (int): Number of results per bulk_update
+        progress (callable): Optional progress(done, total, failed) callback
+
+    Returns:
+        dict: {"total", "succeeded", "failed", "errors": {uuid: message}}
+
+    Raises:
+        FileNotFoundError: If the analysis prompt file is missing
+    """
+    prompt = load_analysis_prompt()
+    concurrency = concurrency or settings.INTAKE_ANALYSIS_CONCURRENCY
+    sessions = list(sessions)
+
+    stats = {"total": len(sessions), "succeeded": 0, "failed": 0, "errors": {}}
+    pending = []
+
+    def flush():
+        if pending:
+            IntakeSession.objects.bulk_update(pending, ["structured_output"], batch_size=batch_size)
+            pending.clear()
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            futures = {
+                pool.submit(_analyse_with_retry, prompt, session.raw_text, retries, backoff): session
+                for session in sessions
+            }
+            for future in as_completed(futures):
+                session = futures[future]
+                try:
+                    # Same semantics as the owner view: replace structured_output,
+                    # leave is_suitable/recommended_slot_type to triage
+                    session.structured_output = future.result()
+                    pending.append(session)
+                    stats["succeeded"] += 1
+                except LLMError as e:
+                    stats["failed"] += 1
+                    stats["errors"][str(session.uuid)] = str(e)
+                except Exception as e:
+                    # e.g. a reply that is valid JSON but not an object; one bad session must not end the run
+                    logger.exception("Analysis of intake %s failed", session.uuid)
+                    stats["failed"] += 1
+                    stats["errors"][str(session.uuid)] = f"{type(e).__name__}: {e}"
+
+                if len(pending) >= batch_size:
+                    flush()
+                if progress:
+                    progress(stats["succeeded"] + stats["failed"], stats["total"], stats["failed"])
+    finally:
+        # Keep whatever finished, even if the run is interrupted
+        flush()
+    return stats
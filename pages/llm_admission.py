@@ -0,0 +1,133 @@
+"""
+Admission control for LLM-bound requests, shared by all workers on the host.
+
+A slow LLM provider can otherwise tie up every gunicorn thread in
+ai_assist, intake_thank_you and owner_intake_analyse, so that nothing is
+left to serve ordinary pages. Each endpoint class ("assist", "triage",
+"analysis") gets LLM_CONCURRENCY[cls] slots and LLM_QUEUE_SIZE[cls] waiting
+places:
+
+- a request takes a free slot and makes its LLM call;
+- if every slot is busy it takes a waiting place and polls for a slot for
+  up to LLM_QUEUE_TIMEOUT seconds;
+- if every waiting place is taken too, or the wait runs out, it is refused
+  at once with LLMBusyError (an LLMError, so the views' existing fallbacks
+  apply; ai_assist also answers 503 with Retry-After).
+
+Slots and waiting places are files in LLM_ADMISSION_DIR held with flock(),
+so they are shared across processes on the host, like the "shared" cache.
+The kernel releases the lock when the descriptor is closed, including when
+a worker is killed mid-request, so a crash cannot leak a slot. A limit of 0
+turns admission control off for that class, as it is on platforms without
+fcntl.
+"""
+import asyncio
+import contextlib
+import logging
+import os
+import time
+
+from django.conf import settings
+
+from .llm_utils import LLMError
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 0.05
+
+
+class LLMBusyError(LLMError):
+    """Raised when an endpoint class has no free slot or waiting place."""
+    def __init__(self, endpoint_class, reason):
+        self.endpoint_class = endpoint_class
+        self.retry_after = settings.LLM_BUSY_RETRY_AFTER
+        super().__init__(f"LLM capacity for {endpoint_class} requests is exhausted ({reason})")
+
+
+def _lock(endpoint_class, kind, count):
+    """Hold the first free ``<class>.<kind>.<n>`` lock file; the open fd, or None."""
+    os.makedirs(settings.LLM_ADMISSION_DIR, exist_ok=True)
+    for n in range(count):
+        path = os.path.join(settings.LLM_ADMISSION_DIR, f"{endpoint_class}.{kind}.{n}")
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except BlockingIOError:
+            os.close(fd)
+    return None
+
+
+def _release(fd):
+    if fd is not None:
+        os.close(fd)
+
+
+def _try_slot(endpoint_class):
+    return _lock(endpoint_class, "slot", settings.LLM_CONCURRENCY[endpoint_class])
+
+
+def _shed(endpoint_class, reason):
+    logger.warning("Shedding %s LLM request: %s", endpoint_class, reason)
+    return LLMBusyError(endpoint_class, reason)
+
+
+def _enabled(endpoint_class):
+    return fcntl is not None and settings.LLM_CONCURRENCY.get(endpoint_class, 0) > 0
+
+
+@contextlib.contextmanager
+def admit(endpoint_class):
+    """Hold one of endpoint_class's LLM slots for the block, waiting in the queue if need be."""
+    if not _enabled(endpoint_class):
+        yield
+        return
+    slot = _try_slot(endpoint_class)
+    if slot is None:
+        ticket = _lock(endpoint_class, "queue", settings.LLM_QUEUE_SIZE[endpoint_class])
+        if ticket is None:
+            raise _shed(endpoint_class, "queue full")
+        try:
+            deadline = time.monotonic() + settings.LLM_QUEUE_TIMEOUT
+            while slot is None and time.monotonic() < deadline:
+                time.sleep(POLL_INTERVAL)
+                slot = _try_slot(endpoint_class)
+        finally:
+            _release(ticket)
+        if slot is None:
+            raise _shed(endpoint_class, "queue wait timed out")
+    try:
+        yield
+    finally:
+        _release(slot)
+
+
+@contextlib.asynccontextmanager
+async def aadmit(endpoint_class):
+    """Async version of admit(); waits with asyncio.sleep (the locks are never blocking)."""
+    if not _enabled(endpoint_class):
+        yield
+        return
+    slot = _try_slot(endpoint_class)
+    if slot is None:
+        ticket = _lock(endpoint_class, "queue", settings.LLM_QUEUE_SIZE[endpoint_class])
+        if ticket is None:
+            raise _shed(endpoint_class, "queue full")
+        try:
+            deadline = time.monotonic() + settings.LLM_QUEUE_TIMEOUT
+            while slot is None and time.monotonic() < deadline:
+                await asyncio.sleep(POLL_INTERVAL)
+                slot = _try_slot(endpoint_class)
+        finally:
+            _release(ticket)
+        if slot is None:
+            raise _shed(endpoint_class, "queue wait timed out")
+    try:
+        yield
+    finally:
+        _release(slot)
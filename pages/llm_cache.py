@@ -0,0 +1,127 @@
+"""
+Content-hash memoisation of LLM triage and analysis results.
+
+Double-submitted enquiries (the same text sent twice through /intake/ or
+/contact/) would otherwise trigger a fresh LLM call each time. Results are
+stored in the LLM_RESULT_CACHE cache (the host-wide "shared" cache by
+default, so a resubmission served by another worker is deduped too) under a
+key built from the prompt version, the model and a hash of the normalised
+enquiry text, so a changed prompt or model never reuses an old answer.
+
+Lookups use LLM_MODEL. A result is stored under the model that actually
+produced it (llm_resilience.answered_by), so an answer from the hedged
+fallback model is not served later as if the primary model had given it.
+
+Hit/miss counters are kept in the same cache. Increments are not atomic
+across processes, so under heavy concurrency a few samples may be lost.
+"""
+import hashlib
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from .llm_resilience import answered_by
+
+
+STATS_KEYS = {
+    "hits": "llm_result_cache:hits",
+    "misses": "llm_result_cache:misses",
+}
+
+
+def normalise_text(text):
+    """Lowercase and collapse whitespace so trivially different copies share a key."""
+    return re.sub(r"\s+", " ", (text or "")).strip().lower()
+
+
+def result_key(kind, prompt_version, raw_text, model=None):
+    """Cache key for an LLM result: (kind, prompt version, model, text hash)."""
+    model = model or settings.LLM_MODEL
+    digest = hashlib.sha256(normalise_text(raw_text).encode("utf-8")).hexdigest()
+    model_tag = hashlib.sha256(model.encode("utf-8")).hexdigest()[:8]
+    return f"llm_result:{kind}:{prompt_version}:{model_tag}:{digest}"
+
+
+def _cache():
+    return caches[settings.LLM_RESULT_CACHE]
+
+
+def _count(name):
+    key = STATS_KEYS[name]
+    cache = _cache()
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr(); losing one sample is fine
+        pass
+
+
+def lookup_result(kind, prompt, raw_text):
+    """The memoised result for an enquiry, or None (counted as a hit or miss)."""
+    result = _cache().get(result_key(kind, prompt.version, raw_text))
+    _count("hits" if result is not None else "misses")
+    return result
+
+
+def store_result(kind, prompt, raw_text, result, model=None):
+    """Memoise a result computed elsewhere (e.g. by a batched triage call); model defaults to LLM_MODEL."""
+    _cache().set(result_key(kind, prompt.version, raw_text, model), result, settings.LLM_RESULT_CACHE_TTL)
+
+
+def cached_llm_result(kind, prompt, raw_text, call):
+    """
+    Return a memoised LLM result, calling the LLM only on a cache miss.
+
+    Args:
+        kind (str): Result family, e.g. "triage" or "analysis"
+        prompt (Prompt): Prompt from the registry (its version is part of the key)
+        raw_text (str): Enquiry text sent as the user prompt
+        call (callable): Zero-argument function that performs the LLM call
+
+    Returns:
+        dict: The cached or freshly computed result
+
+    Raises:
+        LLMError: Propagated from ``call``; failures are never cached
+    """
+    result = lookup_result(kind, prompt, raw_text)
+    if result is not None:
+        return result
+
+    answered_by.set(None)
+    result = call()
+    store_result(kind, prompt, raw_text, result, model=answered_by.get())
+    return result
+
+
+async def acached_llm_result(kind, prompt, raw_text, call):
+    """Async version of cached_llm_result; ``call`` returns an awaitable."""
+    cache = _cache()
+    result = await cache.aget(result_key(kind, prompt.version, raw_text))
+    if result is not None:
+        await sync_to_async(_count)("hits")
+        return result
+
+    await sync_to_async(_count)("misses")
+    answered_by.set(None)
+    result = await call()
+    key = result_key(kind, prompt.version, raw_text, answered_by.get())
+    await cache.aset(key, result, settings.LLM_RESULT_CACHE_TTL)
+    return result
+
+
+def result_cache_stats():
+    """Return hit/miss counts and the dedupe rate (hits / lookups)."""
+    cache = _cache()
+    hits = cache.get(STATS_KEYS["hits"], 0)
+    misses = cache.get(STATS_KEYS["misses"], 0)
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "lookups": lookups,
+        "dedupe_rate": (hits / lookups) if lookups else 0.0,
+    }
@@ -0,0 +1,369 @@
+"""
+Resilience layer for outbound LLM requests.
+
+Provides:
+- ``CircuitBreaker``: per-endpoint breaker whose counters live in the shared
+  cache (see ``LLM_CIRCUIT_CACHE``) so every worker process sees the same
+  state. When the error rate over a rolling window is too high the circuit
+  opens and callers fail fast instead of waiting out the full timeout.
+- ``post_with_retry``: jittered exponential retry for 429/5xx responses and
+  connection errors. Timeouts are not retried - they have already used the
+  caller's time budget.
+- ``hedged_call``: if the primary endpoint has not answered after
+  ``LLM_HEDGE_AFTER`` seconds, the same request is sent to the fallback
+  endpoint and whichever succeeds first wins.
+
+Each has an async counterpart (``apost_with_retry``, ``ahedged_call``) built
+on httpx for the ASGI views.
+"""
+import asyncio
+import contextvars
+import hashlib
+import logging
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import NamedTuple
+
+import httpx
+import requests
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Model of the endpoint whose response hedged_call/ahedged_call last returned in this
+# thread or task (the fallback's when the hedge won); llm_cache keys results by it
+answered_by = contextvars.ContextVar("llm_answered_by", default=None)
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the endpoint's circuit is open."""
+    pass
+
+
+class RetryableStatusError(Exception):
+    """Raised for a 429/5xx response once retries are exhausted."""
+    def __init__(self, response):
+        self.response = response
+        super().__init__(f"LLM API returned HTTP {response.status_code}")
+
+
+class Endpoint(NamedTuple):
+    base_url: str
+    api_key: str
+    model: str
+
+    @property
+    def key(self):
+        return hashlib.sha256(self.base_url.encode("utf-8")).hexdigest()[:12]
+
+
+def primary_endpoint():
+    return Endpoint(settings.LLM_BASE_URL, settings.LLM_API_KEY, settings.LLM_MODEL)
+
+
+def fallback_endpoint():
+    """The hedge/fallback endpoint, or None when LLM_FALLBACK_BASE_URL is not set."""
+    if not settings.LLM_FALLBACK_BASE_URL:
+        return None
+    return Endpoint(
+        settings.LLM_FALLBACK_BASE_URL,
+        settings.LLM_FALLBACK_API_KEY or settings.LLM_API_KEY,
+        settings.LLM_FALLBACK_MODEL or settings.LLM_MODEL,
+    )
+
+
+class CircuitBreaker:
+    """
+    Error-rate circuit breaker with state in the shared cache.
+
+    Outcomes are counted in fixed windows of ``LLM_CIRCUIT_WINDOW`` seconds.
+    Once a window has at least ``LLM_CIRCUIT_MIN_REQUESTS`` calls and the
+    failure ratio reaches ``LLM_CIRCUIT_FAILURE_RATE``, the circuit opens for
+    ``LLM_CIRCUIT_COOLDOWN`` seconds. After the cooldown calls are let through
+    again (half-open); continued failures re-open it.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def cache(self):
+        return caches[settings.LLM_CIRCUIT_CACHE]
+
+    def _window_keys(self, now):
+        bucket = int(now // settings.LLM_CIRCUIT_WINDOW)
+        prefix = f"llm_circuit:{self.name}:{bucket}"
+        return f"{prefix}:ok", f"{prefix}:fail"
+
+    def _open_key(self):
+        return f"llm_circuit:{self.name}:open_until"
+
+    def _incr(self, key):
+        self.cache.add(key, 0, timeout=settings.LLM_CIRCUIT_WINDOW * 2)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            return 1
+
+    def is_open(self):
+        return time.time() < (self.cache.get(self._open_key()) or 0)
+
+    def before_call(self):
+        """Raise CircuitOpenError if calls to this endpoint should fail fast."""
+        if self.is_open():
+            raise CircuitOpenError(f"LLM circuit '{self.name}' is open")
+
+    def record_success(self):
+        ok_key, _ = self._window_keys(time.time())
+        self._incr(ok_key)
+
+    def record_failure(self):
+        now = time.time()
+        ok_key, fail_key = self._window_keys(now)
+        failures = self._incr(fail_key)
+        total = failures + (self.cache.get(ok_key) or 0)
+        if total >= settings.LLM_CIRCUIT_MIN_REQUESTS and failures / total >= settings.LLM_CIRCUIT_FAILURE_RATE:
+            self.cache.set(self._open_key(), now + settings.LLM_CIRCUIT_COOLDOWN, timeout=settings.LLM_CIRCUIT_COOLDOWN)
+
+    def reset(self):
+        now = time.time()
+        self.cache.delete_many([self._open_key(), *self._window_keys(now)])
+
+
+def _retry_delay(attempt, response=None):
+    """Full-jitter exponential backoff, honouring a numeric Retry-After header."""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), settings.LLM_RETRY_MAX_DELAY)
+    ceiling = min(settings.LLM_RETRY_MAX_DELAY, settings.LLM_RETRY_BASE_DELAY * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+def post_with_retry(endpoint, payload, timeout):
+    """
+    POST a chat completion to one endpoint, guarded by its circuit breaker.
+
+    Returns:
+        requests.Response: A successful (2xx) response
+
+    Raises:
+        CircuitOpenError: If the endpoint's circuit is open
+        RetryableStatusError: If 429/5xx responses persist after retries
+        requests.exceptions.RequestException: For timeouts and other request errors
+    """
+    breaker = CircuitBreaker(endpoint.key)
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            resp = requests.post(
+                f"{endpoint.base_url}/chat/completions",
+                headers={
+                    "Authorization": f"Bearer {endpoint.api_key}",
+                    "Content-Type": "application/json",
+                },
+                json={**payload, "model": endpoint.model},
+                timeout=timeout,
+            )
+        except requests.exceptions.Timeout:
+            breaker.record_failure()
+            raise
+        except requests.exceptions.ConnectionError:
+            breaker.record_failure()
+            if attempt >= settings.LLM_MAX_RETRIES:
+                raise
+            time.sleep(_retry_delay(attempt))
+            attempt += 1
+            continue
+
+        if resp.status_code in RETRYABLE_STATUS:
+            breaker.record_failure()
+            if attempt >= settings.LLM_MAX_RETRIES:
+                raise RetryableStatusError(resp)
+            time.sleep(_retry_delay(attempt, resp))
+            attempt += 1
+            continue
+
+        # Other 4xx are caller/config errors, not provider health
+        resp.raise_for_status()
+        breaker.record_success()
+        return resp
+
+
+# Each request thread needs at most two pool threads at once (primary + hedge); see LLM_HEDGE_POOL_SIZE
+_hedge_pool = ThreadPoolExecutor(max_workers=settings.LLM_HEDGE_POOL_SIZE, thread_name_prefix="llm-hedge")
+
+
+def _run_started(started, fn, *args):
+    started.set()
+    return fn(*args)
+
+
+def _answered(endpoint, response):
+    answered_by.set(endpoint.model)
+    return response
+
+
+def hedged_call(payload, timeout):
+    """
+    Send a chat completion to the primary endpoint, hedging to the fallback.
+
+    Without a fallback this is just ``post_with_retry`` on the primary. With
+    one, the fallback is used immediately if the primary circuit is open, or
+    raced against the primary once ``LLM_HEDGE_AFTER`` seconds have passed.
+
+    Returns:
+        requests.Response: The first successful response
+    """
+    primary = primary_endpoint()
+    fallback = fallback_endpoint()
+    if fallback is None:
+        return _answered(primary, post_with_retry(primary, payload, timeout))
+
+    if CircuitBreaker(primary.key).is_open():
+        return _answered(fallback, post_with_retry(fallback, payload, timeout))
+
+    hedge_after = settings.LLM_HEDGE_AFTER
+    started = threading.Event()
+    first = _hedge_pool.submit(_run_started, started, post_with_retry, primary, payload, timeout)
+    # Time the hedge from when the primary request starts, not from when it was queued.
+    # If the pool is saturated and has not picked it up within the window, send it from this thread.
+    if not started.wait(hedge_after if hedge_after > 0 else timeout) and first.cancel():
+        logger.warning("LLM hedge pool saturated; calling %s without hedging", primary.model)
+        return _answered(primary, post_with_retry(primary, payload, timeout))
+    if hedge_after <= 0:
+        done, _ = wait([first])
+    else:
+        done, _ = wait([first], timeout=hedge_after)
+
+    if first in done and first.exception() is None:
+        return _answered(primary, first.result())
+
+    # Primary is slow or failed: race (or fall back to) the secondary endpoint
+    endpoints = {_hedge_pool.submit(post_with_retry, fallback, payload, timeout): fallback}
+    if first not in done:
+        endpoints[first] = primary
+
+    error = first.exception() if first in done else None
+    pending = set(endpoints)
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return _answered(endpoints[future], future.result())
+                error = future.exception()
+    finally:
+        # A loser still queued never starts; one already sending runs out in its pool thread
+        for future in pending:
+            future.cancel()
+    raise error
+
+
+# ---------------------------------------------------------------------------
+# Async variants (ASGI mode). Same breaker, retry and hedging rules, using
+# httpx so a waiting request does not hold a worker thread.
+# ---------------------------------------------------------------------------
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _async_client():
+    """One pooled httpx.AsyncClient per event loop (keeps provider connections alive)."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient()
+        _async_clients[loop] = client
+    return client
+
+
+async def apost_with_retry(endpoint, payload, timeout):
+    """
+    Async version of post_with_retry.
+
+    Raises:
+        CircuitOpenError: If the endpoint's circuit is open
+        RetryableStatusError: If 429/5xx responses persist after retries
+        httpx.HTTPError: For timeouts and other request errors
+    """
+    breaker = CircuitBreaker(endpoint.key)
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            resp = await _async_client().post(
+                f"{endpoint.base_url}/chat/completions",
+                headers={
+                    "Authorization": f"Bearer {endpoint.api_key}",
+                    "Content-Type": "application/json",
+                },
+                json={**payload, "model": endpoint.model},
+                timeout=timeout,
+            )
+        except httpx.TimeoutException:
+            breaker.record_failure()
+            raise
+        except httpx.TransportError:
+            breaker.record_failure()
+            if attempt >= settings.LLM_MAX_RETRIES:
+                raise
+            await asyncio.sleep(_retry_delay(attempt))
+            attempt += 1
+            continue
+
+        if resp.status_code in RETRYABLE_STATUS:
+            breaker.record_failure()
+            if attempt >= settings.LLM_MAX_RETRIES:
+                raise RetryableStatusError(resp)
+            await asyncio.sleep(_retry_delay(attempt, resp))
+            attempt += 1
+            continue
+
+        resp.raise_for_status()
+        breaker.record_success()
+        return resp
+
+
+async def ahedged_call(payload, timeout):
+    """Async version of hedged_call."""
+    primary = primary_endpoint()
+    fallback = fallback_endpoint()
+    if fallback is None:
+        return _answered(primary, await apost_with_retry(primary, payload, timeout))
+
+    if CircuitBreaker(primary.key).is_open():
+        return _answered(fallback, await apost_with_retry(fallback, payload, timeout))
+
+    hedge_after = settings.LLM_HEDGE_AFTER
+    first = asyncio.ensure_future(apost_with_retry(primary, payload, timeout))
+    done, _ = await asyncio.wait([first], timeout=hedge_after if hedge_after > 0 else None)
+
+    if first in done and first.exception() is None:
+        return _answered(primary, first.result())
+
+    endpoints = {asyncio.ensure_future(apost_with_retry(fallback, payload, timeout)): fallback}
+    if first not in done:
+        endpoints[first] = primary
+
+    error = first.exception() if first in done else None
+    pending = set(endpoints)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return _answered(endpoints[task], task.result())
+                error = task.exception()
+    finally:
+        # Unlike threads, the losing request can be cancelled
+        for task in pending:
+            task.cancel()
+    raise error
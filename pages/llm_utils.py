@@ -2,12 +2,16 @@
 Shared utilities for LLM API calls.
 
 This module provides helpers for calling OpenAI-compatible LLM endpoints
-with structured response handling.
+with structured response handling. Retries, circuit breaking and hedging
+live in llm_resilience.py.
 """
 import json
+import httpx
 import requests
 from django.conf import settings
 
+from .llm_resilience import hedged_call, ahedged_call, CircuitOpenError, RetryableStatusError
+
 
 class LLMError(Exception):
     """Raised when LLM API call fails or returns invalid data."""
@@ -39,39 +43,13 @@ def call_llm_json(system_prompt, user_prompt, temperature=0.2, max_tokens=1500,
         {"role": "user", "content": user_prompt},
     ]
 
-    try:
-        resp = requests.post(
-            f"{settings.LLM_BASE_URL}/chat/completions",
-            headers={
-                "Authorization": f"Bearer {settings.LLM_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": settings.LLM_MODEL,
-                "messages": messages,
-                "temperature": temperature,
-                "max_tokens": max_tokens,
-            },
-            timeout=timeout,
-        )
-        resp.raise_for_status()
-        data = resp.json()
+    reply = call_llm_messages(messages, temperature=temperature, max_tokens=max_tokens, timeout=timeout)
 
-        # Extract the assistant's reply
-        reply = data["choices"][0]["message"]["content"].strip()
-
-        # Parse as JSON
-        try:
-            return json.loads(reply)
-        except json.JSONDecodeError as e:
-            raise LLMError(f"LLM response was not valid JSON: {e}") from e
-
-    except requests.exceptions.Timeout:
-        raise LLMError("LLM API request timed out")
-    except requests.exceptions.RequestException as e:
-        raise LLMError(f"LLM API request failed: {e}") from e
-    except (KeyError, IndexError) as e:
-        raise LLMError(f"Unexpected LLM API response format: {e}") from e
+    # Parse as JSON
+    try:
+        return json.loads(reply)
+    except json.JSONDecodeError as e:
+        raise LLMError(f"LLM response was not valid JSON: {e}") from e
 
 
 def call_llm_text(system_prompt, user_prompt, temperature=0.2, max_tokens=350, timeout=25):
@@ -101,30 +79,108 @@ def call_llm_text(system_prompt, user_prompt, temperature=0.2, max_tokens=350, t
         {"role": "user", "content": user_prompt},
     ]
 
+    return call_llm_messages(messages, temperature=temperature, max_tokens=max_tokens, timeout=timeout)
+
+
+def call_llm_messages(messages, temperature=0.2, max_tokens=350, timeout=25):
+    """
+    Call the configured LLM endpoint with a full message list and return the reply text.
+
+    Requests go through the resilience layer (pages/llm_resilience.py):
+    circuit breaker, jittered retry on 429/5xx and optional hedging to
+    LLM_FALLBACK_BASE_URL.
+
+    Args:
+        messages (list): OpenAI-style chat messages
+        temperature (float): LLM temperature (0.0-1.0, lower = more deterministic)
+        max_tokens (int): Maximum tokens in response
+        timeout (int): Per-attempt request timeout in seconds
+
+    Returns:
+        str: Plain text response from the LLM
+
+    Raises:
+        LLMError: If API call fails, the circuit is open, or response is invalid
+    """
+    if not settings.LLM_BASE_URL or not settings.LLM_API_KEY:
+        raise LLMError("LLM_BASE_URL and LLM_API_KEY must be configured in settings")
+
     try:
-        resp = requests.post(
-            f"{settings.LLM_BASE_URL}/chat/completions",
-            headers={
-                "Authorization": f"Bearer {settings.LLM_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": settings.LLM_MODEL,
+        resp = hedged_call(
+            {
                 "messages": messages,
                 "temperature": temperature,
                 "max_tokens": max_tokens,
             },
             timeout=timeout,
         )
-        resp.raise_for_status()
         data = resp.json()
 
         # Extract and return the assistant's reply
         return data["choices"][0]["message"]["content"].strip()
 
+    except CircuitOpenError as e:
+        raise LLMError(f"LLM API temporarily unavailable: {e}") from e
+    except RetryableStatusError as e:
+        raise LLMError(f"LLM API request failed: {e}") from e
     except requests.exceptions.Timeout:
         raise LLMError("LLM API request timed out")
     except requests.exceptions.RequestException as e:
         raise LLMError(f"LLM API request failed: {e}") from e
-    except (KeyError, IndexError) as e:
+    except (KeyError, IndexError, ValueError) as e:
         raise LLMError(f"Unexpected LLM API response format: {e}") from e
+
+
+
+async def acall_llm_messages(messages, temperature=0.2, max_tokens=350, timeout=25):
+    """
+    Async version of call_llm_messages (httpx; used by the ASGI views).
+
+    Raises:
+        LLMError: If API call fails, the circuit is open, or response is invalid
+    """
+    if not settings.LLM_BASE_URL or not settings.LLM_API_KEY:
+        raise LLMError("LLM_BASE_URL and LLM_API_KEY must be configured in settings")
+
+    try:
+        resp = await ahedged_call(
+            {
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+            },
+            timeout=timeout,
+        )
+        data = resp.json()
+        return data["choices"][0]["message"]["content"].strip()
+
+    except CircuitOpenError as e:
+        raise LLMError(f"LLM API temporarily unavailable: {e}") from e
+    except RetryableStatusError as e:
+        raise LLMError(f"LLM API request failed: {e}") from e
+    except httpx.TimeoutException:
+        raise LLMError("LLM API request timed out")
+    except httpx.HTTPError as e:
+        raise LLMError(f"LLM API request failed: {e}") from e
+    except (KeyError, IndexError, ValueError) as e:
+        raise LLMError(f"Unexpected LLM API response format: {e}") from e
+
+
+async def acall_llm_json(system_prompt, user_prompt, temperature=0.2, max_tokens=1500, timeout=30):
+    """
+    Async version of call_llm_json.
+
+    Raises:
+        LLMError: If API call fails, response is invalid, or JSON parsing fails
+    """
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+
+    reply = await acall_llm_messages(messages, temperature=temperature, max_tokens=max_tokens, timeout=timeout)
+
+    try:
+        return json.loads(reply)
+    except json.JSONDecodeError as e:
+        raise LLMError(f"LLM response was not valid JSON: {e}") from e
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pages.intake_analysis import batch_analyse, unanalysed_sessions, stale_sessions
+from pages.models import IntakeSession
+
+
+class Command(BaseCommand):
+    help = (
+        "Run full AI analysis for intake sessions in bulk. "
+        "By default only sessions without an analysis are processed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("uuids", nargs="*", help="Specific intake session UUIDs to (re-)analyse")
+        parser.add_argument("--all", action="store_true", help="Re-analyse every intake session, e.g. after a prompt change")
+        parser.add_argument("--stale", action="store_true", help="Also re-analyse sessions analysed with an older version of the prompt")
+        parser.add_argument("--limit", type=int, default=None, help="Process at most this many sessions")
+        parser.add_argument("--concurrency", type=int, default=None, help="Simultaneous LLM calls (default: INTAKE_ANALYSIS_CONCURRENCY)")
+        parser.add_argument("--retries", type=int, default=2, help="Retries per session on LLM errors")
+        parser.add_argument("--backoff", type=float, default=1.0, help="Base retry delay in seconds (doubles each retry)")
+        parser.add_argument("--batch-size", type=int, default=50, help="Results written per bulk update")
+
+    def handle(self, *args, **options):
+        if options["uuids"]:
+            qs = IntakeSession.objects.filter(uuid__in=options["uuids"])
+        elif options["all"]:
+            qs = IntakeSession.objects.all()
+        elif options["stale"]:
+            try:
+                qs = unanalysed_sessions() | stale_sessions()
+            except FileNotFoundError as e:
+                raise CommandError(f"AI intake prompt file not found: {e}")
+        else:
+            qs = unanalysed_sessions()
+
+        qs = qs.only("pk", "uuid", "raw_text", "structured_output").order_by("created_at")
+        if options["limit"]:
+            qs = qs[:options["limit"]]
+
+        sessions = list(qs)
+        if not sessions:
+            self.stdout.write("No intake sessions to analyse.")
+            return
+
+        self.stdout.write(f"Analysing {len(sessions)} intake session(s)...")
+
+        def progress(done, total, failed):
+            self.stdout.write(f"  {done}/{total} done ({failed} failed)")
+
+        try:
+            stats = batch_analyse(
+                sessions,
+                concurrency=options["concurrency"],
+                retries=options["retries"],
+                backoff=options["backoff"],
+                batch_size=options["batch_size"],
+                progress=progress,
+            )
+        except FileNotFoundError as e:
+            raise CommandError(f"AI intake prompt file not found: {e}")
+
+        for uuid, error in stats["errors"].items():
+            self.stderr.write(f"  {uuid}: {error}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Analysed {stats['succeeded']} of {stats['total']} session(s); {stats['failed']} failed."
+        ))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pages import query_audit
+
+
+class Command(BaseCommand):
+    help = (
+        "Request every page, run EXPLAIN on the SELECTs it issues and flag full table scans "
+        "(and, with --show-sorts, sorts that no index serves). Nothing is written to the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fail-on-scan", action="store_true",
+                            help="Exit with an error if any full table scan is found (for CI)")
+        parser.add_argument("--show-sorts", action="store_true", help="Also report sorts done outside an index")
+        parser.add_argument("--show-sql", action="store_true", help="Print the SQL of each flagged query")
+
+    def handle(self, *args, **options):
+        try:
+            report = query_audit.audit()
+        except NotImplementedError as e:
+            raise CommandError(str(e))
+
+        kinds = {"full scan", "sort"} if options["show_sorts"] else {"full scan"}
+        for name, view in report["views"].items():
+            found = [p for p in view["problems"] if p[0] in kinds]
+            flag = "!!" if found else "  "
+            self.stdout.write(f"{flag} {name:<32} {view['status']} {view['queries']:>3} queries  {view['url']}")
+            for kind, detail, sql in found:
+                self.stdout.write(f"     {kind}: {detail}")
+                if options["show_sql"]:
+                    self.stdout.write(f"       {sql}")
+        for name, reason in report["skipped"]:
+            self.stdout.write(f"   {name:<32} skipped ({reason})")
+
+        summary = query_audit.summary(report)
+        scans = summary.get("full scan", {})
+        for kind in sorted(kinds):
+            for detail, views in summary.get(kind, {}).items():
+                self.stdout.write(f"{kind}: {detail} ({len(views)} view(s): {', '.join(views)})")
+        if scans and options["fail_on_scan"]:
+            raise CommandError(f"{len(scans)} table(s) read with a full scan: {', '.join(sorted(scans))}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Audited {len(report['views'])} view(s); {len(scans)} table(s) with full scans."
+        ))
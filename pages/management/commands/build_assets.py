@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+import requests
+
+from pages import assets
+
+
+def _kb(size):
+    return "-" if size is None else f"{size / 1024:.1f} KB"
+
+
+class Command(BaseCommand):
+    help = (
+        "Vendor Bootstrap/Bootstrap Icons, purge unused CSS and write minified bundles to "
+        "static/dist/. Run before collectstatic; prints a page-weight report."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--refresh-vendor", action="store_true",
+                            help="Re-download vendored files even if they already exist")
+
+    def handle(self, *args, **options):
+        try:
+            fetched = assets.vendor(refresh=options["refresh_vendor"])
+        except requests.exceptions.RequestException as e:
+            raise CommandError(f"Could not download vendored assets: {e}")
+        except assets.VendorIntegrityError as e:
+            raise CommandError(str(e))
+        for rel, digest in fetched.items():
+            self.stdout.write(f"  vendored {rel}")
+            if assets.VENDOR_FILES[rel][1] is None:
+                self.stdout.write(self.style.WARNING(
+                    f"    not pinned; check the file and add {digest} to VENDOR_FILES"
+                ))
+
+        for bundle, size in assets.build().items():
+            self.stdout.write(f"  wrote    {bundle} ({_kb(size)})")
+        critical = assets.build_critical()
+        self.stdout.write(
+            f"  wrote    critical CSS for {len(critical)} templates "
+            f"({_kb(min(critical.values(), default=0))} - {_kb(max(critical.values(), default=0))})"
+        )
+
+        report = assets.page_weight()
+        self.stdout.write("\nPage weight (CSS + JS)      raw        gzip       brotli")
+        for label in ("before", "after"):
+            for kind in report[label]:
+                raw, gz, br = report[label][kind]
+                self.stdout.write(f"  {label:<7} {kind:<9}      {_kb(raw):>10} {_kb(gz):>10} {_kb(br):>10}")
+        self.stdout.write(self.style.SUCCESS(
+            "Bundles ready; collectstatic will fingerprint them and write .gz/.br variants."
+        ))
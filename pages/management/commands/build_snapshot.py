@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from pages import snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Render every public page to static HTML under STATIC_SNAPSHOT_DIR. "
+        "Only pages whose HTML changed are rewritten."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="*", help="Only rebuild these URL paths (e.g. /blog/my-post/)")
+
+    def handle(self, *args, **options):
+        stats = snapshot.build(options["paths"] or None)
+        for path in stats["written"]:
+            self.stdout.write(f"  wrote    {path}")
+        for path in stats["removed"]:
+            self.stdout.write(f"  removed  {path}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot in {snapshot.snapshot_dir()}: {len(stats['written'])} written, "
+            f"{len(stats['unchanged'])} unchanged, {len(stats['removed'])} removed."
+        ))
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from pages import retention
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive (JSONL.gz) and/or delete intake sessions, bookings and sent emails older than "
+        "the RETENTION_*_DAYS settings, in small keyset-ordered batches. The web service also runs this daily (RETENTION_INTERVAL)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("datasets", nargs="*", help=f"Datasets to purge (default: {', '.join(retention.RETENTION_POLICIES)})")
+        parser.add_argument("--mode", choices=retention.MODES, default=None,
+                            help="archive then delete, or delete only (default: RETENTION_MODE)")
+        parser.add_argument("--batch-size", type=int, default=None, help="Rows per batch (default: RETENTION_BATCH_SIZE)")
+        parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches")
+        parser.add_argument("--dry-run", action="store_true", help="Only count the rows that would be purged")
+
+    def handle(self, *args, **options):
+        datasets = options["datasets"] or list(retention.RETENTION_POLICIES)
+        mode = options["mode"] or settings.RETENTION_MODE
+
+        for dataset in datasets:
+            try:
+                stats = retention.purge(
+                    dataset,
+                    mode=mode,
+                    batch_size=options["batch_size"],
+                    dry_run=options["dry_run"],
+                    pause=options["pause"],
+                )
+            except retention.RetentionError as e:
+                raise CommandError(str(e))
+
+            if options["dry_run"]:
+                self.stdout.write(f"  {dataset:<9} {stats['rows']} row(s) would be purged")
+                continue
+            line = (f"  {dataset:<9} {stats['rows']} row(s) in {stats['batches']} batch(es), "
+                    f"{stats['seconds']:.2f}s, {stats['rows_per_second']:.0f} rows/s")
+            if stats["archive"]:
+                line += f" -> {stats['archive']}"
+            self.stdout.write(line)
+
+        if not options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(f"Retention purge complete ({mode})."))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from pages import outbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Send queued emails (booking confirmations, owner notifications) in batches over "
+        "one SMTP connection, retrying failures with backoff. Use --loop to run as a worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new emails instead of exiting")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds between polls when idle (--loop)")
+        parser.add_argument("--batch-size", type=int, default=None, help="Emails per batch (default: OUTBOX_BATCH_SIZE)")
+
+    def handle(self, *args, **options):
+        while True:
+            # Drain everything that is due, one connection per batch
+            totals = outbox.send_due(batch_size=options["batch_size"])
+
+            if any(totals.values()) or not options["loop"]:
+                self.stdout.write(
+                    f"Sent {totals['sent']} email(s); {totals['retrying']} will be retried, "
+                    f"{totals['failed']} failed permanently."
+                )
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from pages import triage
+
+# Seconds to wait after a failed request before trying the pending enquiries again
+FAILURE_BACKOFF = 10.0
+
+
+class Command(BaseCommand):
+    help = (
+        "Triage pending intake enquiries in batches, one LLM request per batch "
+        "(TRIAGE_MODE=batch). Use --loop to run as a worker; only with a database shared with "
+        "the web service, which otherwise runs this loop itself."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new enquiries instead of exiting")
+        parser.add_argument("--interval", type=float, default=0.5, help="Seconds between polls when idle (--loop)")
+        parser.add_argument("--batch-size", type=int, default=None, help="Enquiries per request (default: TRIAGE_BATCH_SIZE)")
+
+    def handle(self, *args, **options):
+        # A one-off run classifies whatever is pending without waiting for the window
+        window = None if options["loop"] else 0
+        while True:
+            totals = triage.run_pending(batch_size=options["batch_size"], window=window)
+
+            if totals["sessions"] or not options["loop"]:
+                self.stdout.write(
+                    f"Triaged {totals['batched'] + totals['individual'] + totals['cached']} of "
+                    f"{totals['sessions']} enquiry(ies) with {totals['llm_calls']} LLM call(s) "
+                    f"({totals['cached']} cached, {totals['individual']} individually); "
+                    f"{totals['failed'] - totals['abandoned']} left pending, {totals['abandoned']} given up on."
+                )
+            if not options["loop"]:
+                return
+            time.sleep(max(options["interval"], FAILURE_BACKOFF) if totals["failed"] else options["interval"])
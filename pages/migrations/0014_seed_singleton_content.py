@@ -0,0 +1,36 @@
+from django.db import migrations
+
+
+# Same defaults the public views fall back to
+SITE_PAGES = {
+    "about": {"title": "About", "body": ""},
+    "privacy": {
+        "title": "Privacy Policy",
+        "body": "<p>This is a placeholder privacy policy. Please update this content from the Owner area.</p>",
+    },
+    "terms": {
+        "title": "Terms of Use",
+        "body": "<p>This is a placeholder terms of use. Please update this content from the Owner area.</p>",
+    },
+}
+
+
+def seed_singleton_content(apps, schema_editor):
+    """Create the HomepageSettings row and core SitePages so public GETs never need to write."""
+    HomepageSettings = apps.get_model('pages', 'HomepageSettings')
+    SitePage = apps.get_model('pages', 'SitePage')
+
+    HomepageSettings.objects.get_or_create(pk=1)
+    for slug, defaults in SITE_PAGES.items():
+        SitePage.objects.get_or_create(slug=slug, defaults=defaults)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0013_bookingsubmission_intake'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_singleton_content, migrations.RunPython.noop),
+    ]
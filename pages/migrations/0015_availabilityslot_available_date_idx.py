@@ -0,0 +1,17 @@
+# Generated by Django 5.0.3 on 2026-10-19 15:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0014_seed_singleton_content'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='availabilityslot',
+            index=models.Index(fields=['is_available', 'date', 'start_time'], name='slot_available_date_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.3 on 2026-10-19 15:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0016_outboxemail'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='availabilityslot',
+            index=models.Index(fields=['date', 'start_time'], name='slot_date_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(condition=models.Q(('published', True)), fields=['-published_at', '-id'], name='pages_blogpost_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookingsubmission',
+            index=models.Index(fields=['slot', 'created_at'], name='booking_slot_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookingsubmission',
+            index=models.Index(fields=['-created_at'], name='booking_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='casestudy',
+            index=models.Index(condition=models.Q(('published', True)), fields=['-published_at', '-id'], name='pages_casestudy_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='intakesession',
+            index=models.Index(fields=['-created_at'], name='intake_created_idx'),
+        ),
+    ]
@@ -3,6 +3,8 @@ from django.urls import reverse
 from ckeditor.fields import RichTextField
 from uuid import uuid4
 
+from .content_cache import get_cached
+
 class Lead(models.Model):
     name = models.CharField(max_length=120)
     email = models.EmailField()
@@ -47,10 +49,22 @@ class HomepageSettings(models.Model):
         self.pk = 1
         super().save(*args, **kwargs)
 
+    CACHE_KEY = "content:homepage_settings"
+
     @classmethod
     def load(cls):
-        obj, created = cls.objects.get_or_create(pk=1)
-        return obj
+        """Uncached load for editing. The row is seeded by migration 0014."""
+        try:
+            return cls.objects.get(pk=1)
+        except cls.DoesNotExist:
+            obj, created = cls.objects.get_or_create(pk=1)
+            return obj
+
+    @classmethod
+    def cached(cls):
+        """Read-only instance for public pages, served from the content cache."""
+        # Fall back to an unsaved default instance so public GETs never write
+        return get_cached(cls.CACHE_KEY, lambda: cls.objects.filter(pk=1).first() or cls(pk=1))
 
 class TimeStamped(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
@@ -79,6 +93,22 @@ class SitePage(TimeStamped):
         )
         return page
 
+    @staticmethod
+    def cache_key(slug):
+        return f"content:site_page:{slug}"
+
+    @classmethod
+    def cached_page(cls, slug, title, body=""):
+        """
+        Read-only page for public views, served from the content cache.
+        If the page doesn't exist yet an unsaved instance with the defaults is
+        returned, so public GETs never write (pages are seeded by migration 0014).
+        """
+        return get_cached(
+            cls.cache_key(slug),
+            lambda: cls.objects.filter(slug=slug).first() or cls(slug=slug, title=title, body=body),
+        )
+
 class PracticeArea(models.Model):
     name = models.CharField(max_length=120)
     slug = models.SlugField(unique=True)
@@ -108,6 +138,16 @@ class PostBase(TimeStamped):
     class Meta:
         abstract = True
         ordering = ["-published_at", "-created_at"]
+        indexes = [
+            # Public listings: published=True newest first. Partial, because SQLite
+            # compiles the filter to a bare "WHERE published" that a
+            # (published, published_at) index cannot serve.
+            models.Index(
+                fields=["-published_at", "-id"],
+                condition=models.Q(published=True),
+                name="%(app_label)s_%(class)s_published_idx",
+            ),
+        ]
 
     def __str__(self): return self.title
 
@@ -146,6 +186,9 @@ class IntakeSession(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["-created_at"], name="intake_created_idx"),
+        ]
         verbose_name = "Intake Session"
         verbose_name_plural = "Intake Sessions"
 
@@ -182,6 +225,12 @@ class AvailabilitySlot(models.Model):
 
     class Meta:
         ordering = ['date', 'start_time']
+        indexes = [
+            # Month/date lookups of bookable slots (pages/availability.py)
+            models.Index(fields=['is_available', 'date', 'start_time'], name='slot_available_date_idx'),
+            # Date ranges and the owner list; also used when is_available is a bare column test (SQLite)
+            models.Index(fields=['date', 'start_time'], name='slot_date_start_idx'),
+        ]
         verbose_name = "Availability Slot"
         verbose_name_plural = "Availability Slots"
 
@@ -240,8 +289,55 @@ class BookingSubmission(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # A slot's bookings, newest first; also the join from slot date filters
+            models.Index(fields=['slot', 'created_at'], name='booking_slot_created_idx'),
+            models.Index(fields=['-created_at'], name='booking_created_idx'),
+        ]
         verbose_name = "Booking Submission"
         verbose_name_plural = "Booking Submissions"
 
     def __str__(self):
-        return f"{self.name} – {self.slot.date} {self.slot.start_time.strftime('%H:%M')}"
\ No newline at end of file
+        return f"{self.name} – {self.slot.date} {self.slot.start_time.strftime('%H:%M')}"
+
+class OutboxEmail(models.Model):
+    """
+    An email waiting to be sent by the outbox worker (manage.py send_outbox).
+    Views only insert rows, so no request waits on SMTP. See pages/outbox.py.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50, help_text="What the email is for (e.g. booking_confirmation)")
+    to = models.EmailField(help_text="Recipient address")
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    ics = models.TextField(blank=True, help_text="iCalendar attachment (invite.ics), if any")
+    booking = models.ForeignKey(
+        BookingSubmission,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="emails",
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(help_text="When the worker may (re)try this email")
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['next_attempt_at', 'id']
+        indexes = [
+            # The worker's "due" query
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+        verbose_name = "Outbox Email"
+        verbose_name_plural = "Outbox Emails"
+
+    def __str__(self):
+        return f"{self.kind} to {self.to} ({self.status})"
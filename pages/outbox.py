@@ -0,0 +1,160 @@
+"""
+Transactional email outbox.
+
+Views never talk to SMTP. They call enqueue_booking_emails(), which renders
+the messages and inserts OutboxEmail rows. A loop in the web service
+(pages/background.py) or ``manage.py send_outbox`` delivers them:
+
+- due rows are claimed in batches of OUTBOX_BATCH_SIZE. Claiming pushes
+  next_attempt_at forward by OUTBOX_LEASE seconds (under SELECT ... FOR
+  UPDATE SKIP LOCKED where the database supports it), so two workers never
+  send the same email and a worker that dies mid-batch only delays it;
+- each batch goes over one SMTP connection from EMAIL_BACKEND, opened once
+  and reused for every message;
+- a failed message is retried with exponential backoff (OUTBOX_RETRY_BASE,
+  doubling, capped at OUTBOX_RETRY_MAX) and marked failed after
+  OUTBOX_MAX_ATTEMPTS attempts. If the connection breaks, it is closed and
+  reopened for the next message.
+
+Client confirmations carry the booking as an iCalendar invite (invite.ics).
+"""
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from . import ics
+from .models import OutboxEmail
+
+BOOKING_CONFIRMATION = "booking_confirmation"
+OWNER_BOOKING_NOTIFICATION = "owner_booking_notification"
+
+
+def enqueue_booking_emails(booking, request):
+    """Queue the client's confirmation (with invite) and the owner's notification."""
+    slot = booking.slot
+    context = {
+        "booking": booking,
+        "location": ics.chambers_location(),
+        "detail_url": request.build_absolute_uri(reverse("owner_booking_detail", args=[booking.pk])),
+        "BARRISTER_NAME": settings.BARRISTER_NAME,
+        "BARRISTER_PHONE": settings.BARRISTER_PHONE,
+    }
+    when = f"{slot.date:%a %d %b %Y} {slot.start_time:%H:%M}"
+    now = timezone.now()
+    emails = [
+        OutboxEmail(
+            kind=BOOKING_CONFIRMATION,
+            to=booking.email,
+            subject=f"Consultation confirmed: {when}",
+            body=render_to_string("emails/booking_confirmation.txt", context).strip(),
+            ics=ics.booking_invite(booking, request.get_host()),
+            booking=booking,
+            next_attempt_at=now,
+        ),
+    ]
+    if settings.OUTBOX_OWNER_EMAIL:
+        emails.append(OutboxEmail(
+            kind=OWNER_BOOKING_NOTIFICATION,
+            to=settings.OUTBOX_OWNER_EMAIL,
+            subject=f"New booking: {booking.name}, {when}",
+            body=render_to_string("emails/owner_booking_notification.txt", context).strip(),
+            booking=booking,
+            next_attempt_at=now,
+        ))
+    return OutboxEmail.objects.bulk_create(emails)
+
+
+def retry_delay(attempts):
+    """Seconds to wait after the given number of failed attempts (with up to 10% jitter)."""
+    delay = min(settings.OUTBOX_RETRY_BASE * 2 ** (attempts - 1), settings.OUTBOX_RETRY_MAX)
+    return delay * random.uniform(1.0, 1.1)
+
+
+def claim_due(batch_size=None):
+    """Lease up to batch_size due emails to this worker and return them."""
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status="pending", next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        if emails:
+            OutboxEmail.objects.filter(pk__in=[e.pk for e in emails]).update(
+                next_attempt_at=now + timedelta(seconds=settings.OUTBOX_LEASE)
+            )
+    return emails
+
+
+def _message(email, connection):
+    message = EmailMessage(
+        subject=email.subject,
+        body=email.body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[email.to],
+        reply_to=[settings.BARRISTER_EMAIL] if email.kind == BOOKING_CONFIRMATION else None,
+        connection=connection,
+    )
+    if email.ics:
+        message.attach("invite.ics", email.ics, "text/calendar; method=PUBLISH; charset=utf-8")
+    return message
+
+
+def send_batch(emails, connection=None):
+    """
+    Send claimed emails over one connection. Returns {"sent", "retrying", "failed"}.
+    """
+    stats = {"sent": 0, "retrying": 0, "failed": 0}
+    if not emails:
+        return stats
+    connection = connection or get_connection(fail_silently=False)
+    try:
+        for email in emails:
+            email.attempts += 1
+            try:
+                # Opens the connection on first use (or after a failure) and reuses it otherwise
+                connection.open()
+                _message(email, connection).send()
+            except Exception as e:
+                # The connection may be unusable now; the next message reopens it
+                connection.close()
+                email.last_error = f"{type(e).__name__}: {e}"[:2000]
+                if email.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                    email.status = "failed"
+                    stats["failed"] += 1
+                else:
+                    email.next_attempt_at = timezone.now() + timedelta(seconds=retry_delay(email.attempts))
+                    stats["retrying"] += 1
+                email.save(update_fields=["attempts", "status", "last_error", "next_attempt_at"])
+            else:
+                email.status = "sent"
+                email.sent_at = timezone.now()
+                email.last_error = ""
+                email.save(update_fields=["attempts", "status", "sent_at", "last_error"])
+                stats["sent"] += 1
+    finally:
+        connection.close()
+    return stats
+
+
+def send_pending(batch_size=None, connection=None):
+    """Claim and send one batch of due emails."""
+    return send_batch(claim_due(batch_size), connection=connection)
+
+
+def send_due(batch_size=None):
+    """Send batches until nothing is due. Returns the summed {"sent", "retrying", "failed"}."""
+    totals = {"sent": 0, "retrying": 0, "failed": 0}
+    while True:
+        stats = send_pending(batch_size=batch_size)
+        for key in totals:
+            totals[key] += stats[key]
+        if not any(stats.values()):
+            return totals
@@ -0,0 +1,71 @@
+"""
+In-memory registry for the LLM prompt files in ai/prompts/.
+
+Prompts are read from disk once and kept in memory. Each lookup does a cheap
+stat() and re-reads the file only when its mtime or size changed, so edits are
+picked up without a restart. Every prompt carries a short content hash
+(``version``) which is stored alongside LLM results in
+``IntakeSession.structured_output`` so results produced by an older prompt can
+be found and re-run.
+"""
+import hashlib
+import threading
+from pathlib import Path
+from typing import NamedTuple
+
+from django.conf import settings
+
+
+class Prompt(NamedTuple):
+    name: str
+    text: str
+    version: str
+
+
+class PromptRegistry:
+    """Caches prompt files keyed by (mtime, size) and reloads them on change."""
+
+    def __init__(self, directory=None):
+        self._directory = Path(directory) if directory else None
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self):
+        return self._directory or Path(settings.BASE_DIR) / "ai" / "prompts"
+
+    def get(self, name):
+        """
+        Return the current Prompt for a file name (e.g. "intake_classify.txt").
+
+        Raises:
+            FileNotFoundError: If the prompt file does not exist
+        """
+        path = self.directory / name
+        stat = path.stat()
+        key = (stat.st_mtime_ns, stat.st_size)
+
+        cached = self._cache.get(name)
+        if cached and cached[0] == key:
+            return cached[1]
+
+        with self._lock:
+            text = path.read_text(encoding="utf-8")
+            prompt = Prompt(name=name, text=text, version=hashlib.sha256(text.encode("utf-8")).hexdigest()[:12])
+            self._cache[name] = (key, prompt)
+        return prompt
+
+    def version(self, name):
+        return self.get(name).version
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+registry = PromptRegistry()
+
+
+def get_prompt(name):
+    """Shortcut for registry.get(name)."""
+    return registry.get(name)
@@ -0,0 +1,197 @@
+"""
+EXPLAIN-based audit of the queries behind every page (``manage.py audit_queries``).
+
+Each named URL is requested with Django's test client, logged in as a staff
+user so the owner views are included. The SQL each view runs is
+captured and every SELECT is passed through EXPLAIN QUERY PLAN (SQLite) or
+EXPLAIN (PostgreSQL). A plan step that reads a whole table without an index
+("SCAN table" / "Seq Scan on table") is reported as a full scan, and a
+separate sort ("USE TEMP B-TREE FOR ORDER BY" / "Sort") as a sort. Sorts
+are informational: on the small tables here they are usually cheaper than
+another index. ALLOWED_SCANS and ALLOWED_VIEW_SCANS list the scans that
+are expected.
+
+Requests run inside a transaction that is rolled back, with the content
+cache and static snapshot switched off, so every query is seen and nothing
+is written. Views that call the LLM, only accept POST or stream whole tables
+are skipped (SKIP). URLs with parameters get sample arguments from the
+database (SAMPLE_ARGS), and are skipped when there is no row to use.
+"""
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import availability
+from .models import (
+    SitePage, PracticeArea, BlogPost, CaseStudy, IntakeSession, AvailabilitySlot, BookingSubmission,
+)
+
+# Not requested: LLM calls, POST-only endpoints, logout, whole-table exports
+SKIP = {
+    "intake_thank_you", "owner_intake_analyse", "ai_assist", "calendly_webhook", "book_submit",
+    "owner_booking_toggle_paid", "owner_logout", "owner_export",
+}
+
+# Tables small enough by design that a scan is the right plan
+ALLOWED_SCANS = {"pages_homepagesettings", "pages_sitepage", "pages_practicearea"}
+
+# Views that list or fingerprint every row of a table, where an index saves no reads
+ALLOWED_VIEW_SCANS = {
+    "sitemap": {"pages_blogpost", "pages_casestudy"},
+    "owner_blog_list": {"pages_blogpost"},
+    "owner_case_list": {"pages_casestudy"},
+}
+
+
+def _first(queryset, field):
+    value = queryset.values_list(field, flat=True).first()
+    return None if value is None else [value]
+
+
+def _first_bookable_date():
+    dates = availability.upcoming_dates()
+    return [dates[0][0].isoformat()] if dates else None
+
+
+def _first_bookable_slot():
+    slots = availability.next_available(limit=1)
+    return [slots[0]["id"]] if slots else None
+
+
+SAMPLE_ARGS = {
+    "practice_area_detail": lambda: _first(PracticeArea.objects, "slug"),
+    "blog_detail": lambda: _first(BlogPost.objects.filter(published=True), "slug"),
+    "case_detail": lambda: _first(CaseStudy.objects.filter(published=True), "slug"),
+    "book_date": _first_bookable_date,
+    "book_slot": _first_bookable_slot,
+    "book_success": lambda: _first(BookingSubmission.objects, "pk"),
+    "calendar_feed": lambda: [settings.CALENDAR_FEED_SECRET] if settings.CALENDAR_FEED_SECRET else None,
+    "owner_edit_site_page": lambda: _first(SitePage.objects.exclude(slug="about"), "slug"),
+    "owner_practice_area_edit": lambda: _first(PracticeArea.objects, "pk"),
+    "owner_practice_area_delete": lambda: _first(PracticeArea.objects, "pk"),
+    "owner_blog_edit": lambda: _first(BlogPost.objects, "pk"),
+    "owner_blog_delete": lambda: _first(BlogPost.objects, "pk"),
+    "owner_case_edit": lambda: _first(CaseStudy.objects, "pk"),
+    "owner_case_delete": lambda: _first(CaseStudy.objects, "pk"),
+    "owner_intake_detail": lambda: _first(IntakeSession.objects, "uuid"),
+    "owner_availability_edit": lambda: _first(AvailabilitySlot.objects, "pk"),
+    "owner_availability_delete": lambda: _first(AvailabilitySlot.objects, "pk"),
+    "owner_booking_detail": lambda: _first(BookingSubmission.objects, "pk"),
+}
+
+SQLITE_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+SQLITE_SORT = re.compile(r"USE TEMP B-TREE FOR (ORDER BY|GROUP BY|DISTINCT)")
+POSTGRES_SCAN = re.compile(r"Seq Scan on (\w+)")
+POSTGRES_SORT = re.compile(r"^\s*(?:->\s*)?Sort\b")
+
+
+def url_names():
+    """(name, pattern) for every named URL of this app."""
+    from .urls import urlpatterns
+    for pattern in urlpatterns:
+        if pattern.name:
+            yield pattern.name, pattern
+
+
+def explain(sql):
+    """Plan lines for one SELECT statement."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return [row[-1] for row in cursor.fetchall()]
+        if connection.vendor == "postgresql":
+            cursor.execute(f"EXPLAIN {sql}")
+            return [row[0] for row in cursor.fetchall()]
+    raise NotImplementedError(f"EXPLAIN audit does not support {connection.vendor}")
+
+
+def problems(plan, allowed=ALLOWED_SCANS):
+    """[(kind, detail)] for the full scans and sorts in a plan."""
+    scan, sort = (SQLITE_SCAN, SQLITE_SORT) if connection.vendor == "sqlite" else (POSTGRES_SCAN, POSTGRES_SORT)
+    found = []
+    for line in plan:
+        match = scan.search(line.strip())
+        if match and match.group(1) not in allowed:
+            found.append(("full scan", match.group(1)))
+        elif sort.search(line):
+            found.append(("sort", line.strip()))
+    return found
+
+
+def _urls(skipped):
+    for name, pattern in url_names():
+        if name in SKIP:
+            continue
+        params = pattern.pattern.regex.groupindex
+        if not params:
+            yield name, reverse(name)
+            continue
+        provider = SAMPLE_ARGS.get(name)
+        args = provider() if provider else None
+        if args is None:
+            skipped.append((name, "no sample arguments" if provider is None else "no rows to use"))
+            continue
+        yield name, reverse(name, args=args)
+
+
+def audit(staff_user=None):
+    """
+    Request every auditable URL and EXPLAIN its queries.
+
+    Returns {"views": {url_name: {"url", "status", "queries", "problems": [(kind, detail, sql)]}},
+    "skipped": [(url_name, reason)]}.
+    """
+    staff_user = staff_user or get_user_model().objects.filter(is_staff=True, is_active=True).first()
+    report = {"views": {}, "skipped": []}
+    overrides = override_settings(
+        STATIC_SNAPSHOT_ENABLED=False,
+        SECURE_SSL_REDIRECT=False,
+        ALLOWED_HOSTS=["testserver"],
+        CACHES={alias: {"BACKEND": "django.core.cache.backends.dummy.DummyCache"} for alias in settings.CACHES},
+        SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies",
+    )
+    with overrides, transaction.atomic():
+        client = Client()
+        if staff_user is not None:
+            client.force_login(staff_user)
+        else:
+            report["skipped"].append(("owner_*", "no staff user"))
+
+        plans = {}
+        for name, url in _urls(report["skipped"]):
+            if name.startswith("owner_") and staff_user is None:
+                continue
+            with CaptureQueriesContext(connection) as captured:
+                response = client.get(url)
+                if hasattr(response, "streaming_content"):
+                    b"".join(response.streaming_content)
+            found = []
+            allowed = ALLOWED_SCANS | ALLOWED_VIEW_SCANS.get(name, set())
+            selects = [q["sql"] for q in captured.captured_queries if q["sql"].lstrip().upper().startswith("SELECT")]
+            for sql in selects:
+                if sql not in plans:
+                    plans[sql] = explain(sql)
+                for kind, detail in problems(plans[sql], allowed):
+                    if (kind, detail, sql) not in found:
+                        found.append((kind, detail, sql))
+            report["views"][name] = {
+                "url": url, "status": response.status_code, "queries": len(selects), "problems": found,
+            }
+        transaction.set_rollback(True)
+    return report
+
+
+def summary(report):
+    """{kind: {detail: [url_name, ...]}} across the whole report."""
+    by_kind = defaultdict(lambda: defaultdict(list))
+    for name, view in report["views"].items():
+        for kind, detail, _sql in view["problems"]:
+            if name not in by_kind[kind][detail]:
+                by_kind[kind][detail].append(name)
+    return by_kind
@@ -0,0 +1,158 @@
+"""
+Data retention: archive and/or delete old intake, booking and outbox rows.
+
+``purge_expired()`` runs once a day in the web service's background loop
+(pages/background.py, RETENTION_INTERVAL); ``manage.py purge_retention`` runs
+the same purge by hand. Each walks each dataset in RETENTION_POLICIES in primary-key order, RETENTION_BATCH_SIZE
+rows at a time (keyset pagination: ``pk > last_pk ORDER BY pk LIMIT n``,
+never OFFSET).
+Each batch is deleted in its own short transaction, so on SQLite the write
+lock is held for one batch at a time rather than for the whole purge.
+
+In ``archive`` mode each batch is first appended to a gzip-compressed JSON
+Lines file under RETENTION_ARCHIVE_DIR, with the same columns as the owner
+exports (pages/exports.py). A batch is written and flushed before it is
+deleted, so an interrupted run never loses rows it has not archived.
+
+Ages come from the RETENTION_*_DAYS settings; 0 keeps a dataset forever.
+"""
+import gzip
+import json
+import logging
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.utils import timezone
+
+from .exports import EXPORT_DATASETS
+from .models import IntakeSession, BookingSubmission, OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+MODES = ("archive", "delete")
+
+# Processed in this order: bookings before the intakes they point at
+RETENTION_POLICIES = {
+    "bookings": {
+        "model": BookingSubmission,
+        # Age counts from the consultation, not from when it was booked
+        "date_field": "slot__date",
+        "days_setting": "RETENTION_BOOKING_DAYS",
+        "fields": EXPORT_DATASETS["bookings"]["fields"],
+    },
+    "intakes": {
+        "model": IntakeSession,
+        "date_field": "created_at",
+        "days_setting": "RETENTION_INTAKE_DAYS",
+        "fields": EXPORT_DATASETS["intakes"]["fields"],
+    },
+    "outbox": {
+        "model": OutboxEmail,
+        "date_field": "created_at",
+        "days_setting": "RETENTION_OUTBOX_DAYS",
+        "fields": ["id", "created_at", "kind", "to", "subject", "status", "attempts", "sent_at", "last_error"],
+        # Never drop mail the worker still has to send
+        "filters": {"status__in": ["sent", "failed"]},
+    },
+}
+
+
+class RetentionError(ValueError):
+    """Raised for an unknown dataset or mode."""
+    pass
+
+
+def expired_queryset(dataset, now=None):
+    """Rows of a dataset older than its retention age, or None if it is kept forever."""
+    spec = RETENTION_POLICIES.get(dataset)
+    if spec is None:
+        raise RetentionError(f"Unknown dataset '{dataset}'")
+    days = getattr(settings, spec["days_setting"])
+    if not days:
+        return None
+
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    model = spec["model"]
+    first, *rest = spec["date_field"].split("__")
+    field = model._meta.get_field(first)
+    for name in rest:
+        field = field.related_model._meta.get_field(name)
+    if not isinstance(field, models.DateTimeField):
+        cutoff = cutoff.date()
+    return model.objects.filter(**{f"{spec['date_field']}__lt": cutoff}, **spec.get("filters", {}))
+
+
+def _archive_path(dataset, now):
+    directory = Path(settings.RETENTION_ARCHIVE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / f"{dataset}-{now:%Y%m%dT%H%M%S}.jsonl.gz"
+
+
+def purge(dataset, mode="archive", batch_size=None, dry_run=False, pause=0.0, now=None):
+    """
+    Archive and/or delete one dataset's expired rows in keyset-ordered batches.
+
+    Returns {"dataset", "rows", "batches", "seconds", "rows_per_second", "archive"}.
+    """
+    if mode not in MODES:
+        raise RetentionError(f"Unknown mode '{mode}'")
+    now = now or timezone.now()
+    batch_size = batch_size or settings.RETENTION_BATCH_SIZE
+    stats = {"dataset": dataset, "rows": 0, "batches": 0, "seconds": 0.0, "rows_per_second": 0.0, "archive": None}
+
+    qs = expired_queryset(dataset, now=now)
+    if qs is None:
+        return stats
+    if dry_run:
+        stats["rows"] = qs.count()
+        return stats
+
+    spec = RETENTION_POLICIES[dataset]
+    columns = spec["fields"]
+    archive = None
+    started = time.monotonic()
+    last_pk = 0
+    try:
+        while True:
+            pks = list(qs.filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                break
+
+            if mode == "archive":
+                if archive is None:
+                    stats["archive"] = _archive_path(dataset, now)
+                    archive = gzip.open(stats["archive"], "wt", encoding="utf-8")
+                rows = spec["model"].objects.filter(pk__in=pks).order_by("pk").values_list(*columns)
+                for row in rows:
+                    archive.write(json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + "\n")
+                archive.flush()
+
+            with transaction.atomic():
+                spec["model"].objects.filter(pk__in=pks).delete()
+
+            last_pk = pks[-1]
+            stats["rows"] += len(pks)
+            stats["batches"] += 1
+            if pause:
+                # Let other writers take the database lock between batches
+                time.sleep(pause)
+    finally:
+        if archive is not None:
+            archive.close()
+
+    stats["seconds"] = time.monotonic() - started
+    if stats["seconds"] > 0:
+        stats["rows_per_second"] = stats["rows"] / stats["seconds"]
+    return stats
+
+
+def purge_expired():
+    """Purge every dataset with RETENTION_MODE (the background loop's task)."""
+    for dataset in RETENTION_POLICIES:
+        stats = purge(dataset, mode=settings.RETENTION_MODE)
+        if stats["rows"]:
+            logger.info("Retention purge removed %d %s row(s)", stats["rows"], dataset)
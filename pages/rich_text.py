@@ -0,0 +1,265 @@
+"""
+Sanitised, normalised rendering of CKEditor (RichTextField) HTML.
+
+Public templates show ``{{ post.body|rich_text }}`` instead of ``|safe``.
+The filter looks the body up by content hash in the content cache, so the
+HTML is parsed at most once per distinct body. Receivers in pages/signals.py
+render it when an object is saved, so visitors normally never pay for it.
+
+Rendering:
+- keeps only whitelisted tags and attributes and drops ``<script>``/``<style>``
+  and similar elements with their content; only http(s), mailto, tel,
+  relative and fragment links survive;
+- keeps the inline styles CKEditor's toolbar produces (text alignment, text
+  and background colour) when their values are plain keywords or colours,
+  and drops every other declaration;
+- gives every image ``loading="lazy"``, ``decoding="async"`` and explicit
+  width/height, taken from its attributes, its inline style, or the file in
+  MEDIA_ROOT, so lazy images don't shift the layout;
+- gives every heading a unique slug ``id`` (CKEditor ``<a name>`` anchors
+  become the heading id) so sections can be linked to;
+- adds ``rel="noopener noreferrer"`` to links that open a new window.
+"""
+import hashlib
+import re
+from html import escape
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+from django.conf import settings
+from django.utils.safestring import mark_safe
+from django.utils.text import slugify
+
+from . import content_cache
+
+# Bump to re-render every cached body after changing the rules below
+RENDER_VERSION = 2
+
+ALLOWED_TAGS = {
+    "a", "abbr", "b", "blockquote", "br", "caption", "cite", "code", "div", "em", "figcaption",
+    "figure", "h1", "h2", "h3", "h4", "h5", "h6", "hr", "i", "img", "li", "ol", "p", "pre", "s",
+    "small", "span", "strong", "sub", "sup", "table", "tbody", "td", "tfoot", "th", "thead", "tr",
+    "u", "ul",
+}
+VOID_TAGS = {"br", "hr", "img"}
+# Removed together with everything inside them
+DROP_CONTENT_TAGS = {"script", "style", "iframe", "object", "embed", "noscript", "template", "svg", "math"}
+
+ALLOWED_ATTRS = {
+    "*": {"class", "title"},
+    "a": {"href", "target", "rel", "name"},
+    "img": {"src", "alt", "width", "height"},
+    "td": {"colspan", "rowspan"},
+    "th": {"colspan", "rowspan", "scope"},
+    "ol": {"start", "type"},
+}
+URL_ATTRS = {"href", "src"}
+SAFE_SCHEMES = {"", "http", "https", "mailto", "tel"}
+HEADINGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+# Opening one of these closes an open <p>, as browsers do
+BLOCK_TAGS = HEADINGS | {"blockquote", "div", "figure", "hr", "ol", "p", "pre", "table", "ul"}
+# Opening the key closes an innermost open element of the listed kinds (<li>one<li>two)
+IMPLICIT_CLOSE = {"li": {"li"}, "tr": {"tr", "td", "th"}, "td": {"td", "th"}, "th": {"td", "th"}}
+
+STYLE_SIZE = re.compile(r"(?<![-\w])(width|height)\s*:\s*(\d+)px", re.I)
+COLOUR = re.compile(r"#[0-9a-f]{3,8}|rgba?\(\s*[\d.%]+\s*(,\s*[\d.%]+\s*){2,3}\)|[a-z]+", re.I)
+# Inline style property -> pattern its whole value must match (Justify*, TextColor, BGColor buttons)
+ALLOWED_STYLES = {
+    "text-align": re.compile(r"left|right|center|justify", re.I),
+    "color": COLOUR,
+    "background-color": COLOUR,
+}
+
+
+def _safe_url(url):
+    # Browsers ignore control characters and whitespace inside the scheme
+    cleaned = re.sub(r"[\x00-\x20]", "", unquote(url or ""))
+    return urlparse(cleaned).scheme.lower() in SAFE_SCHEMES
+
+
+def _safe_style(style):
+    """The allowed declarations of an inline style attribute, normalised, or ""."""
+    kept = []
+    for declaration in (style or "").split(";"):
+        prop, _, value = declaration.partition(":")
+        prop, value = prop.strip().lower(), value.strip()
+        pattern = ALLOWED_STYLES.get(prop)
+        if pattern and pattern.fullmatch(value):
+            kept.append(f"{prop}: {value}")
+    return "; ".join(kept)
+
+
+def _media_image_size(src):
+    """(width, height) of an uploaded image under MEDIA_ROOT, or None."""
+    path = urlparse(src).path
+    if not path.startswith(settings.MEDIA_URL):
+        return None
+    file_path = Path(settings.MEDIA_ROOT) / unquote(path[len(settings.MEDIA_URL):])
+    try:
+        from PIL import Image
+        with Image.open(file_path) as image:
+            return image.size
+    except (OSError, ValueError):
+        return None
+
+
+class _Renderer(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.out = []
+        self.dropping = 0
+        self.open_tags = []
+        self.heading = None  # index in self.out of the open heading tag, its attrs and text
+        self.used_ids = set()
+
+    # -- helpers -----------------------------------------------------------
+
+    def _attrs(self, tag, attrs):
+        allowed = ALLOWED_ATTRS["*"] | ALLOWED_ATTRS.get(tag, set())
+        clean = {}
+        for name, value in attrs:
+            name = name.lower()
+            if name == "style":
+                if tag == "img":
+                    # CKEditor's image dialog stores the size as inline style
+                    for dim, px in STYLE_SIZE.findall(value or ""):
+                        clean.setdefault(dim.lower(), px)
+                style = _safe_style(value)
+                if style:
+                    clean["style"] = style
+                continue
+            if name not in allowed or value is None:
+                continue
+            if name in URL_ATTRS and not _safe_url(value):
+                continue
+            clean[name] = value
+        return clean
+
+    def _unique_id(self, text):
+        base = slugify(text)[:60] or "section"
+        candidate, n = base, 2
+        while candidate in self.used_ids:
+            candidate, n = f"{base}-{n}", n + 1
+        self.used_ids.add(candidate)
+        return candidate
+
+    @staticmethod
+    def _tag(tag, attrs):
+        parts = [tag] + [f'{name}="{escape(value, quote=True)}"' for name, value in attrs.items()]
+        return f"<{' '.join(parts)}>"
+
+    # -- parser callbacks --------------------------------------------------
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping += 1
+            return
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+        clean = self._attrs(tag, attrs)
+
+        if self.open_tags and (
+            self.open_tags[-1] in IMPLICIT_CLOSE.get(tag, ())
+            or (tag in BLOCK_TAGS and "p" in self.open_tags)
+        ):
+            self.handle_endtag("p" if tag in BLOCK_TAGS else self.open_tags[-1])
+
+        if tag == "img":
+            if "src" not in clean:
+                return
+            if not ("width" in clean and "height" in clean):
+                size = _media_image_size(clean["src"])
+                if size:
+                    clean["width"], clean["height"] = str(size[0]), str(size[1])
+            clean["loading"] = "lazy"
+            clean["decoding"] = "async"
+            clean.setdefault("alt", "")
+        elif tag == "a":
+            if "name" in clean and self.heading is not None:
+                # <h2><a name="x"></a>Title</h2> -> <h2 id="x">Title</h2>
+                self.heading[1].setdefault("id", clean["name"])
+            clean.pop("name", None)
+            if clean.get("target") == "_blank":
+                clean["rel"] = "noopener noreferrer"
+        elif tag in HEADINGS:
+            # The id is filled in when the heading closes and its text is known
+            self.heading = [len(self.out), clean, []]
+
+        self.out.append(self._tag(tag, clean))
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            return  # <svg/>, <iframe ... />: nothing inside to drop
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and self.open_tags and self.open_tags[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping = max(0, self.dropping - 1)
+            return
+        if self.dropping or tag not in ALLOWED_TAGS or tag in VOID_TAGS or tag not in self.open_tags:
+            return
+        # Close anything left open inside this element so the output is well formed
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.out.append(f"</{open_tag}>")
+            if open_tag in HEADINGS and self.heading is not None:
+                index, attrs, text = self.heading
+                attrs["id"] = self._unique_id(attrs.get("id") or "".join(text))
+                self.out[index] = self._tag(open_tag, attrs)
+                self.heading = None
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self.dropping:
+            return
+        if self.heading is not None:
+            self.heading[2].append(data)
+        self.out.append(escape(data, quote=False))
+
+    def handle_entityref(self, name):
+        if not self.dropping:
+            self.out.append(f"&{name};")
+
+    def handle_charref(self, name):
+        if not self.dropping:
+            self.out.append(f"&#{name};")
+
+    def close(self):
+        super().close()
+        # An unclosed <iframe> etc. swallows the rest of the body; stop dropping so the flush below runs
+        self.dropping = 0
+        while self.open_tags:
+            self.handle_endtag(self.open_tags[-1])
+        return "".join(self.out)
+
+
+def render(html):
+    """Sanitise and normalise one HTML body (uncached)."""
+    renderer = _Renderer()
+    renderer.feed(html or "")
+    return renderer.close()
+
+
+def cache_key(html):
+    digest = hashlib.sha256((html or "").encode("utf-8")).hexdigest()
+    return f"rich_text:{RENDER_VERSION}:{digest}"
+
+
+def rendered(html):
+    """Rendered HTML for a body, from the content cache (rendering it on a miss)."""
+    if not html:
+        return mark_safe("")
+    return mark_safe(content_cache.get_cached(cache_key(html), lambda: render(html)))
+
+
+def warm(*bodies):
+    """Render bodies into the cache ahead of the first request (called on save)."""
+    for html in bodies:
+        if html:
+            rendered(html)
@@ -0,0 +1,114 @@
+"""
+Model signal receivers that keep caches in step with owner edits.
+Connected in PagesConfig.ready().
+
+Invalidations run on commit: dropping a cache entry mid-transaction lets a
+concurrent request re-cache the old rows before the edit is visible.
+"""
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from . import availability, content_cache, rich_text, site_index, snapshot, syndication
+from .models import (
+    HomepageSettings, SitePage, PracticeArea, BlogPost, CaseStudy, AvailabilitySlot, BookingSubmission,
+)
+
+
+@receiver([post_save, post_delete], sender=HomepageSettings)
+def invalidate_homepage_settings(sender, **kwargs):
+    transaction.on_commit(lambda: content_cache.invalidate(HomepageSettings.CACHE_KEY))
+
+
+@receiver([post_save, post_delete], sender=SitePage)
+def invalidate_site_page(sender, instance, **kwargs):
+    key = SitePage.cache_key(instance.slug)
+    transaction.on_commit(lambda: content_cache.invalidate(key))
+
+
+@receiver(pre_save, sender=SitePage)
+def invalidate_renamed_site_page(sender, instance, **kwargs):
+    # A slug change would otherwise leave the page cached under its old URL
+    if instance.pk:
+        old_slug = SitePage.objects.filter(pk=instance.pk).values_list("slug", flat=True).first()
+        if old_slug and old_slug != instance.slug:
+            key = SitePage.cache_key(old_slug)
+            transaction.on_commit(lambda: content_cache.invalidate(key))
+
+
+@receiver([post_save, post_delete], sender=SitePage)
+@receiver([post_save, post_delete], sender=PracticeArea)
+@receiver([post_save, post_delete], sender=BlogPost)
+@receiver([post_save, post_delete], sender=CaseStudy)
+def invalidate_syndication(sender, **kwargs):
+    # sitemap.xml and the feeds re-render once the content fingerprint is recomputed
+    transaction.on_commit(syndication.invalidate)
+
+
+@receiver(post_save, sender=SitePage)
+@receiver(post_save, sender=PracticeArea)
+@receiver(post_save, sender=BlogPost)
+@receiver(post_save, sender=CaseStudy)
+def render_rich_text(sender, instance, **kwargs):
+    # Sanitise the body once now rather than on the first public request
+    rich_text.warm(instance.body)
+
+
+@receiver(post_save, sender=PracticeArea)
+@receiver(post_save, sender=BlogPost)
+@receiver(post_save, sender=CaseStudy)
+def reindex_content(sender, instance, **kwargs):
+    site_index.update(instance)
+
+
+@receiver(post_delete, sender=PracticeArea)
+@receiver(post_delete, sender=BlogPost)
+@receiver(post_delete, sender=CaseStudy)
+def unindex_content(sender, instance, **kwargs):
+    site_index.update(instance, deleted=True)
+
+
+@receiver([post_save, post_delete], sender=AvailabilitySlot)
+def invalidate_slot_month(sender, instance, **kwargs):
+    slot_date = instance.date
+    transaction.on_commit(lambda: availability.invalidate(slot_date))
+
+
+@receiver(pre_save, sender=AvailabilitySlot)
+def invalidate_moved_slot_month(sender, instance, **kwargs):
+    # Moving a slot to another month must also refresh the month it left
+    if instance.pk:
+        old_date = AvailabilitySlot.objects.filter(pk=instance.pk).values_list("date", flat=True).first()
+        if old_date and old_date != instance.date:
+            transaction.on_commit(lambda: availability.invalidate(old_date))
+
+
+@receiver([post_save, post_delete], sender=BookingSubmission)
+def invalidate_booked_slot_month(sender, instance, **kwargs):
+    # Look the date up rather than using instance.slot: the slot may be mid-cascade-delete
+    slot_date = AvailabilitySlot.objects.filter(pk=instance.slot_id).values_list("date", flat=True).first()
+    transaction.on_commit(lambda: availability.invalidate(slot_date))
+
+
+@receiver(setting_changed)
+def reset_content_cache(setting, **kwargs):
+    if setting.startswith("CONTENT_CACHE") or setting == "CACHES":
+        content_cache.clear_local()
+
+
+# Registered after the content cache receivers so re-rendered pages see fresh data
+@receiver([post_save, post_delete], sender=HomepageSettings)
+@receiver([post_save, post_delete], sender=SitePage)
+@receiver([post_save, post_delete], sender=PracticeArea)
+@receiver([post_save, post_delete], sender=BlogPost)
+@receiver([post_save, post_delete], sender=CaseStudy)
+def refresh_static_snapshot(sender, instance, **kwargs):
+    snapshot.refresh_for(instance)
+
+
+@receiver(m2m_changed, sender=CaseStudy.practice_areas.through)
+def refresh_case_practice_areas(sender, instance, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear") and isinstance(instance, CaseStudy):
+        site_index.update(instance)
+        snapshot.refresh_for(instance)
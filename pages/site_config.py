@@ -0,0 +1,57 @@
+"""
+Immutable snapshot of the barrister/site settings used by every template.
+
+The values come from environment-driven settings and never change while the
+process runs, so they are read once and shared as a read-only mapping instead
+of rebuilding a dict with a dozen getattr() calls on every render. The
+snapshot is rebuilt only when settings change (override_settings in tests).
+"""
+from functools import lru_cache
+from types import MappingProxyType
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+# Setting name -> fallback used when the setting is missing
+SITE_CONFIG_DEFAULTS = {
+    'SITE_NAME': '[Your Name] BL',
+    'BARRISTER_NAME': '[Your Name]',
+    'BARRISTER_EMAIL': 'your.email@example.com',
+    'BARRISTER_PHONE': '01 XXX XXXX',
+    'BARRISTER_MOBILE': '0XX XXX XXXX',
+    'CHAMBERS_ADDRESS_LINE1': 'Your Chambers',
+    'CHAMBERS_ADDRESS_LINE2': 'Your City, Your Country',
+    'CHAMBERS_DX': 'DX XXXXXX',
+    'YEAR_CALLED': '20XX',
+    'PRACTICE_AREAS_SHORT': 'Your practice areas',
+    'BARRISTER_BIO_FOOTER': 'Junior Counsel practising at the Bar. Providing focused advice and advocacy.',
+    'CIRCUITS': 'Your Circuits',
+    'QUALIFICATIONS': 'Your Qualifications',
+    'ASSET_BUNDLES': False,
+    'LAZY_ASSETS': False,
+}
+
+
+@lru_cache(maxsize=None)
+def site_config():
+    """Read-only mapping of the site/barrister settings (built once per process)."""
+    return MappingProxyType({
+        name: getattr(settings, name, default)
+        for name, default in SITE_CONFIG_DEFAULTS.items()
+    })
+
+
+@lru_cache(maxsize=None)
+def assistant_config():
+    """Read-only mapping with the ASSISTANT_ENABLED flag."""
+    return MappingProxyType({'ASSISTANT_ENABLED': settings.ASSISTANT_ENABLED})
+
+
+@receiver(setting_changed)
+def _reset_site_config(setting, **kwargs):
+    if setting in SITE_CONFIG_DEFAULTS:
+        site_config.cache_clear()
+    elif setting == 'ASSISTANT_ENABLED':
+        assistant_config.cache_clear()
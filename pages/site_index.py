@@ -0,0 +1,177 @@
+"""
+BM25 retrieval over the site's content, used to pick the pages the assistant
+is told about for each question.
+
+Practice areas and published blog posts and case studies are indexed. Each
+document combines its title (weighted TITLE_WEIGHT times), its summary and
+an excerpt of its body and its kind ("Practice area", ...), with practice
+area names added to case studies. The index is an inverted index (term -> {doc id: term frequency}) plus
+per-document metadata (length, terms, and a case study's practice area ids),
+kept in the content cache (pages/content_cache.py):
+
+- the first search after a cache miss builds it from the database;
+- saving or deleting a post, case study or practice area updates only that
+  document (see pages/signals.py), plus, for a practice area, the case
+  studies that show its name. Updates hold content_cache.locked(), so two
+  workers saving at once can't lose each other's change. Other workers pick
+  the change up when their local copy expires. If the index is not cached
+  there is nothing to update, and the next search rebuilds it.
+
+search() scores with Okapi BM25 (k1=1.5, b=0.75).
+"""
+import math
+import re
+from collections import Counter
+
+from django.utils.html import strip_tags
+
+from . import content_cache
+from .models import PracticeArea, BlogPost, CaseStudy
+
+CACHE_KEY = "site_index:v2"
+
+K1 = 1.5
+B = 0.75
+TITLE_WEIGHT = 3
+EXCERPT_WORDS = 150
+
+TERM_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a about an and any are as at be been but by can could do does for from had has have how i if in into is it
+its me my no not of on or our so than that the their them then there these they this to was we were what
+when where which who why will with would you your
+""".split())
+
+KINDS = {"area": PracticeArea, "blog": BlogPost, "case": CaseStudy}
+LABELS = {"area": "Practice area", "blog": "Blog post", "case": "Case study"}
+
+
+def terms(text):
+    """Lower-cased index terms of text: stopwords dropped, plurals folded."""
+    found = []
+    for word in TERM_PATTERN.findall((text or "").lower()):
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        found.append(word)
+    return found
+
+
+def doc_id(instance):
+    kind = next(k for k, model in KINDS.items() if isinstance(instance, model))
+    return f"{kind}:{instance.pk}"
+
+
+def _indexable(instance):
+    return isinstance(instance, PracticeArea) or getattr(instance, "published", False)
+
+
+def _document(instance):
+    """(meta, term counts) for one model instance."""
+    kind = doc_id(instance).split(":")[0]
+    title = getattr(instance, "title", None) or instance.name
+    summary = getattr(instance, "short_summary", "") or getattr(instance, "summary", "")
+    excerpt = " ".join(strip_tags(instance.body or "").split()[:EXCERPT_WORDS])
+    # The kind's label lets "what areas do you cover?" find every practice area
+    text = f"{LABELS[kind]} {summary} {excerpt}"
+    areas = list(instance.practice_areas.all()) if isinstance(instance, CaseStudy) and instance.pk else []
+    text += "".join(f" {area.name}" for area in areas)
+    counts = Counter(terms(text))
+    for term in terms(title):
+        counts[term] += TITLE_WEIGHT
+    meta = {
+        "title": title,
+        "url": instance.get_absolute_url(),
+        "kind": kind,
+        "length": sum(counts.values()),
+        "terms": sorted(counts),  # so removing the document only touches its own postings
+        "areas": [area.pk for area in areas],
+    }
+    return meta, counts
+
+
+def _empty():
+    return {"docs": {}, "postings": {}, "total_length": 0}
+
+
+def _add(index, key, meta, counts):
+    index["docs"][key] = meta
+    index["total_length"] += meta["length"]
+    for term, count in counts.items():
+        index["postings"].setdefault(term, {})[key] = count
+
+
+def _remove(index, key):
+    meta = index["docs"].pop(key, None)
+    if meta is None:
+        return
+    index["total_length"] -= meta["length"]
+    for term in meta["terms"]:
+        postings = index["postings"].get(term, {})
+        if postings.pop(key, None) is not None and not postings:
+            del index["postings"][term]
+
+
+def build():
+    """The whole index, read from the database."""
+    index = _empty()
+    querysets = [
+        PracticeArea.objects.all(),
+        BlogPost.objects.filter(published=True),
+        CaseStudy.objects.filter(published=True).prefetch_related("practice_areas"),
+    ]
+    for queryset in querysets:
+        for instance in queryset:
+            _add(index, doc_id(instance), *_document(instance))
+    return index
+
+
+def get_index():
+    return content_cache.get_cached(CACHE_KEY, build)
+
+
+def _reindex(index, instance, deleted=False):
+    key = doc_id(instance)
+    _remove(index, key)
+    if not deleted and _indexable(instance):
+        _add(index, key, *_document(instance))
+
+
+def update(instance, deleted=False):
+    """Re-index one document after a save or delete (and the case studies naming a practice area)."""
+    with content_cache.locked(CACHE_KEY):
+        index = content_cache.shared_cache().get(CACHE_KEY)
+        if index is None:
+            return
+        _reindex(index, instance, deleted)
+        if isinstance(instance, PracticeArea):
+            # A renamed or deleted area changes the text of every case study filed under it
+            case_ids = [int(key.split(":")[1]) for key, meta in index["docs"].items()
+                        if instance.pk in meta["areas"]]
+            for case in CaseStudy.objects.filter(pk__in=case_ids).prefetch_related("practice_areas"):
+                _reindex(index, case)
+        content_cache.store(CACHE_KEY, index)
+
+
+def search(query, limit=5):
+    """[{"title", "url", "kind", "score"}] for the best BM25 matches, best first."""
+    index = get_index()
+    query_terms = set(terms(query))
+    n = len(index["docs"])
+    if not query_terms or not n:
+        return []
+    average = index["total_length"] / n
+    scores = Counter()
+    for term in query_terms:
+        postings = index["postings"].get(term)
+        if not postings:
+            continue
+        idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+        for key, tf in postings.items():
+            length = index["docs"][key]["length"]
+            scores[key] += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / average))
+    return [
+        {**{k: index["docs"][key][k] for k in ("title", "url", "kind")}, "score": round(score, 3)}
+        for key, score in scores.most_common(limit)
+    ]
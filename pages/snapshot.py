@@ -0,0 +1,250 @@
+"""
+Pre-rendered static snapshot of the public site.
+
+``python manage.py build_snapshot`` renders every public URL (including all
+practice area, blog and case study slugs) to ``<path>/index.html`` under
+STATIC_SNAPSHOT_DIR. With STATIC_SNAPSHOT_ENABLED=1:
+
+- StaticSnapshotMiddleware answers anonymous GETs for those URLs straight
+  from disk without touching the session or user, so they need no database
+  access. It runs after the other middleware's request phase, so snapshot
+  responses get the same security headers as dynamic ones.
+- Owner edits re-render only the pages that show the edited object
+  (receivers in pages/signals.py call ``refresh_for()``). The rendering runs
+  on a background thread once the save has committed, so saving a practice
+  area (which touches every area and case page) doesn't hold up the request.
+
+Only pages without forms are snapshotted; contact, intake and booking pages
+stay dynamic.
+"""
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection, transaction
+from django.http import HttpResponse, Http404
+from django.test import RequestFactory
+from django.urls import resolve, Resolver404
+
+from .models import HomepageSettings, SitePage, PracticeArea, BlogPost, CaseStudy
+
+logger = logging.getLogger(__name__)
+
+STATIC_PATHS = ["/", "/about/", "/practice-areas/", "/blog/", "/cases/", "/privacy/", "/terms/"]
+
+# Directories whose children are one file per slug (pruned when a slug disappears)
+SLUG_SECTIONS = ["practice-areas", "blog", "cases"]
+
+
+def snapshot_dir():
+    return Path(settings.STATIC_SNAPSHOT_DIR)
+
+
+def public_urls():
+    """Every public URL that is snapshotted."""
+    paths = list(STATIC_PATHS)
+    paths += [area.get_absolute_url() for area in PracticeArea.objects.only("slug")]
+    paths += [post.get_absolute_url() for post in BlogPost.objects.filter(published=True).only("slug")]
+    paths += [case.get_absolute_url() for case in CaseStudy.objects.filter(published=True).only("slug")]
+    return paths
+
+
+def file_for(path):
+    """Snapshot file for a URL path, or None if the path can't be a snapshot."""
+    parts = [p for p in path.strip("/").split("/") if p]
+    if any(p in (".", "..") for p in parts):
+        return None
+    return snapshot_dir().joinpath(*parts, "index.html")
+
+
+def render_path(path):
+    """
+    Render a public URL as an anonymous visitor would see it.
+
+    Returns:
+        bytes: The HTML, or None if the URL doesn't resolve or isn't a 200
+    """
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return None
+
+    host = next((h for h in settings.ALLOWED_HOSTS if h and "*" not in h), "localhost")
+    request = RequestFactory().get(path, HTTP_HOST=host.lstrip("."))
+    request.user = AnonymousUser()
+    try:
+        response = match.func(request, *match.args, **match.kwargs)
+    except Http404:
+        return None
+    if response.status_code != 200:
+        return None
+    return response.content
+
+
+def _write(path, content):
+    """Write a snapshot file if its content changed. Returns True if written."""
+    target = file_for(path)
+    if target.exists() and hashlib.sha256(target.read_bytes()).digest() == hashlib.sha256(content).digest():
+        return False
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(".tmp")
+    tmp.write_bytes(content)
+    tmp.replace(target)
+    return True
+
+
+def _remove(path):
+    target = file_for(path)
+    if target is not None and target.exists():
+        target.unlink()
+        return True
+    return False
+
+
+def prune(valid_paths):
+    """Delete slug pages that are no longer public (deleted, unpublished or renamed)."""
+    removed = []
+    valid = set(valid_paths)
+    for section in SLUG_SECTIONS:
+        section_dir = snapshot_dir() / section
+        if not section_dir.is_dir():
+            continue
+        for child in section_dir.iterdir():
+            path = f"/{section}/{child.name}/"
+            if child.is_dir() and path not in valid and _remove(path):
+                removed.append(path)
+    return removed
+
+
+def build(paths=None):
+    """
+    Render paths (default: every public URL) and write the ones that changed.
+
+    Returns:
+        dict: {"written": [...], "unchanged": [...], "removed": [...]}
+    """
+    all_paths = public_urls()
+    stats = {"written": [], "unchanged": [], "removed": []}
+    for path in (paths if paths is not None else all_paths):
+        content = render_path(path)
+        if content is None:
+            if _remove(path):
+                stats["removed"].append(path)
+            continue
+        stats["written" if _write(path, content) else "unchanged"].append(path)
+    stats["removed"] += prune(all_paths)
+    return stats
+
+
+def paths_for(instance):
+    """Public URLs whose HTML shows the given object."""
+    if isinstance(instance, HomepageSettings):
+        return ["/"]
+    if isinstance(instance, SitePage):
+        return [f"/{instance.slug}/"] if f"/{instance.slug}/" in STATIC_PATHS else []
+    if isinstance(instance, PracticeArea):
+        # Names appear on the home page, every area's sidebar and case badges
+        return (["/", "/practice-areas/", "/cases/"]
+                + [area.get_absolute_url() for area in PracticeArea.objects.only("slug")]
+                + [case.get_absolute_url() for case in CaseStudy.objects.filter(published=True).only("slug")])
+    if isinstance(instance, BlogPost):
+        return ["/", "/blog/", instance.get_absolute_url()]
+    if isinstance(instance, CaseStudy):
+        return ["/", "/cases/", instance.get_absolute_url()]
+    return []
+
+
+# Paths waiting to be re-rendered; one thread renders them, coalescing bursts of edits
+_pending = set()
+_pending_lock = threading.Lock()
+_refresh_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot")
+
+
+def refresh_for(instance):
+    """Queue the snapshot pages affected by an edit for re-rendering (no-op unless snapshots are enabled)."""
+    if not settings.STATIC_SNAPSHOT_ENABLED:
+        return
+    paths = paths_for(instance)
+    transaction.on_commit(lambda: _schedule(paths))
+
+
+def _schedule(paths):
+    with _pending_lock:
+        idle = not _pending
+        _pending.update(paths)
+    if idle:
+        _refresh_pool.submit(refresh_pending)
+
+
+def refresh_pending():
+    """Re-render every queued path (runs on the snapshot thread)."""
+    with _pending_lock:
+        paths = sorted(_pending)
+        _pending.clear()
+    if not paths:
+        return
+    try:
+        build(paths)
+    except Exception:
+        # Log and carry on; the next full build fixes it
+        logger.exception("Static snapshot refresh failed for %s", ", ".join(paths))
+    finally:
+        connection.close()
+
+
+class StaticSnapshotMiddleware:
+    """
+    Serve pre-rendered public pages to anonymous visitors with zero DB access.
+
+    Sits last in MIDDLEWARE, so SecurityMiddleware and XFrameOptionsMiddleware
+    add their headers to snapshot responses too; sessions and messages are
+    lazy, so the middleware above it does no database work. Requests with a
+    session or messages cookie, a query string, or a non-GET/HEAD method fall
+    through to Django.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if self.servable(request):
+            response = self.snapshot_response(request)
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if self.servable(request):
+            # File reads go through a thread so they don't block the event loop
+            response = await sync_to_async(self.snapshot_response)(request)
+            if response is not None:
+                return response
+        return await self.get_response(request)
+
+    def servable(self, request):
+        return (settings.STATIC_SNAPSHOT_ENABLED
+                and request.method in ("GET", "HEAD")
+                and not request.META.get("QUERY_STRING")
+                and settings.SESSION_COOKIE_NAME not in request.COOKIES
+                and "messages" not in request.COOKIES)
+
+    def snapshot_response(self, request):
+        """The snapshot for this request's path, or None if there isn't one."""
+        target = file_for(request.path_info)
+        if target is None or not target.is_file():
+            return None
+        response = HttpResponse(target.read_bytes(), content_type="text/html; charset=utf-8")
+        response["X-Static-Snapshot"] = "1"
+        return response
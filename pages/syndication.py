@@ -0,0 +1,205 @@
+"""
+sitemap.xml and RSS/Atom feeds for blog posts and case studies.
+
+Crawlers and feed readers poll these URLs far more often than the content
+changes, so each response is:
+
+- rendered once per content version and kept in the content cache
+  (CONTENT_CACHE), keyed by host, path, sitemap page number (?p=N) and a
+  fingerprint of the published rows, so every worker shares one copy. Any
+  other query string is left out of the key, so junk parameters cannot fill
+  the cache;
+- sent with an ETag and answered with 304 Not Modified when the client
+  already has the current version. There is no Last-Modified: deleting or
+  unpublishing the newest post would move it backwards, and clients would
+  keep their stale copy.
+
+The fingerprint itself lives in the two-level content cache and is dropped
+whenever a post, case study, practice area or page is saved or deleted
+(see pages/signals.py), so a conditional GET normally costs no queries.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.sitemaps import Sitemap
+from django.contrib.syndication.views import Feed
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.feedgenerator import Atom1Feed
+from django.views.decorators.http import condition
+
+from . import content_cache
+from .site_config import site_config
+from .models import PracticeArea, BlogPost, CaseStudy
+
+STATE_KEY = "content:syndication_state"
+
+FEED_ITEMS = 20
+
+
+# ---------------------------------------------------------------------------
+# Sitemaps
+# ---------------------------------------------------------------------------
+
+class StaticViewSitemap(Sitemap):
+    changefreq = "monthly"
+    priority = 0.5
+
+    def items(self):
+        return ["home", "about", "practice_areas", "blog_list", "case_list", "book_index", "contact", "privacy", "terms"]
+
+    def location(self, item):
+        return reverse(item)
+
+
+class PracticeAreaSitemap(Sitemap):
+    changefreq = "monthly"
+    priority = 0.7
+
+    def items(self):
+        return PracticeArea.objects.only("slug")
+
+
+class PostSitemap(Sitemap):
+    model = None
+    changefreq = "weekly"
+    priority = 0.6
+
+    def items(self):
+        return self.model.objects.filter(published=True).only("slug", "updated_at").order_by("-updated_at")
+
+    def lastmod(self, obj):
+        return obj.updated_at
+
+
+class BlogPostSitemap(PostSitemap):
+    model = BlogPost
+
+
+class CaseStudySitemap(PostSitemap):
+    model = CaseStudy
+
+
+SITEMAPS = {
+    "static": StaticViewSitemap,
+    "practice-areas": PracticeAreaSitemap,
+    "blog": BlogPostSitemap,
+    "cases": CaseStudySitemap,
+}
+
+
+# ---------------------------------------------------------------------------
+# Feeds
+# ---------------------------------------------------------------------------
+
+class PostFeed(Feed):
+    model = None
+    list_url_name = None
+    section = ""
+
+    def title(self):
+        return f"{site_config()['SITE_NAME']} — {self.section}"
+
+    def link(self):
+        return reverse(self.list_url_name)
+
+    def description(self):
+        return f"{self.section} from {site_config()['SITE_NAME']}"
+
+    def items(self):
+        return self.model.objects.filter(published=True).order_by("-published_at", "-id")[:FEED_ITEMS]
+
+    def item_title(self, item):
+        return item.title
+
+    def item_description(self, item):
+        return item.summary
+
+    def item_pubdate(self, item):
+        return item.published_at or item.created_at
+
+    def item_updateddate(self, item):
+        return item.updated_at
+
+
+class BlogPostFeed(PostFeed):
+    model = BlogPost
+    list_url_name = "blog_list"
+    section = "Insights"
+
+
+class CaseStudyFeed(PostFeed):
+    model = CaseStudy
+    list_url_name = "case_list"
+    section = "Case Studies"
+
+
+class BlogPostAtomFeed(BlogPostFeed):
+    feed_type = Atom1Feed
+    subtitle = BlogPostFeed.description
+
+
+class CaseStudyAtomFeed(CaseStudyFeed):
+    feed_type = Atom1Feed
+    subtitle = CaseStudyFeed.description
+
+
+# ---------------------------------------------------------------------------
+# Conditional GET + response cache
+# ---------------------------------------------------------------------------
+
+def _load_state():
+    """Fingerprint of everything the sitemap and feeds show."""
+    digest = hashlib.sha256()
+    for model in (BlogPost, CaseStudy):
+        rows = model.objects.filter(published=True).order_by("pk").values_list("pk", "slug", "updated_at")
+        digest.update(f"{model.__name__}:{list(rows)}".encode("utf-8"))
+    digest.update(f"PracticeArea:{list(PracticeArea.objects.order_by('pk').values_list('pk', 'slug'))}".encode("utf-8"))
+    return {"etag": digest.hexdigest()[:20]}
+
+
+def syndication_state():
+    """{"etag"} for the current content, from the content cache."""
+    return content_cache.get_cached(STATE_KEY, _load_state)
+
+
+def invalidate():
+    content_cache.invalidate(STATE_KEY)
+
+
+def cached_syndication(view, paged=False):
+    """
+    Serve a sitemap/feed view with an ETag, 304s and a shared
+    rendered-response cache keyed by the content fingerprint.
+
+    Paged views (the sitemap) are cached per ``?p=N`` page number; a
+    non-numeric page is passed to the view uncached (it answers 404).
+    """
+    @condition(etag_func=lambda request, *args, **kwargs: syndication_state()["etag"])
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        page = ""
+        if paged:
+            page = request.GET.get("p", "1")
+            if not page.isdigit():
+                return view(request, *args, **kwargs)
+            page = f"?p={int(page)}"
+        shared = content_cache.shared_cache()
+        url = f"{request.scheme}://{request.get_host()}{request.path}{page}"
+        key = f"syndication:{url}:{syndication_state()['etag']}"
+        cached = shared.get(key)
+        if cached is None:
+            response = view(request, *args, **kwargs)
+            if hasattr(response, "render"):
+                response.render()
+            if response.status_code != 200:
+                return response
+            cached = (response.content, response["Content-Type"])
+            shared.set(key, cached, settings.CONTENT_CACHE_TIMEOUT)
+
+        response = HttpResponse(cached[0], content_type=cached[1])
+        patch_cache_control(response, public=True, max_age=settings.SYNDICATION_MAX_AGE)
+        return response
+    return wrapper
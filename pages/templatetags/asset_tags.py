@@ -0,0 +1,25 @@
+from functools import lru_cache
+
+from django import template
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.utils.safestring import mark_safe
+
+from pages.assets import critical_path
+
+register = template.Library()
+
+
+@lru_cache(maxsize=None)
+def _read_critical(template_name):
+    path = critical_path(template_name)
+    if not staticfiles_storage.exists(path):
+        return ""
+    with staticfiles_storage.open(path) as f:
+        return f.read().decode("utf-8")
+
+
+@register.simple_tag(takes_context=True)
+def critical_css(context):
+    """Critical CSS built by build_assets for the page's template, or "" if there is none."""
+    name = getattr(context.template, "name", None)
+    return mark_safe(_read_critical(name)) if name else ""
@@ -0,0 +1,11 @@
+from django import template
+
+from pages.rich_text import rendered
+
+register = template.Library()
+
+
+@register.filter
+def rich_text(html):
+    """Sanitised RichTextField HTML, rendered once per distinct body (see pages/rich_text.py)."""
+    return rendered(html)
@@ -0,0 +1,236 @@
+"""
+Batched intake triage (TRIAGE_MODE=batch).
+
+Inline triage (views.classify_intake_session) sends the whole
+intake_classify.txt system prompt, about 4.4 KB, for every enquiry, and gets
+back a reply of a few dozen tokens. In batch mode the thank-you page does not
+call the LLM. A loop in the web service (pages/background.py; or
+``manage.py triage_intakes --loop`` with a shared database) collects
+pending enquiries until TRIAGE_BATCH_SIZE are waiting or the oldest has
+waited TRIAGE_BATCH_WINDOW seconds. It then classifies them all in one
+request: the same system prompt plus BATCH_INSTRUCTIONS, with the enquiries
+as a JSON array and a JSON array of results in reply. Each result is mapped
+back to its IntakeSession by id.
+
+- Enquiries with a memoised result (pages/llm_cache.py) are not sent again.
+- If the reply is not valid JSON, or an enquiry is missing or malformed in
+  it, those enquiries fall back to individual calls.
+- The batch request takes a "triage" admission slot (pages/llm_admission.py)
+  like an inline call. A failed or refused request (timeout, 5xx, open
+  circuit, no slot) is not retried one by one; the enquiries stay pending
+  for the next batch.
+- An enquiry whose individual fallback fails TRIAGE_MAX_ATTEMPTS times is
+  given up on (counted in structured_output["triage_failures"]) and keeps
+  the conservative next steps.
+
+The thank-you page never waits for the result. While awaiting_result() is
+true (batch mode, not triaged, under TRIAGE_BATCH_WAIT seconds old) it shows
+that the enquiry is being checked and reloads itself.
+
+scripts/bench_triage_batching.py measures calls and tokens per intake at
+several batch sizes.
+"""
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import llm_admission
+from .llm_cache import lookup_result, store_result
+from .llm_resilience import answered_by
+from .llm_utils import call_llm_messages, LLMError
+from .models import IntakeSession
+from .prompts import get_prompt
+
+logger = logging.getLogger(__name__)
+
+KIND = "triage"
+FAILURES_KEY = "triage_failures"
+STATS = ("sessions", "cached", "batched", "individual", "failed", "abandoned", "llm_calls")
+
+BATCH_INSTRUCTIONS = """
+-------------------------
+BATCH MODE
+-------------------------
+
+The user message is a JSON array of enquiries, each {"id": "...", "text": "..."}.
+Classify every enquiry independently, using only its own text and the rules above.
+
+Respond with a JSON array ONLY: one object per enquiry, each with the enquiry's "id"
+copied exactly, plus exactly the keys described under OUTPUT FORMAT.
+"""
+
+# Reply budget per enquiry ({"id": "12", "is_suitable": false, "recommended_slot_type": "initial"})
+TOKENS_PER_RESULT = 40
+
+
+class MalformedBatch(ValueError):
+    """The batch reply could not be parsed into a list of results."""
+    pass
+
+
+def pending_sessions():
+    """Recent intake sessions that have not been triaged (or given up on) yet, oldest first."""
+    cutoff = timezone.now() - timedelta(seconds=settings.TRIAGE_PENDING_MAX_AGE)
+    return (
+        IntakeSession.objects.filter(is_suitable__isnull=True, created_at__gte=cutoff)
+        .exclude(structured_output__has_key="triage")
+        .exclude(**{f"structured_output__{FAILURES_KEY}__gte": settings.TRIAGE_MAX_ATTEMPTS})
+        .order_by("created_at")
+    )
+
+
+def awaiting_result(session, now=None):
+    """Whether the thank-you page should keep checking for session's batched triage result."""
+    if settings.TRIAGE_MODE != "batch" or session.is_suitable is not None:
+        return False
+    if (session.structured_output or {}).get(FAILURES_KEY, 0) >= settings.TRIAGE_MAX_ATTEMPTS:
+        return False
+    return session.created_at > (now or timezone.now()) - timedelta(seconds=settings.TRIAGE_BATCH_WAIT)
+
+
+def _record_failure(session):
+    """Count a failed individual classification; returns True once the session is given up on."""
+    output = session.structured_output or {}
+    output[FAILURES_KEY] = output.get(FAILURES_KEY, 0) + 1
+    session.structured_output = output
+    session.save(update_fields=["structured_output"])
+    if output[FAILURES_KEY] < settings.TRIAGE_MAX_ATTEMPTS:
+        return False
+    logger.warning("Giving up on triage of intake %s after %d failed attempts", session.uuid, output[FAILURES_KEY])
+    return True
+
+
+def due_batch(batch_size=None, window=None, now=None):
+    """Pending sessions to classify now: a full batch, or whatever is waiting once the oldest has waited ``window`` seconds."""
+    batch_size = batch_size or settings.TRIAGE_BATCH_SIZE
+    window = settings.TRIAGE_BATCH_WINDOW if window is None else window
+    sessions = list(pending_sessions()[:batch_size])
+    if not sessions:
+        return []
+    now = now or timezone.now()
+    if len(sessions) >= batch_size or sessions[0].created_at <= now - timedelta(seconds=window):
+        return sessions
+    return []
+
+
+def batch_messages(prompt, sessions):
+    """Chat messages for one batched triage request; ids are positions in sessions."""
+    items = [{"id": str(n), "text": session.raw_text} for n, session in enumerate(sessions, start=1)]
+    return [
+        {"role": "system", "content": prompt.text.rstrip() + "\n" + BATCH_INSTRUCTIONS},
+        {"role": "user", "content": json.dumps(items, ensure_ascii=False)},
+    ]
+
+
+def parse_batch(reply, count):
+    """{position: result} for the well-formed results in a batch reply."""
+    try:
+        data = json.loads(reply)
+    except json.JSONDecodeError as e:
+        raise MalformedBatch(f"Batch reply was not valid JSON: {e}") from e
+    if isinstance(data, dict):
+        # JSON-object response modes wrap the array
+        data = data.get("results")
+    if not isinstance(data, list):
+        raise MalformedBatch("Batch reply was not a JSON array")
+
+    results = {}
+    for item in data:
+        if not isinstance(item, dict) or not isinstance(item.get("is_suitable"), bool):
+            continue
+        try:
+            position = int(item.get("id"))
+        except (TypeError, ValueError):
+            continue
+        if 1 <= position <= count and position not in results:
+            results[position] = {k: v for k, v in item.items() if k != "id"}
+    return results
+
+
+def classify_batch(sessions):
+    """
+    Triage sessions with one LLM request (plus individual fallbacks).
+
+    Returns a dict of counts keyed by STATS; "abandoned" enquiries were
+    given up on (and are also counted as failed).
+    """
+    # views imports this module for the thank-you page
+    from .views import apply_triage_result, classify_intake_session
+
+    stats = dict.fromkeys(STATS, 0)
+    stats["sessions"] = len(sessions)
+    if not sessions:
+        return stats
+    try:
+        prompt = get_prompt("intake_classify.txt")
+    except FileNotFoundError:
+        stats["failed"] = len(sessions)
+        return stats
+
+    todo = []
+    for session in sessions:
+        result = lookup_result(KIND, prompt, session.raw_text)
+        if result is None:
+            todo.append(session)
+            continue
+        apply_triage_result(session, result, prompt)
+        session.save(update_fields=["is_suitable", "structured_output"])
+        stats["cached"] += 1
+    if not todo:
+        return stats
+
+    stats["llm_calls"] += 1
+    answered_by.set(None)
+    try:
+        with llm_admission.admit("triage"):
+            reply = call_llm_messages(
+                batch_messages(prompt, todo),
+                temperature=0.1,
+                max_tokens=TOKENS_PER_RESULT * len(todo) + 20,
+                timeout=settings.TRIAGE_BATCH_TIMEOUT,
+            )
+    except LLMError:
+        # The endpoint is failing or busy; the next batch retries rather than N single calls now
+        stats["failed"] += len(todo)
+        return stats
+
+    try:
+        results = parse_batch(reply, len(todo))
+    except MalformedBatch:
+        results = {}
+
+    for position, session in enumerate(todo, start=1):
+        result = results.get(position)
+        if result is not None:
+            store_result(KIND, prompt, session.raw_text, result, model=answered_by.get())
+            apply_triage_result(session, result, prompt)
+            session.save(update_fields=["is_suitable", "structured_output"])
+            stats["batched"] += 1
+            continue
+        stats["llm_calls"] += 1
+        if classify_intake_session(session):
+            stats["individual"] += 1
+        else:
+            stats["failed"] += 1
+            stats["abandoned"] += _record_failure(session)
+    return stats
+
+
+def run_due(batch_size=None, window=None):
+    """Classify one due batch, if any."""
+    return classify_batch(due_batch(batch_size=batch_size, window=window))
+
+
+def run_pending(batch_size=None, window=None):
+    """Classify due batches until none is left or a request fails. Returns the summed stats."""
+    totals = dict.fromkeys(STATS, 0)
+    while True:
+        stats = run_due(batch_size=batch_size, window=window)
+        for key in totals:
+            totals[key] += stats[key]
+        # Failed enquiries stay pending; leave them for the next poll
+        if not stats["sessions"] or stats["failed"]:
+            return totals
@@ -1,6 +1,17 @@
+from django.conf import settings
 from django.urls import path
 from django.contrib.auth import views as auth_views
+from django.contrib.sitemaps.views import sitemap
 from . import views
+from .syndication import (
+    SITEMAPS, cached_syndication, BlogPostFeed, BlogPostAtomFeed, CaseStudyFeed, CaseStudyAtomFeed,
+)
+
+# LLM-bound views: async versions when running under ASGI (see pages/async_views.py)
+if settings.ASYNC_LLM_VIEWS:
+    from . import async_views as llm_views
+else:
+    llm_views = views
 
 urlpatterns = [
     path("", views.home, name="home"),
@@ -14,15 +25,23 @@ urlpatterns = [
     path("book/success/<int:booking_id>/", views.book_success, name="book_success"),
     path("contact/", views.contact, name="contact"),
     path("intake/", views.intake_start, name="intake_start"),
-    path("intake/thank-you/<uuid:intake_uuid>/", views.intake_thank_you, name="intake_thank_you"),
+    path("intake/thank-you/<uuid:intake_uuid>/", llm_views.intake_thank_you, name="intake_thank_you"),
     path("privacy/", views.privacy, name="privacy"),
     path("terms/", views.terms, name="terms"),
     path("blog/", views.blog_list, name="blog_list"),
     path("blog/<slug:slug>/", views.blog_detail, name="blog_detail"),
     path("cases/", views.case_list, name="case_list"),
     path("cases/<slug:slug>/", views.case_detail, name="case_detail"),
+    path("sitemap.xml", cached_syndication(sitemap, paged=True), {"sitemaps": SITEMAPS}, name="sitemap"),
+    path("feeds/blog.rss", cached_syndication(BlogPostFeed()), name="blog_feed"),
+    path("feeds/blog.atom", cached_syndication(BlogPostAtomFeed()), name="blog_atom_feed"),
+    path("feeds/cases.rss", cached_syndication(CaseStudyFeed()), name="case_feed"),
+    path("feeds/cases.atom", cached_syndication(CaseStudyAtomFeed()), name="case_atom_feed"),
+    path("healthz", views.healthz, name="healthz"),
     path("webhooks/calendly/", views.calendly_webhook, name="calendly_webhook"),
-    path("api/assist/", views.ai_assist, name="ai_assist"),
+    path("api/availability/", views.availability_api, name="availability_api"),
+    path("api/availability/next/", views.availability_next_api, name="availability_next_api"),
+    path("api/assist/", llm_views.ai_assist, name="ai_assist"),
     path("calendar/<str:secret_key>.ics", views.calendar_feed, name="calendar_feed"),
 
     # Owner area (obscure URL for security)
@@ -47,7 +66,7 @@ urlpatterns = [
     path("owner/cases/<int:pk>/delete/", views.owner_case_delete, name="owner_case_delete"),
     path("owner/intake/", views.owner_intake_list, name="owner_intake_list"),
     path("owner/intake/<uuid:intake_uuid>/", views.owner_intake_detail, name="owner_intake_detail"),
-    path("owner/intake/<uuid:intake_uuid>/analyse/", views.owner_intake_analyse, name="owner_intake_analyse"),
+    path("owner/intake/<uuid:intake_uuid>/analyse/", llm_views.owner_intake_analyse, name="owner_intake_analyse"),
     path("owner/availability/", views.owner_availability_list, name="owner_availability_list"),
     path("owner/availability/new/", views.owner_availability_create, name="owner_availability_create"),
     path("owner/availability/<int:pk>/", views.owner_availability_edit, name="owner_availability_edit"),
@@ -55,4 +74,5 @@ urlpatterns = [
     path("owner/bookings/", views.owner_booking_list, name="owner_booking_list"),
     path("owner/bookings/<int:pk>/", views.owner_booking_detail, name="owner_booking_detail"),
     path("owner/bookings/<int:pk>/toggle-paid/", views.owner_booking_toggle_paid, name="owner_booking_toggle_paid"),
+    path("owner/export/<slug:dataset>.<slug:fmt>", views.owner_export, name="owner_export"),
 ]
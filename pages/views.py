@@ -5,22 +5,30 @@ from django.conf import settings
 from django.contrib import messages
 from .forms import ContactForm, HomepageSettingsForm, AboutPageForm, SitePageForm, PracticeAreaForm, BlogPostForm, CaseStudyForm, IntakeForm, AvailabilitySlotForm, BookingSubmissionForm
 import hmac, hashlib, json
-import re, time, requests
+import logging
+import re, time
 from datetime import datetime, timedelta
 from django.http import HttpResponse, HttpResponseForbidden, JsonResponse, HttpResponseBadRequest
 from .models import Booking, HomepageSettings, PracticeArea
 from .models import SitePage, PracticeArea, BlogPost, CaseStudy, IntakeSession, AvailabilitySlot, BookingSubmission
 from django.core.cache import cache
+from django.db import connection, transaction
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.utils import timezone
-from pathlib import Path
-from .llm_utils import call_llm_json, LLMError
+from .llm_utils import call_llm_json, call_llm_messages, LLMError
+from .exports import streaming_export, ExportError
+from .intake_analysis import load_analysis_prompt, analyse_text
+from .prompts import get_prompt
+from .llm_cache import cached_llm_result, result_cache_stats
+from . import assist_context, availability, conversations, ics, llm_admission, outbox, site_index, triage
+
+logger = logging.getLogger(__name__)
 
 def home(request):
-    homepage = HomepageSettings.load()
+    homepage = HomepageSettings.cached()
     practice_areas = PracticeArea.objects.all()[:3]
-    featured_cases = CaseStudy.objects.filter(published=True).order_by('-published_at')[:3]
+    featured_cases = CaseStudy.objects.filter(published=True).prefetch_related('practice_areas').order_by('-published_at')[:3]
     latest_posts = BlogPost.objects.filter(published=True).order_by('-published_at')[:3]
     return render(request, "SitePages/home.html", {
         "homepage": homepage,
@@ -30,17 +38,14 @@ def home(request):
     })
 
 def about(request):
-    page, created = SitePage.objects.get_or_create(
-        slug="about",
-        defaults={"title": "About", "body": ""}
-    )
+    page = SitePage.cached_page(slug="about", title="About")
     return render(request, "SitePages/about.html", {"page": page})
 
 # Old Calendly booking view - replaced by custom booking system
 # def book(request): return render(request, "SitePages/book.html")
 
 def privacy(request):
-    page = SitePage.get_or_create_page(
+    page = SitePage.cached_page(
         slug="privacy",
         title="Privacy Policy",
         body="<p>This is a placeholder privacy policy. Please update this content from the Owner area.</p>"
@@ -48,7 +53,7 @@ def privacy(request):
     return render(request, "SitePages/privacy.html", {"page": page})
 
 def terms(request):
-    page = SitePage.get_or_create_page(
+    page = SitePage.cached_page(
         slug="terms",
         title="Terms of Use",
         body="<p>This is a placeholder terms of use. Please update this content from the Owner area.</p>"
@@ -70,6 +75,17 @@ def contact(request):
         form = IntakeForm()
     return render(request, "SitePages/contact.html", {"form": form})
 
+def healthz(request):
+    """
+    Liveness/readiness probe for the platform and load balancers.
+    Checks the database connection only; never touches the LLM.
+    """
+    try:
+        connection.ensure_connection()
+    except Exception:
+        return JsonResponse({"status": "error", "database": "unavailable"}, status=503)
+    return JsonResponse({"status": "ok"})
+
 def calendly_webhook(request):
     if request.method != "POST":
         return HttpResponse(status=405)
@@ -140,7 +156,7 @@ def blog_detail(request, slug):
 
 # Cases
 def case_list(request):
-    cases = CaseStudy.objects.filter(published=True).order_by('-published_at', '-id')
+    cases = CaseStudy.objects.filter(published=True).prefetch_related('practice_areas').order_by('-published_at', '-id')
     return render(request, "SitePages/case_list.html", {"cases": cases})
 
 def case_detail(request, slug):
@@ -163,6 +179,16 @@ def intake_start(request):
         form = IntakeForm()
     return render(request, "SitePages/intake_start.html", {"form": form})
 
+def apply_triage_result(session, result, prompt):
+    """Copy a triage LLM result onto an IntakeSession (does not save)."""
+    # Update session with ONLY suitability assessment
+    session.is_suitable = result.get("is_suitable", None)
+
+    # Store triage results in structured_output for record-keeping
+    if session.structured_output is None:
+        session.structured_output = {}
+    session.structured_output["triage"] = {**result, "prompt_version": prompt.version}
+
 def classify_intake_session(session):
     """
     Lightweight AI triage for intake sessions.
@@ -180,10 +206,9 @@ def classify_intake_session(session):
     if session.is_suitable is not None:
         return True  # Already classified, skip
 
-    # Load lightweight classification prompt
-    prompt_file = Path(settings.BASE_DIR) / "ai" / "prompts" / "intake_classify.txt"
+    # Load lightweight classification prompt (cached in memory, reloaded on change)
     try:
-        system_prompt = prompt_file.read_text(encoding="utf-8")
+        prompt = get_prompt("intake_classify.txt")
     except FileNotFoundError:
         # Fail silently - prompt file missing
         return False
@@ -192,23 +217,22 @@ def classify_intake_session(session):
     user_prompt = session.raw_text
 
     # Call LLM with shorter timeout and lower token limit
+    # (identical resubmissions reuse the memoised result instead)
     try:
-        result = call_llm_json(
-            system_prompt=system_prompt,
-            user_prompt=user_prompt,
-            temperature=0.1,  # Low temperature for consistent classification
-            max_tokens=100,   # Small response expected
-            timeout=10        # Quick timeout
-        )
-
-        # Update session with ONLY suitability assessment
-        session.is_suitable = result.get("is_suitable", None)
-
-        # Store triage results in structured_output for record-keeping
-        if session.structured_output is None:
-            session.structured_output = {}
-        session.structured_output["triage"] = result
-
+        def call():
+            # Waits briefly for a triage slot; if none frees up the page shows the conservative message
+            with llm_admission.admit("triage"):
+                return call_llm_json(
+                    system_prompt=prompt.text,
+                    user_prompt=user_prompt,
+                    temperature=0.1,  # Low temperature for consistent classification
+                    max_tokens=100,   # Small response expected
+                    timeout=10        # Quick timeout
+                )
+
+        result = cached_llm_result("triage", prompt, user_prompt, call)
+
+        apply_triage_result(session, result, prompt)
         session.save()
         return True
 
@@ -227,10 +251,15 @@ def intake_thank_you(request, intake_uuid):
     """
     intake_session = get_object_or_404(IntakeSession, uuid=intake_uuid)
 
-    # Run lightweight classification (fails silently if AI unavailable)
-    classify_intake_session(intake_session)
+    if settings.TRIAGE_MODE != "batch":
+        # Run lightweight classification (fails silently if AI unavailable)
+        classify_intake_session(intake_session)
 
-    return render(request, "SitePages/intake_thank_you.html", {"intake_session": intake_session})
+    # In batch mode the page reloads itself until the triage loop has a result
+    return render(request, "SitePages/intake_thank_you.html", {
+        "intake_session": intake_session,
+        "triage_pending": triage.awaiting_result(intake_session),
+    })
 
 # Owner area
 def is_staff_user(user):
@@ -416,7 +445,7 @@ def owner_blog_delete(request, pk):
 @login_required
 @user_passes_test(is_staff_user, login_url='/')
 def owner_case_list(request):
-    cases = CaseStudy.objects.all()
+    cases = CaseStudy.objects.prefetch_related('practice_areas')
     return render(request, "SitePages/owner_case_list.html", {"cases": cases})
 
 @login_required
@@ -477,7 +506,10 @@ def owner_intake_list(request):
     PHASE 1: Read-only list view (no edit/delete functionality yet).
     """
     intake_sessions = IntakeSession.objects.all()
-    return render(request, "SitePages/owner_intake_list.html", {"intake_sessions": intake_sessions})
+    return render(request, "SitePages/owner_intake_list.html", {
+        "intake_sessions": intake_sessions,
+        "llm_cache_stats": result_cache_stats(),
+    })
 
 @login_required
 @user_passes_test(is_staff_user, login_url='/')
@@ -498,25 +530,16 @@ def owner_intake_analyse(request, intake_uuid):
         return redirect("owner_intake_list")
 
     # Load the system prompt from file
-    prompt_file = Path(settings.BASE_DIR) / "ai" / "prompts" / "intake_prompt.txt"
     try:
-        system_prompt = prompt_file.read_text(encoding="utf-8")
+        prompt = load_analysis_prompt()
     except FileNotFoundError:
         messages.error(request, "AI intake prompt file not found. Please check configuration.")
         return redirect("owner_intake_list")
 
-    # Prepare user prompt (just the raw text)
-    user_prompt = intake_session.raw_text
-
-    # Call LLM
+    # Call LLM (user prompt is just the raw text)
     try:
-        result = call_llm_json(
-            system_prompt=system_prompt,
-            user_prompt=user_prompt,
-            temperature=0.2,
-            max_tokens=1500,
-            timeout=30
-        )
+        with llm_admission.admit("analysis"):
+            result = analyse_text(prompt, intake_session.raw_text)
 
         # Update IntakeSession with results
         # IMPORTANT: Only update structured_output, NOT is_suitable or recommended_slot_type
@@ -527,6 +550,9 @@ def owner_intake_analyse(request, intake_uuid):
         messages.success(request, "AI analysis completed successfully.")
         return redirect("owner_intake_detail", intake_uuid=intake_uuid)
 
+    except llm_admission.LLMBusyError as e:
+        messages.error(request, f"AI analysis is busy; please try again in {e.retry_after} seconds.")
+        return redirect("owner_intake_list")
     except LLMError as e:
         messages.error(request, f"AI analysis failed: {str(e)}")
         return redirect("owner_intake_list")
@@ -574,16 +600,18 @@ RULES:
 
 INTERNAL LINKS:
 - You may include internal links using HTML anchor tags: <a href="/path/">link text</a>
+- Only these HTML tags are shown: <a>, <p>, <ul>, <li>, <strong>, <em>
 - ONLY link to URLs listed in the SITE MAP below, or to top-level pages: /about/, /contact/, /book/, /practice-areas/, /blog/, /cases/
 - Do NOT invent or guess URLs. If unsure whether a specific page exists, link to the nearest parent page.
 - Example: "You can learn more about employment matters <a href='/practice-areas/employment/'>here</a>."
 - Example: "To book a consultation, visit the <a href='/book/'>booking page</a>."
 """
 
-def _build_site_context():
+def _build_site_context(user_msg=""):
     """
-    Build a structured site map with real URLs from the database.
-    Returns a formatted string for injection into the system prompt.
+    Site map for the system prompt: the fixed top-level pages, plus the
+    practice areas, posts and case studies most relevant to the user's
+    message (BM25 over the site index, pages/site_index.py).
     """
     parts = []
 
@@ -599,40 +627,51 @@ def _build_site_context():
     parts.append("- Terms of Use: /terms/")
     parts.append("")
 
-    # Practice Areas (with real URLs)
     try:
-        areas = PracticeArea.objects.all().order_by("order")[:8]
-        if areas:
-            parts.append("Practice Areas (detailed pages):")
-            for area in areas:
-                url = f"/practice-areas/{area.slug}/"
-                parts.append(f"- {area.name}: {url}")
-            parts.append("")
+        matches = site_index.search(user_msg, limit=settings.ASSIST_CONTEXT_PAGES)
     except Exception:
-        pass
+        matches = []
+    if matches:
+        parts.append("Pages relevant to this question:")
+        for match in matches:
+            parts.append(f"- {site_index.LABELS[match['kind']]}: {match['title']}: {match['url']}")
+        parts.append("")
 
-    # Recent Blog Posts
-    try:
-        posts = BlogPost.objects.filter(published=True).order_by('-published_at')[:6]
-        if posts:
-            parts.append("Recent Blog Posts:")
-            for post in posts:
-                parts.append(f"- {post.title}: {post.get_absolute_url()}")
-            parts.append("")
-    except Exception:
-        pass
+    return "\n".join(parts)
 
-    # Recent Case Studies
+# Messages that ask about booking get the live next-available slots in the prompt
+BOOKING_INTENT = re.compile(
+    r"\b(book|booking|appointment|availab\w*|slots?|consultation|earliest|soonest|next free|when can)\b", re.I
+)
+ASSIST_SLOT_SUGGESTIONS = 3
+
+def _build_slot_context(user_msg):
+    """
+    The next bookable slots matching what the visitor asked for, formatted for
+    the system prompt, or "" when the message isn't about booking.
+    """
+    if not BOOKING_INTENT.search(user_msg):
+        return ""
+    filters = availability.filters_from_text(user_msg)
+    header = "NEXT AVAILABLE CONSULTATION SLOTS (live; you may link these booking URLs):"
     try:
-        cases = CaseStudy.objects.filter(published=True).order_by('-published_at')[:4]
-        if cases:
-            parts.append("Recent Case Studies:")
-            for case in cases:
-                parts.append(f"- {case.title}: {case.get_absolute_url()}")
-            parts.append("")
+        slots = availability.next_available(limit=ASSIST_SLOT_SUGGESTIONS, **filters)
+        if not slots and filters:
+            # Nothing matches every preference: offer the earliest slots instead
+            slots = availability.next_available(limit=ASSIST_SLOT_SUGGESTIONS)
+            header += "\n(No slot matches all of the visitor's preferences; these are the earliest overall.)"
+        types = dict(AvailabilitySlot.SLOT_TYPE_CHOICES)
+        parts = [header]
+        for slot in slots:
+            d = datetime.strptime(slot["date"], "%Y-%m-%d")
+            day = f"{d:%A} {d.day} {d:%B %Y}"  # no %-d: it is glibc-only
+            parts.append(f"- {day}, {slot['start']}-{slot['end']} ({types.get(slot['slot_type'], slot['slot_type'])}, "
+                         f"{slot['duration_minutes']} minutes): {slot['url']}")
     except Exception:
-        pass
+        return ""
 
+    if not slots:
+        parts.append("- No slots are currently open. Suggest the contact form or checking /book/ later.")
     return "\n".join(parts)
 
 def _redact_personal(text: str) -> str:
@@ -646,12 +685,23 @@ def _rate_key(request):
     ua = request.META.get("HTTP_USER_AGENT", "")[:60]
     return "assist_rl_" + hashlib.sha256(f"{ip}|{ua}".encode()).hexdigest()
 
-@csrf_exempt
-def ai_assist(request):
+ASSIST_UNAVAILABLE_REPLY = ("Sorry—I'm unavailable right now. For anything important, "
+                            "please use the contact form or book a consultation.")
+ASSIST_BUSY_REPLY = ("Sorry—I'm answering a lot of questions right now. Please try again in a moment, "
+                     "or use the contact form or book a consultation.")
+
+def _assist_begin(request):
+    """
+    Validate, throttle and build the LLM messages for an ai_assist request.
+
+    Shared by the sync view and the async (ASGI) view in async_views.py.
+    Returns (response, None) when the request is answered without the LLM,
+    otherwise (None, state) where state is passed on to _assist_finish().
+    """
     if request.method != "POST":
-        return JsonResponse({"reply": "POST only"}, status=405)
+        return JsonResponse({"reply": "POST only"}, status=405), None
     if not settings.ASSISTANT_ENABLED:
-        return JsonResponse({"reply": "The assistant is currently unavailable. Please use the contact form or book a consultation."})
+        return JsonResponse({"reply": "The assistant is currently unavailable. Please use the contact form or book a consultation."}), None
 
     # very light per-IP throttle: 1 request / 3 seconds, burst 3 in 30s
     key = _rate_key(request)
@@ -660,68 +710,89 @@ def ai_assist(request):
     # drop old timestamps
     window["ts"] = [t for t in window["ts"] if now - t < 30]
     if window.get("block", 0) and now - window["block"] < 10:
-        return JsonResponse({"reply":"You're sending messages a bit quickly—please wait a moment and try again."}, status=200)
+        return JsonResponse({"reply":"You're sending messages a bit quickly—please wait a moment and try again."}, status=200), None
     if len(window["ts"]) >= 3:
         window["block"] = now
         cache.set(key, window, 30)
-        return JsonResponse({"reply":"You're sending messages a bit quickly—please wait a moment and try again."}, status=200)
+        return JsonResponse({"reply":"You're sending messages a bit quickly—please wait a moment and try again."}, status=200), None
 
     try:
         payload = json.loads(request.body.decode("utf-8"))
         user_msg = (payload.get("message") or "").strip()
-        history  = payload.get("history") or []
+        conversation_id = payload.get("conversation")
     except Exception:
-        return JsonResponse({"reply": "Invalid request format"}, status=400)
+        return JsonResponse({"reply": "Invalid request format"}, status=400), None
 
     if not user_msg:
-        return JsonResponse({"reply": "Please enter a message"}, status=400)
-
-    # keep short history
-    history = history[-8:]
+        return JsonResponse({"reply": "Please enter a message"}, status=400), None
 
     # Build site-aware context with real URLs
-    site_map = _build_site_context()
+    site_map = _build_site_context(user_msg)
     system_message = _get_system_prompt() + "\n\n" + site_map
+    slot_context = _build_slot_context(user_msg)
+    if slot_context:
+        system_message += "\n\n" + slot_context
+
+    # The conversation so far is stored server-side; the client only sends its id
+    conversation_id, turns = conversations.load(conversation_id)
+
+    # Recent turns verbatim within the token budget, older ones as a running summary
+    messages, stats = assist_context.build_messages(system_message, turns, user_msg)
+    logger.info(
+        "ai_assist prompt: ~%d tokens (~%d untrimmed), %d history message(s) kept, %d summarised",
+        stats["prompt_tokens"], stats["untrimmed_tokens"], stats["kept"], stats["summarised"],
+    )
 
-    messages = [
-        {"role":"system","content": system_message},
-    ] + history + [
-        {"role":"user","content": user_msg}
-    ]
-
-    # Call OpenAI-compatible endpoint
-    try:
-        resp = requests.post(
-            f"{settings.LLM_BASE_URL}/chat/completions",
-            headers={
-                "Authorization": f"Bearer {settings.LLM_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": settings.LLM_MODEL,
-                "messages": messages,
-                "temperature": 0.2,
-                "max_tokens": 350,
-            },
-            timeout=25,
-        )
-        resp.raise_for_status()
-        data = resp.json()
-        reply = data["choices"][0]["message"]["content"].strip()
-    except Exception:
-        reply = ("Sorry—I'm unavailable right now. For anything important, "
-                 "please use the contact form or book a consultation.")
+    return None, {
+        "key": key, "now": now, "window": window, "messages": messages,
+        "conversation": conversation_id, "turns": turns, "user_msg": user_msg,
+    }
 
+def _assist_finish(state, reply):
+    """Record the throttle timestamp, store the turn and build the ai_assist JSON response."""
     # record a timestamp for rate-limiting window
-    window["ts"].append(now)
-    cache.set(key, window, 30)
+    window = state["window"]
+    window["ts"].append(state["now"])
+    cache.set(state["key"], window, 30)
 
     # light redaction before returning (just in case)
     reply = _redact_personal(reply)
 
+    if reply != ASSIST_UNAVAILABLE_REPLY:
+        conversations.append(
+            state["conversation"], state["turns"],
+            {"role": "user", "content": assist_context.clean_message(_redact_personal(state["user_msg"]))},
+            {"role": "assistant", "content": assist_context.clean_message(reply)},
+        )
+
     # Note: Frontend handles HTML sanitization, only allowing safe tags
     # (<a>, <p>, <ul>, <li>, <strong>, <em>) and only internal links (starting with /)
-    return JsonResponse({"reply": reply})
+    return JsonResponse({"reply": reply, "conversation": state["conversation"]})
+
+def _assist_busy(state, error):
+    """503 for an ai_assist request refused by admission control; nothing is stored."""
+    response = JsonResponse({"reply": ASSIST_BUSY_REPLY, "conversation": state["conversation"]}, status=503)
+    response["Retry-After"] = str(error.retry_after)
+    return response
+
+@csrf_exempt
+def ai_assist(request):
+    response, state = _assist_begin(request)
+    if response is not None:
+        return response
+
+    # Call OpenAI-compatible endpoint (fails fast while the LLM circuit is open,
+    # and sheds load when too many assistant calls are already in flight)
+    try:
+        with llm_admission.admit("assist"):
+            reply = call_llm_messages(state["messages"], temperature=0.2, max_tokens=350, timeout=25)
+    except llm_admission.LLMBusyError as e:
+        return _assist_busy(state, e)
+    except Exception:
+        reply = ASSIST_UNAVAILABLE_REPLY
+
+    return _assist_finish(state, reply)
+
 # ========== BOOKING SYSTEM VIEWS ==========
 
 # Owner Availability Management
@@ -789,26 +860,11 @@ def book_index(request):
     Optional query parameters:
     - intake: UUID of related IntakeSession (for context display only)
     """
-    from datetime import date
-    from collections import defaultdict
-
     # Get optional context from query parameters
     intake_uuid = request.GET.get('intake')
 
-    # Get all available slots in the future
-    today = date.today()
-    available_slots = AvailabilitySlot.objects.filter(
-        date__gte=today,
-        is_available=True
-    ).order_by('date', 'start_time')
-
-    # Group slots by date
-    dates_with_counts = defaultdict(int)
-    for slot in available_slots:
-        dates_with_counts[slot.date] += 1
-
-    # Convert to list of tuples (date, count)
-    dates_list = sorted(dates_with_counts.items())
+    # Dates with bookable slots and their counts, in one GROUP BY query
+    dates_list = availability.upcoming_dates()
 
     context = {
         "dates_list": dates_list,
@@ -828,11 +884,8 @@ def book_date(request, date):
         messages.error(request, "Invalid date format.")
         return redirect("book_index")
 
-    # Get available slots for this date
-    slots = AvailabilitySlot.objects.filter(
-        date=selected_date,
-        is_available=True
-    ).order_by('start_time')
+    # Get bookable slots for this date (slots that have already ended are filtered in SQL)
+    slots = availability.bookable_slots().filter(date=selected_date).order_by('start_time')
 
     if not slots:
         messages.warning(request, "No available slots for this date.")
@@ -843,6 +896,59 @@ def book_date(request, date):
         "slots": slots,
     })
 
+def availability_api(request):
+    """
+    JSON month view of bookable slots for the calendar on /book/.
+
+    Query parameters:
+    - month: YYYY-MM (defaults to the current month)
+    """
+    month = request.GET.get("month") or timezone.localdate().strftime("%Y-%m")
+    try:
+        year, month_number = (int(part) for part in month.split("-"))
+        data = availability.month_availability(year, month_number)
+    except ValueError:
+        return JsonResponse({"error": "month must be YYYY-MM"}, status=400)
+    return JsonResponse(data)
+
+def availability_next_api(request):
+    """
+    JSON list of the earliest bookable slots.
+
+    Query parameters (all optional):
+    - slot_type: initial, followup or general
+    - min_duration: minutes
+    - weekday: comma-separated mon..sun or 1..7
+    - time_of_day: morning, afternoon or evening
+    - after / before: HH:MM; the slot starts at or after / ends at or before
+    - limit: number of slots (default 5, at most 20)
+    """
+    params = request.GET
+    try:
+        filters = {"limit": int(params.get("limit") or 5)}
+        slot_type = params.get("slot_type")
+        if slot_type:
+            if slot_type not in dict(AvailabilitySlot.SLOT_TYPE_CHOICES):
+                raise ValueError("slot_type")
+            filters["slot_type"] = slot_type
+        if params.get("min_duration"):
+            filters["min_duration"] = int(params["min_duration"])
+            if not 0 < filters["min_duration"] <= 24 * 60:
+                raise ValueError("min_duration")
+        if params.get("weekday"):
+            filters["weekdays"] = availability.parse_weekdays(params["weekday"])
+        time_of_day = params.get("time_of_day")
+        if time_of_day:
+            if time_of_day not in availability.TIME_OF_DAY:
+                raise ValueError("time_of_day")
+            filters["time_of_day"] = time_of_day
+        for name in ("after", "before"):
+            if params.get(name):
+                filters[name] = datetime.strptime(params[name], "%H:%M").time()
+    except ValueError:
+        return JsonResponse({"error": "Invalid filter; see the API documentation."}, status=400)
+    return JsonResponse({"slots": availability.next_available(**filters)})
+
 def book_slot(request, pk):
     """Displays booking form for a specific slot"""
     slot = get_object_or_404(AvailabilitySlot, pk=pk)
@@ -907,11 +1013,15 @@ def book_submit(request, pk):
                     # Invalid UUID format, fail silently
                     pass
 
-            booking.save()
+            # The confirmation emails are committed with the booking and sent by the outbox worker
+            with transaction.atomic():
+                booking.save()
+
+                # Mark slot as unavailable
+                slot.is_available = False
+                slot.save()
 
-            # Mark slot as unavailable
-            slot.is_available = False
-            slot.save()
+                outbox.enqueue_booking_emails(booking, request)
 
             # Redirect to success page
             return redirect("book_success", booking_id=booking.pk)
@@ -978,6 +1088,26 @@ def owner_booking_toggle_paid(request, pk):
 
     return redirect("owner_booking_list")
 
+@login_required
+@user_passes_test(is_staff_user, login_url='/')
+def owner_export(request, dataset, fmt):
+    """
+    Stream an export of intakes, bookings or availability slots as CSV or JSON Lines.
+
+    Optional query parameters:
+    - start: first date to include (YYYY-MM-DD)
+    - end: last date to include (YYYY-MM-DD)
+    """
+    try:
+        return streaming_export(
+            dataset,
+            fmt,
+            start=request.GET.get("start"),
+            end=request.GET.get("end"),
+        )
+    except ExportError as e:
+        return HttpResponseBadRequest(str(e))
+
 def calendar_feed(request, secret_key):
     """
     Private iCal feed for booking submissions.
@@ -1026,54 +1156,15 @@ def calendar_feed(request, secret_key):
 
     # Generate ICS content
     domain = request.get_host()
-
-    # Helper function to escape text for ICS format
-    def ics_escape(text):
-        """
-        Escape special characters for iCalendar text fields per RFC 5545.
-        Backslash, semicolon, comma, newline must be escaped.
-        """
-        if not text:
-            return ""
-        text = str(text)
-        # Order matters: escape backslash first
-        text = text.replace('\\', '\\\\')
-        text = text.replace(';', '\\;')
-        text = text.replace(',', '\\,')
-        text = text.replace('\r\n', '\\n')
-        text = text.replace('\n', '\\n')
-        text = text.replace('\r', '\\n')
-        return text
-
-    ics_lines = [
-        "BEGIN:VCALENDAR",
-        "VERSION:2.0",
-        f"PRODID:-//{ics_escape(settings.SITE_NAME)}//Booking Calendar//EN",
-        "CALSCALE:GREGORIAN",
-        "METHOD:PUBLISH",
-        f"X-WR-CALNAME:{ics_escape(settings.BARRISTER_NAME)} - Consultations",
-        "X-WR-TIMEZONE:UTC",
-    ]
+    events = []
 
     for booking in bookings:
-        slot = booking.slot
-
-        # Combine date and time to create timezone-aware datetime objects
-        start_dt = timezone.make_aware(
-            datetime.combine(slot.date, slot.start_time)
-        )
-        end_dt = timezone.make_aware(
-            datetime.combine(slot.date, slot.end_time)
-        )
+        start_dt, end_dt = ics.slot_datetimes(booking.slot)
 
         # Skip if the consultation has already started (filter by start time, not end time)
         if start_dt < now:
             continue
 
-        # Format datetimes for ICS (UTC format: YYYYMMDDTHHmmssZ)
-        start_str = start_dt.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
-        end_str = end_dt.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
-
         # Build GDPR-safe description with minimal data
         # Only include intake reference and a note to check CRM
         description_parts = []
@@ -1081,40 +1172,19 @@ def calendar_feed(request, secret_key):
             description_parts.append(f"Intake Ref: {booking.intake.uuid}")
         description_parts.append("See CRM for details.")
 
-        description = ics_escape("\\n".join(description_parts))
-
-        # Generate unique ID for this event
-        uid = f"booking-{booking.id}@{domain}"
-
-        # Use timezone.now() for DTSTAMP (not deprecated datetime.utcnow())
-        dtstamp = timezone.now().astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
-
         # Build client name for summary (or fallback to "Consultation")
         client_name = booking.name if booking.name else "Client"
-        summary = ics_escape(f"Consultation - {client_name}")
-
-        # Build location string with proper escaping
-        location = ics_escape(f"{settings.CHAMBERS_ADDRESS_LINE1}, {settings.CHAMBERS_ADDRESS_LINE2}")
-
-        # Create VEVENT
-        ics_lines.extend([
-            "BEGIN:VEVENT",
-            f"UID:{uid}",
-            f"DTSTAMP:{dtstamp}",
-            f"DTSTART:{start_str}",
-            f"DTEND:{end_str}",
-            f"SUMMARY:{summary}",
-            f"DESCRIPTION:{description}",
-            f"LOCATION:{location}",
-            "STATUS:CONFIRMED",
-            "TRANSP:OPAQUE",
-            "END:VEVENT",
-        ])
-
-    ics_lines.append("END:VCALENDAR")
-
-    # Join with CRLF (required by ICS spec RFC 5545)
-    ics_content = "\r\n".join(ics_lines)
+
+        events.append(ics.vevent(
+            uid=f"booking-{booking.id}@{domain}",
+            start=start_dt,
+            end=end_dt,
+            summary=f"Consultation - {client_name}",
+            description="\\n".join(description_parts),
+            location=ics.chambers_location(),
+        ))
+
+    ics_content = ics.vcalendar(events, name=f"{settings.BARRISTER_NAME} - Consultations")
 
     # Return as calendar file
     response = HttpResponse(ics_content, content_type="text/calendar; charset=utf-8")
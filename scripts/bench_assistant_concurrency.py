@@ -0,0 +1,151 @@
+"""
+Benchmark: concurrent assistant sessions per worker, sync (WSGI) vs async (ASGI).
+
+Starts a local stub LLM that answers after a fixed delay, then runs the site
+under a single gunicorn worker in each mode and fires concurrent POSTs at
+/api/assist/. Reports wall time, throughput and the effective concurrency
+(how many LLM waits overlapped inside the one worker).
+
+Run from the project root:
+    python scripts/bench_assistant_concurrency.py --requests 40 --llm-latency 1.0
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import requests
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+MODES = {
+    "sync": {
+        "args": ["core.wsgi:application", "--worker-class", "sync"],
+        "env": {"ASYNC_LLM_VIEWS": "0"},
+    },
+    "async": {
+        "args": ["core.asgi:application", "--worker-class", "uvicorn.workers.UvicornWorker"],
+        "env": {"ASYNC_LLM_VIEWS": "1"},
+    },
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub_llm(latency):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(latency)
+            body = json.dumps({"choices": [{"message": {"content": "Stub reply."}}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def wait_for(url, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+def run_mode(mode, env, n_requests, client_concurrency):
+    port = free_port()
+    cmd = [
+        sys.executable, "-m", "gunicorn", *MODES[mode]["args"],
+        "--workers", "1", "--bind", f"127.0.0.1:{port}", "--timeout", "120",
+    ]
+    proc = subprocess.Popen(
+        cmd, cwd=BASE_DIR, env={**env, **MODES[mode]["env"]},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        url = f"http://127.0.0.1:{port}/api/assist/"
+        wait_for(url)
+
+        def one(i):
+            started = time.perf_counter()
+            # A distinct User-Agent per session keeps the per-client throttle out of the way
+            resp = requests.post(
+                url, json={"message": "What areas do you practise in?"},
+                headers={"User-Agent": f"bench-{mode}-{i}"}, timeout=300,
+            )
+            resp.raise_for_status()
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=client_concurrency) as pool:
+            latencies = sorted(pool.map(one, range(n_requests)))
+        wall = time.perf_counter() - started
+        return wall, latencies
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=40, help="Assistant sessions per mode")
+    parser.add_argument("--concurrency", type=int, default=40, help="Simultaneous client connections")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Stub LLM response time in seconds")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    args = parser.parse_args()
+
+    stub, stub_url = start_stub_llm(args.llm_latency)
+    db_dir = tempfile.mkdtemp(prefix="bench-db-")
+    env = {
+        **os.environ,
+        "DEBUG": "True",
+        "ASSISTANT_ENABLED": "1",
+        "LLM_BASE_URL": stub_url,
+        "LLM_API_KEY": "bench",
+        "LLM_FALLBACK_BASE_URL": "",
+        "SQLITE_PATH": str(Path(db_dir) / "bench.sqlite3"),
+        "SHARED_CACHE_DIR": str(Path(db_dir) / "shared-cache"),
+    }
+    subprocess.run([sys.executable, "manage.py", "migrate", "-v", "0"], cwd=BASE_DIR, env=env, check=True)
+
+    print(f"{args.requests} sessions, {args.concurrency} concurrent clients, LLM latency {args.llm_latency:.2f}s, 1 worker\n")
+    print(f"{'mode':<8}{'wall (s)':>10}{'req/s':>10}{'p50 (s)':>10}{'p95 (s)':>10}{'overlap':>10}")
+    try:
+        for mode in args.modes:
+            wall, latencies = run_mode(mode, env, args.requests, args.concurrency)
+            p50 = latencies[len(latencies) // 2]
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            overlap = args.requests * args.llm_latency / wall
+            print(f"{mode:<8}{wall:>10.2f}{args.requests / wall:>10.2f}{p50:>10.2f}{p95:>10.2f}{overlap:>10.1f}")
+    finally:
+        stub.shutdown()
+
+    print("\noverlap = LLM-seconds served per wall-second, i.e. concurrent assistant sessions per worker")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark: Largest Contentful Paint with and without LAZY_ASSETS.
+
+Builds the asset bundles, then serves the site with ``manage.py runserver``
+(WhiteNoise serving the collected, fingerprinted files) once per mode and
+loads each page in headless Chromium over an emulated slow connection.
+Reports the median FCP, LCP and bytes transferred before the load event.
+
+- eager: render-blocking site.css, assistant CSS/JS loaded on every page
+- lazy:  inlined critical CSS, site.css preloaded, assistant loaded on click/idle
+
+Needs Playwright, which is not a runtime dependency:
+    pip install playwright && python -m playwright install chromium
+
+Run from the project root:
+    python scripts/bench_lcp.py --runs 5 --paths / /about/ /blog/
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from playwright.sync_api import sync_playwright
+
+from bench_assistant_concurrency import BASE_DIR, free_port, wait_for
+
+MODES = {
+    "eager": {"LAZY_ASSETS": "0"},
+    "lazy": {"LAZY_ASSETS": "1"},
+}
+
+# Chrome DevTools "Slow 4G"-style throttling
+NETWORK = {"offline": False, "latency": 150, "downloadThroughput": 1.6 * 1024 * 1024 / 8, "uploadThroughput": 750 * 1024 / 8}
+CPU_SLOWDOWN = 4
+
+MEASURE_JS = """
+() => new Promise((resolve) => {
+  let lcp = 0;
+  new PerformanceObserver((list) => {
+    for (const entry of list.getEntries()) lcp = entry.startTime;
+  }).observe({ type: 'largest-contentful-paint', buffered: true });
+  const fcp = performance.getEntriesByName('first-contentful-paint')[0];
+  const bytes = performance.getEntriesByType('resource').reduce((sum, r) => sum + r.transferSize, 0)
+    + performance.getEntriesByType('navigation')[0].transferSize;
+  setTimeout(() => resolve({ lcp, fcp: fcp ? fcp.startTime : 0, bytes }), 0);
+})
+"""
+
+
+def measure(browser, url):
+    context = browser.new_context()
+    page = context.new_page()
+    cdp = context.new_cdp_session(page)
+    cdp.send("Network.enable")
+    cdp.send("Network.setCacheDisabled", {"cacheDisabled": True})
+    cdp.send("Network.emulateNetworkConditions", NETWORK)
+    cdp.send("Emulation.setCPUThrottlingRate", {"rate": CPU_SLOWDOWN})
+    page.goto(url, wait_until="load")
+    result = page.evaluate(MEASURE_JS)
+    context.close()
+    return result
+
+
+def run_mode(mode, env, paths, runs, browser):
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "manage.py", "runserver", f"127.0.0.1:{port}", "--noreload", "--nostatic"],
+        cwd=BASE_DIR, env={**env, **MODES[mode]},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        wait_for(f"{base}/healthz")
+        results = {}
+        for path in paths:
+            samples = [measure(browser, base + path) for _ in range(runs)]
+            results[path] = {
+                key: statistics.median(s[key] for s in samples)
+                for key in ("fcp", "lcp", "bytes")
+            }
+        return results
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Page loads per path and mode")
+    parser.add_argument("--paths", nargs="+", default=["/", "/about/", "/blog/"])
+    parser.add_argument("--skip-build", action="store_true", help="Reuse existing bundles and staticfiles/")
+    args = parser.parse_args()
+
+    db_dir = tempfile.mkdtemp(prefix="bench-db-")
+    env = {
+        **os.environ,
+        "DEBUG": "False",
+        "SECRET_KEY": "bench",
+        "SECURE_SSL_REDIRECT": "False",
+        "ALLOWED_HOSTS": "127.0.0.1",
+        "ASSET_BUNDLES": "1",
+        "ASSISTANT_ENABLED": "1",
+        "STATIC_SNAPSHOT_ENABLED": "0",
+        "SQLITE_PATH": str(Path(db_dir) / "bench.sqlite3"),
+        "SHARED_CACHE_DIR": str(Path(db_dir) / "shared-cache"),
+    }
+    if not args.skip_build:
+        for command in (["build_assets"], ["collectstatic", "--no-input", "-v", "0"]):
+            subprocess.run([sys.executable, "manage.py", *command], cwd=BASE_DIR, env=env, check=True,
+                           stdout=subprocess.DEVNULL)
+    subprocess.run([sys.executable, "manage.py", "migrate", "-v", "0"], cwd=BASE_DIR, env=env, check=True)
+
+    print(f"Median of {args.runs} loads, {CPU_SLOWDOWN}x CPU slowdown, "
+          f"{NETWORK['latency']} ms RTT / {NETWORK['downloadThroughput'] * 8 / 1024 / 1024:.1f} Mbps\n")
+    print(f"{'path':<16}{'mode':<8}{'FCP (ms)':>10}{'LCP (ms)':>10}{'KB':>10}")
+    with sync_playwright() as p:
+        browser = p.chromium.launch()
+        try:
+            results = {mode: run_mode(mode, env, args.paths, args.runs, browser) for mode in MODES}
+        finally:
+            browser.close()
+
+    for path in args.paths:
+        for mode in MODES:
+            r = results[mode][path]
+            print(f"{path:<16}{mode:<8}{r['fcp']:>10.0f}{r['lcp']:>10.0f}{r['bytes'] / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark: LLM calls and tokens per intake enquiry, inline vs batched triage.
+
+Starts a local stub LLM that answers triage requests (a single JSON object,
+or a JSON array in batch mode) and records every request. Creates the same
+set of enquiries in a scratch database for each batch size, triages them
+(batch size 1 is the inline path, classify_intake_session per enquiry) and
+reports LLM calls, prompt and completion tokens per intake. Tokens are
+counted with the same local approximation the assistant uses
+(pages/assist_context.count_tokens).
+
+Run from the project root:
+    python scripts/bench_triage_batching.py --intakes 60 --batch-sizes 1 5 10 20
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+ENQUIRIES = [
+    "My landlord has kept my deposit and will not reply to emails.",
+    "I was dismissed after raising a grievance about unpaid overtime.",
+    "We want to contest a will that was changed weeks before my father died.",
+    "A supplier has not delivered goods we paid for in advance.",
+    "I need advice on a boundary dispute with my neighbour over a fence.",
+    "My employer refuses to let me return part-time after maternity leave.",
+]
+
+
+def start_stub_llm(log):
+    from pages.assist_context import count_tokens
+
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            messages = payload["messages"]
+            result = {"is_suitable": True, "recommended_slot_type": "initial"}
+            if "BATCH MODE" in messages[0]["content"]:
+                items = json.loads(messages[-1]["content"])
+                content = json.dumps([{"id": item["id"], **result} for item in items])
+            else:
+                content = json.dumps(result)
+            with lock:
+                log.append({
+                    "prompt": sum(count_tokens(m["content"]) for m in messages),
+                    "completion": count_tokens(content),
+                })
+            body = json.dumps({"choices": [{"message": {"content": content}}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def run(batch_size, n_intakes, log):
+    from pages import triage
+    from pages.models import IntakeSession
+    from pages.views import classify_intake_session
+
+    IntakeSession.objects.all().delete()
+    for i in range(n_intakes):
+        # Distinct texts per run, so the memoised-result cache never answers
+        IntakeSession.objects.create(raw_text=f"{ENQUIRIES[i % len(ENQUIRIES)]} (enquiry {batch_size}-{i})")
+    log.clear()
+
+    if batch_size == 1:
+        for session in IntakeSession.objects.all():
+            classify_intake_session(session)
+    else:
+        while triage.run_due(batch_size=batch_size, window=0)["sessions"]:
+            pass
+
+    triaged = IntakeSession.objects.filter(is_suitable__isnull=False).count()
+    return triaged, len(log), sum(c["prompt"] for c in log), sum(c["completion"] for c in log)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--intakes", type=int, default=60, help="Enquiries triaged per batch size")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 5, 10, 20])
+    args = parser.parse_args()
+
+    log = []
+    db_dir = tempfile.mkdtemp(prefix="bench-db-")
+    os.environ.update({
+        "DEBUG": "True",
+        "LLM_API_KEY": "bench",
+        "LLM_FALLBACK_BASE_URL": "",
+        "SQLITE_PATH": str(Path(db_dir) / "bench.sqlite3"),
+        "SHARED_CACHE_DIR": str(Path(db_dir) / "shared-cache"),
+    })
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    import django
+    django.setup()
+    stub, stub_url = start_stub_llm(log)
+
+    from django.conf import settings
+    from django.core.management import call_command
+    settings.LLM_BASE_URL = stub_url
+    call_command("migrate", verbosity=0)
+
+    print(f"{args.intakes} enquiries; batch size 1 = inline triage (one call per enquiry)\n")
+    print(f"{'batch':>6}{'triaged':>9}{'calls':>7}{'calls/intake':>14}{'prompt tok/intake':>19}{'reply tok/intake':>18}")
+    try:
+        for size in args.batch_sizes:
+            triaged, calls, prompt, completion = run(size, args.intakes, log)
+            print(
+                f"{size:>6}{triaged:>9}{calls:>7}{calls / args.intakes:>14.2f}"
+                f"{prompt / args.intakes:>19.0f}{completion / args.intakes:>18.1f}"
+            )
+    finally:
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
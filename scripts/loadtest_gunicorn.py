@@ -0,0 +1,146 @@
+"""
+Load test: gunicorn defaults vs the tuned gunicorn.conf.py.
+
+Runs the site under each configuration against a stub LLM and drives a mixed
+workload: slow LLM-bound requests (/api/assist/) alongside cheap requests
+(/healthz plus any --path you add). With the old default (one sync worker)
+the cheap requests queue behind LLM calls; the tuned gthread config keeps
+serving them.
+
+Run from the project root:
+    python scripts/loadtest_gunicorn.py --duration 10 --llm-latency 1.0
+
+Extra GET paths that render templates need collected static files
+(python manage.py collectstatic) because of the manifest storage.
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import requests
+
+from bench_assistant_concurrency import BASE_DIR, free_port, start_stub_llm, wait_for
+
+CONFIGS = {
+    # What the Procfile used to run: no config file, gunicorn defaults (1 sync worker)
+    "default": {"args": ["-c", os.devnull], "env": {"WEB_CONCURRENCY": None}},
+    "tuned": {"args": ["-c", "gunicorn.conf.py"], "env": {"GUNICORN_ACCESSLOG": ""}},
+}
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def drive(base_url, paths, assist_clients, cheap_clients, duration):
+    """Run closed-loop clients for `duration` seconds; return latencies per endpoint."""
+    results = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    stop_at = time.time() + duration
+
+    def client(name, send):
+        session = requests.Session()
+        while time.time() < stop_at:
+            started = time.perf_counter()
+            try:
+                resp = send(session)
+                ok = resp.status_code < 500
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                if ok:
+                    results[name].append(elapsed)
+                else:
+                    errors[name] += 1
+
+    threads = []
+    for i in range(assist_clients):
+        def send(session, i=i):
+            return session.post(
+                f"{base_url}/api/assist/", json={"message": "Do you handle employment matters?"},
+                headers={"User-Agent": f"loadtest-{i}-{time.time()}"}, timeout=120,
+            )
+        threads.append(threading.Thread(target=client, args=("/api/assist/", send)))
+    for i in range(cheap_clients):
+        path = paths[i % len(paths)]
+        threads.append(threading.Thread(
+            target=client, args=(path, lambda session, path=path: session.get(f"{base_url}{path}", timeout=120)),
+        ))
+
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per configuration")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Stub LLM response time in seconds")
+    parser.add_argument("--assist-clients", type=int, default=8, help="Concurrent assistant users")
+    parser.add_argument("--cheap-clients", type=int, default=4, help="Concurrent clients on cheap endpoints")
+    parser.add_argument("--path", action="append", default=[], help="Extra GET path for the cheap clients")
+    parser.add_argument("--workers", default="2", help="WEB_CONCURRENCY for the tuned config")
+    parser.add_argument("--configs", nargs="+", default=list(CONFIGS), choices=list(CONFIGS))
+    args = parser.parse_args()
+
+    stub, stub_url = start_stub_llm(args.llm_latency)
+    tmp = tempfile.mkdtemp(prefix="loadtest-")
+    env = {
+        **os.environ,
+        "DEBUG": "True",
+        "ASSISTANT_ENABLED": "1",
+        "LLM_BASE_URL": stub_url,
+        "LLM_API_KEY": "loadtest",
+        "LLM_FALLBACK_BASE_URL": "",
+        "SQLITE_PATH": str(Path(tmp) / "loadtest.sqlite3"),
+        "SHARED_CACHE_DIR": str(Path(tmp) / "shared-cache"),
+        "WEB_CONCURRENCY": args.workers,
+    }
+    subprocess.run([sys.executable, "manage.py", "migrate", "-v", "0"], cwd=BASE_DIR, env=env, check=True)
+    paths = ["/healthz"] + args.path
+
+    print(f"{args.duration:.0f}s per config, {args.assist_clients} assistant + {args.cheap_clients} cheap clients, "
+          f"LLM latency {args.llm_latency:.2f}s\n")
+    print(f"{'config':<9}{'endpoint':<16}{'ok':>6}{'err':>5}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}")
+    try:
+        for name in args.configs:
+            port = free_port()
+            cmd = [sys.executable, "-m", "gunicorn", "core.wsgi:application", *CONFIGS[name]["args"],
+                   "--bind", f"127.0.0.1:{port}"]
+            proc_env = {k: v for k, v in {**env, **CONFIGS[name]["env"]}.items() if v is not None}
+            proc = subprocess.Popen(cmd, cwd=BASE_DIR, env=proc_env,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                wait_for(f"{base_url}/healthz")
+                results, errors = drive(base_url, paths, args.assist_clients, args.cheap_clients, args.duration)
+            finally:
+                # SIGINT = quick shutdown; don't wait out graceful_timeout on idle keep-alives
+                proc.send_signal(signal.SIGINT)
+                proc.wait(timeout=30)
+
+            for endpoint in ["/api/assist/"] + paths:
+                latencies = results.get(endpoint, [])
+                print(f"{name:<9}{endpoint:<16}{len(latencies):>6}{errors.get(endpoint, 0):>5}"
+                      f"{len(latencies) / args.duration:>8.1f}"
+                      f"{percentile(latencies, 0.5) * 1000:>9.0f}{percentile(latencies, 0.95) * 1000:>9.0f}")
+    finally:
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
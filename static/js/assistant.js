@@ -4,6 +4,12 @@
   // Feature flag from Django template
   const enabled = window.ASSISTANT_ENABLED || false;
 
+  // In lazy mode (LAZY_ASSETS) the widget markup ships inert in a <template>
+  const template = document.getElementById('assistant-template');
+  if (template && !document.getElementById('assistant-modal')) {
+    document.body.appendChild(template.content.cloneNode(true));
+  }
+
   // DOM Elements
   const trigger = document.getElementById('assistant-btn');
   const modal = document.getElementById('assistant-modal');
@@ -13,8 +19,8 @@
   const sendBtn = document.getElementById('assistant-send');
   const typingIndicator = document.getElementById('assistant-typing');
 
-  // Conversation history
-  const history = [];
+  // Opaque id of the conversation stored on the server (set from the first reply)
+  let conversationId = null;
 
   // Hide trigger if assistant is disabled
   if (!enabled) {
@@ -155,12 +161,6 @@
     // Add user message to UI
     addMessage('user', text);
 
-    // Append system prompt guidance for internal links
-    const enhancedMessage = text + '\n\n[System: You may include internal links using normal HTML anchor tags. Only link to URLs starting with \'/\'. Allowed tags: <a>, <p>, <ul>, <li>, <strong>, <em>]';
-
-    // Add to history (with enhanced message)
-    history.push({ role: 'user', content: enhancedMessage });
-
     // Show typing indicator
     showTyping();
 
@@ -171,14 +171,18 @@
         headers: {
           'Content-Type': 'application/json',
         },
+        // Only the new message: earlier turns are kept server-side
         body: JSON.stringify({
-          message: enhancedMessage,
-          history: history
+          message: text,
+          conversation: conversationId
         })
       });
 
       const data = await response.json();
       const reply = data.reply || 'Sorry—please try again or use the contact form.';
+      if (data.conversation) {
+        conversationId = data.conversation;
+      }
 
       // Hide typing indicator
       hideTyping();
@@ -186,9 +190,6 @@
       // Add assistant message to UI
       addMessage('ai', reply);
 
-      // Add to history
-      history.push({ role: 'assistant', content: reply });
-
     } catch (error) {
       console.error('Assistant error:', error);
 
@@ -240,4 +241,9 @@
       }
     });
   });
+
+  // The launcher was clicked before this script finished loading
+  if (window.ASSISTANT_OPEN_ON_LOAD) {
+    openModal();
+  }
 })();
@@ -0,0 +1,162 @@
+/**
+ * Month calendar for /book/.
+ *
+ * Fetches one month of bookable slots from /api/availability/?month=YYYY-MM
+ * and lets the visitor pick a date and a time without a page load per step.
+ * Months already fetched are kept for the life of the page. The
+ * server-rendered date list stays in the page as the no-JS fallback and is
+ * hidden once the calendar has rendered.
+ */
+(() => {
+  const root = document.getElementById('booking-calendar');
+  if (!root || !window.fetch) return;
+
+  const apiUrl = root.dataset.apiUrl;
+  const slotUrl = root.dataset.slotUrl; // book_slot URL for pk 0
+  const intake = root.dataset.intake;
+  const fallback = document.getElementById('booking-date-list');
+  const months = new Map();
+  const WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'];
+  const SLOT_TYPES = { initial: 'Initial Consultation', followup: 'Follow-up', general: 'General' };
+
+  const today = new Date();
+  // Open on the first month with availability (data-start-month, YYYY-MM) if given
+  const start = (root.dataset.startMonth || '').split('-').map(Number);
+  let year = start[0] || today.getFullYear();
+  let month = start[1] || today.getMonth() + 1;
+
+  function pad(n) {
+    return String(n).padStart(2, '0');
+  }
+
+  function monthKey(y, m) {
+    return `${y}-${pad(m)}`;
+  }
+
+  function el(tag, className, text) {
+    const node = document.createElement(tag);
+    if (className) node.className = className;
+    if (text !== undefined) node.textContent = text;
+    return node;
+  }
+
+  function displayTime(hhmm) {
+    const [h, m] = hhmm.split(':').map(Number);
+    return `${h % 12 || 12}:${pad(m)} ${h < 12 ? 'AM' : 'PM'}`;
+  }
+
+  function bookingUrl(slot) {
+    const url = slotUrl.replace(/0\/$/, `${slot.id}/`);
+    return intake ? `${url}?intake=${encodeURIComponent(intake)}` : url;
+  }
+
+  function load(y, m) {
+    const key = monthKey(y, m);
+    if (!months.has(key)) {
+      const request = fetch(`${apiUrl}?month=${key}`, { headers: { Accept: 'application/json' } })
+        .then((response) => {
+          if (!response.ok) throw new Error(`HTTP ${response.status}`);
+          return response.json();
+        })
+        .catch((error) => {
+          months.delete(key);
+          throw error;
+        });
+      months.set(key, request);
+    }
+    return months.get(key);
+  }
+
+  function renderSlots(container, dateIso, day) {
+    container.replaceChildren();
+    const heading = new Date(`${dateIso}T00:00:00`).toLocaleDateString(undefined, {
+      weekday: 'long', day: 'numeric', month: 'long', year: 'numeric',
+    });
+    container.appendChild(el('h3', 'h6 fw-semibold mb-3', heading));
+    const list = el('div', 'list-group');
+    day.slots.forEach((slot) => {
+      const link = el('a', 'list-group-item list-group-item-action d-flex justify-content-between align-items-center');
+      link.href = bookingUrl(slot);
+      const label = el('div');
+      label.appendChild(el('div', 'fw-semibold', `${displayTime(slot.start)} - ${displayTime(slot.end)}`));
+      label.appendChild(el('div', 'small text-muted',
+        `${SLOT_TYPES[slot.slot_type] || slot.slot_type} • ${slot.duration_minutes} minutes`));
+      link.appendChild(label);
+      link.appendChild(el('i', 'bi bi-chevron-right text-primary'));
+      list.appendChild(link);
+    });
+    container.appendChild(list);
+  }
+
+  function render(data) {
+    root.replaceChildren();
+
+    const nav = el('div', 'd-flex justify-content-between align-items-center mb-3');
+    const prev = el('button', 'btn btn-sm btn-outline-secondary', '‹');
+    const next = el('button', 'btn btn-sm btn-outline-secondary', '›');
+    prev.type = next.type = 'button';
+    prev.setAttribute('aria-label', 'Previous month');
+    next.setAttribute('aria-label', 'Next month');
+    prev.disabled = year === today.getFullYear() && month === today.getMonth() + 1;
+    prev.addEventListener('click', () => show(month === 1 ? year - 1 : year, month === 1 ? 12 : month - 1));
+    next.addEventListener('click', () => show(month === 12 ? year + 1 : year, month === 12 ? 1 : month + 1));
+    const title = new Date(year, month - 1, 1).toLocaleDateString(undefined, { month: 'long', year: 'numeric' });
+    nav.append(prev, el('h3', 'h6 fw-semibold mb-0', title), next);
+    root.appendChild(nav);
+
+    const grid = el('div', 'booking-calendar-grid');
+    WEEKDAYS.forEach((name) => grid.appendChild(el('div', 'small text-muted text-center', name)));
+    const offset = (new Date(year, month - 1, 1).getDay() + 6) % 7;
+    for (let i = 0; i < offset; i += 1) grid.appendChild(el('div'));
+
+    const slotsPanel = el('div', 'mt-4');
+    const daysInMonth = new Date(year, month, 0).getDate();
+    for (let d = 1; d <= daysInMonth; d += 1) {
+      const dateIso = `${monthKey(year, month)}-${pad(d)}`;
+      const day = data.dates[dateIso];
+      if (!day) {
+        grid.appendChild(el('div', 'text-center text-muted py-2', String(d)));
+        continue;
+      }
+      const button = el('button', 'btn btn-outline-primary btn-sm w-100 py-2');
+      button.type = 'button';
+      button.appendChild(document.createTextNode(String(d)));
+      button.appendChild(el('span', 'd-block small', `${day.count} slot${day.count === 1 ? '' : 's'}`));
+      button.addEventListener('click', () => {
+        grid.querySelectorAll('.active').forEach((b) => b.classList.remove('active'));
+        button.classList.add('active');
+        renderSlots(slotsPanel, dateIso, day);
+      });
+      grid.appendChild(button);
+    }
+    root.appendChild(grid);
+
+    if (!Object.keys(data.dates).length) {
+      slotsPanel.appendChild(el('p', 'small text-muted mb-0', 'No slots available this month.'));
+    }
+    root.appendChild(slotsPanel);
+  }
+
+  function show(y, m) {
+    year = y;
+    month = m;
+    root.setAttribute('aria-busy', 'true');
+    load(y, m)
+      .then((data) => {
+        if (y !== year || m !== month) return; // superseded by a later click
+        render(data);
+        if (fallback) fallback.hidden = true;
+        root.hidden = false;
+        // Warm the next month so paging forward is instant
+        load(m === 12 ? y + 1 : y, m === 12 ? 1 : m + 1).catch(() => {});
+      })
+      .catch(() => {
+        // Leave the server-rendered list in place
+        root.hidden = true;
+        if (fallback) fallback.hidden = false;
+      })
+      .finally(() => root.removeAttribute('aria-busy'));
+  }
+
+  show(year, month);
+})();